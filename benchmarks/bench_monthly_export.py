@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""月次集計エクスポートのベンチマーク（講師ごとの検索 vs 1回の検索）
+
+1年分の打刻を持つ合成データベースを作成し、従来の講師ごとに検索する方法と
+MonthlyExporter の1回の検索でまとめて集計する方法の処理時間を比較する。
+
+使い方:
+    python benchmarks/bench_monthly_export.py --instructors 300 --year 2025
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.csv_exporter import CSVExporter
+from modules.monthly_exporter import MonthlyExporter
+from benchmarks.synthetic_data import build_synthetic_db
+
+
+def legacy_query(db_manager, query, params):
+    """従来の方法（呼び出しごとに接続して打刻テーブルを直接検索）"""
+    conn = sqlite3.connect(db_manager.db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def legacy_first_last(db_manager, month_str, instructor_id, table_name):
+    """従来の講師別検索（月の打刻をすべて読み、日付ごとに最初と最後の時刻を求める）"""
+    records = legacy_query(db_manager, f'''
+        SELECT DATE(timestamp) as date, TIME(timestamp) as time
+        FROM {table_name}
+        WHERE instructor_id = ? AND strftime('%Y-%m', timestamp) = ?
+        ORDER BY date, time
+    ''', (instructor_id, month_str))
+    first_last = {}
+    for date_str, time_str in records:
+        start_time, end_time = first_last.get(date_str, (time_str, time_str))
+        first_last[date_str] = (min(start_time, time_str), max(end_time, time_str))
+    return first_last
+
+
+def legacy_monthly_export(db_manager, csv_exporter, month_str, table_name):
+    """従来の方法（講師ごとに月の打刻を検索し、講師別CSVでも再度検索する）"""
+    month_subdir = os.path.join("monthly_legacy", month_str)
+    os.makedirs(os.path.join(month_subdir, "old"), exist_ok=True)
+    
+    legacy_query(db_manager, f'''
+        SELECT instructor_id, instructor_name, DATE(timestamp) as date
+        FROM {table_name}
+        WHERE strftime('%Y-%m', timestamp) = ?
+        GROUP BY instructor_id, instructor_name, DATE(timestamp)
+        ORDER BY instructor_id
+    ''', (month_str,))
+    all_instructors = sorted(db_manager.load_instructors_full(), key=lambda x: int(x['instructor_id']))
+    
+    csv_filename = os.path.join(month_subdir, f"legacy_{table_name}_{month_str}.csv")
+    with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.writer(csvfile)
+        for instructor in all_instructors:
+            first_last = legacy_first_last(db_manager, month_str, instructor['instructor_id'], table_name)
+            writer.writerows(csv_exporter.build_instructor_daily_rows(
+                month_str, instructor['instructor_id'], instructor['name'], first_last
+            ))
+    
+    for instructor in all_instructors:
+        first_last = legacy_first_last(db_manager, month_str, instructor['instructor_id'], table_name)
+        csv_exporter.export_instructor_daily_summary(
+            month_str, instructor['instructor_id'], instructor['name'], month_subdir, table_name, first_last
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="月次集計エクスポートのベンチマーク")
+    parser.add_argument("--instructors", type=int, default=300, help="講師数")
+    parser.add_argument("--year", type=int, default=2025, help="合成データの年")
+    parser.add_argument("--months", type=int, default=12, help="計測する月数（1月から）")
+    parser.add_argument("--keep", action="store_true", help="作業ディレクトリを削除しない")
+    args = parser.parse_args()
+    
+    work_dir = tempfile.mkdtemp(prefix="kintouch_bench_")
+    original_dir = os.getcwd()
+    os.chdir(work_dir)
+    
+    try:
+        print(f"作業ディレクトリ: {work_dir}")
+        started = time.perf_counter()
+        db_manager, record_count = build_synthetic_db(
+            os.path.join(work_dir, "attendance.db"), args.instructors, args.year
+        )
+        print(f"合成データ作成: 講師{args.instructors}人 / 打刻{record_count}件 "
+              f"({time.perf_counter() - started:.1f}秒)")
+        
+        csv_exporter = CSVExporter(db_manager)
+        monthly_exporter = MonthlyExporter(db_manager, csv_exporter)
+        
+        print("-" * 60)
+        print(f"{'対象月':<10} {'種別':<16} {'従来(ms)':>10} {'新方式(ms)':>12} {'倍率':>8}")
+        print("-" * 60)
+        
+        legacy_total = 0.0
+        single_total = 0.0
+        for month in range(1, args.months + 1):
+            month_str = f"{args.year}-{month:02d}"
+            for table_name in ("time_records", "meeting_records"):
+                started = time.perf_counter()
+                legacy_monthly_export(db_manager, csv_exporter, month_str, table_name)
+                legacy_ms = (time.perf_counter() - started) * 1000
+                
+                started = time.perf_counter()
+                monthly_exporter.export_monthly_summary_to_csv(month_str, table_name, include_daily=False)
+                single_ms = (time.perf_counter() - started) * 1000
+                
+                legacy_total += legacy_ms
+                single_total += single_ms
+                print(f"{month_str:<10} {table_name:<16} {legacy_ms:>10.1f} {single_ms:>12.1f} "
+                      f"{legacy_ms / single_ms:>7.1f}x")
+        
+        print("-" * 60)
+        print(f"{'合計':<10} {'':<16} {legacy_total:>10.1f} {single_total:>12.1f} "
+              f"{legacy_total / single_total:>7.1f}x")
+        
+        db_manager.close()
+    finally:
+        os.chdir(original_dir)
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""起動時間のベンチマーク（AttendanceSystemGUI の最初の画面が表示されるまで）
+
+別プロセスの python -X importtime で AttendanceSystemGUI を作成し、プロセスの起動から
+最初の画面（メニュー）の描画までの時間と、モジュールの読み込み時間を計測する。
+最初の画面より後に読み込む予定のモジュール（pyscard・エクスポート・打刻修正など）が
+起動時に読み込まれていれば終了コード 1 で終了する。
+
+使い方:
+    python benchmarks/bench_startup.py --runs 5 --top 15
+    python benchmarks/bench_startup.py --output startup.json --max-ms 800
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(ROOT_DIR, "出退勤確認システム.py")
+
+# 最初の画面より後（画面を開いたとき・リーダーの初期化時）に読み込むモジュール
+DEFERRED_MODULES = (
+    'smartcard',
+    'modules.card_reader_manager',
+    'modules.attendance_service',
+    'modules.csv_exporter',
+    'modules.monthly_exporter',
+    'modules.export_job_runner',
+    'modules.correction_manager',
+    'modules.background_loader',
+    'modules.virtual_table',
+    'csv',
+    'hashlib',
+    'logging',
+    'winsound',
+)
+
+# 計測用の子プロセスで実行するコード（argv: リポジトリのパス, 本体のスクリプト, 遅延読み込みのモジュール）
+CHILD_CODE = r'''
+import json, os, runpy, sys, time
+sys.path.insert(0, sys.argv[1])
+result = {'started_at': time.time()}
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError as e:
+    root = None
+    result['error'] = f"{e}"
+namespace = runpy.run_path(sys.argv[2], run_name="kintouch_startup")
+result['imported_at'] = time.time()
+if root is not None:
+    app = namespace['AttendanceSystemGUI'](root)
+    root.update_idletasks()
+    result['first_frame_at'] = time.time()
+result['deferred_loaded'] = [name for name in sys.argv[3].split(',') if name in sys.modules]
+print(json.dumps(result), flush=True)
+if root is not None:
+    app.shutdown()
+    root.destroy()
+'''
+
+
+def parse_importtime(stderr):
+    """-X importtime の出力から (モジュール名, 自身の時間us, 累積時間us, 深さ) の一覧を作る"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(parts[0]), int(parts[1]), depth))
+    return entries
+
+
+def run_once(work_dir):
+    """1回起動して計測結果を返す"""
+    launched_at = time.time()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_CODE, ROOT_DIR, MAIN_SCRIPT, ",".join(DEFERRED_MODULES)],
+        cwd=work_dir, capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=120
+    )
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"起動に失敗しました (終了コード {proc.returncode})\n{proc.stderr[-2000:]}")
+    
+    child = json.loads(lines[-1])
+    imports = parse_importtime(proc.stderr)
+    run = {
+        'interpreter_ms': (child['started_at'] - launched_at) * 1000,
+        'import_ms': (child['imported_at'] - launched_at) * 1000,
+        'first_frame_ms': ((child['first_frame_at'] - launched_at) * 1000
+                           if 'first_frame_at' in child else None),
+        'import_total_ms': sum(self_us for _, self_us, _, _ in imports) / 1000,
+        'deferred_loaded': child['deferred_loaded'],
+        'imports': imports,
+    }
+    if 'error' in child:
+        run['error'] = child['error']
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="起動時間のベンチマーク")
+    parser.add_argument("--runs", type=int, default=5, help="起動する回数")
+    parser.add_argument("--top", type=int, default=15, help="表示する読み込みの遅いモジュールの数")
+    parser.add_argument("--output", help="結果のJSONファイル")
+    parser.add_argument("--max-ms", type=float, help="最初の画面までの時間の上限（中央値、超えたら終了コード 1）")
+    args = parser.parse_args()
+    
+    # 設定済みの作業ディレクトリで起動する（最初の画面がメニューになり、本番のDBには触れない）
+    work_dir = tempfile.mkdtemp(prefix="kintouch_startup_")
+    try:
+        with open(os.path.join(work_dir, "reader_config.json"), 'w', encoding='utf-8') as f:
+            json.dump({'class_reader': "Class Reader", 'meeting_reader': "Meeting Reader",
+                       'configured': True}, f)
+        
+        # 1回目はバイトコードのキャッシュ作成を含むため計測しない
+        run_once(work_dir)
+        runs = [run_once(work_dir) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def median(key):
+        values = [run[key] for run in runs if run[key] is not None]
+        return round(statistics.median(values), 1) if values else None
+    
+    last = runs[-1]
+    top_level = sorted((entry for entry in last['imports'] if entry[3] == 0),
+                       key=lambda entry: entry[2], reverse=True)[:args.top]
+    deferred_loaded = sorted({name for run in runs for name in run['deferred_loaded']})
+    
+    print("-" * 60)
+    print(f"{'項目':<28} {'中央値(ms)':>12} {'最小(ms)':>10}")
+    for label, key in (("インタープリター起動", 'interpreter_ms'), ("本体の読み込み完了", 'import_ms'),
+                       ("最初の画面の描画", 'first_frame_ms'), ("import の合計", 'import_total_ms')):
+        values = [run[key] for run in runs if run[key] is not None]
+        if values:
+            print(f"{label:<24} {statistics.median(values):>12.1f} {min(values):>10.1f}")
+    if 'error' in last:
+        print(f"画面を作成できないため、最初の画面の描画は計測していません: {last['error']}")
+    print("-" * 60)
+    print("読み込みの遅いモジュール（累積時間）")
+    for name, self_us, cumulative_us, _ in top_level:
+        print(f"  {name:<40} {cumulative_us / 1000:>9.1f} ms")
+    print("-" * 60)
+    if deferred_loaded:
+        print(f"最初の画面より前に読み込まれたモジュール: {', '.join(deferred_loaded)}")
+    else:
+        print("遅延読み込みのモジュールは最初の画面より前に読み込まれていません")
+    
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'runs': args.runs,
+        'median_ms': {key: median(key) for key in
+                      ('interpreter_ms', 'import_ms', 'first_frame_ms', 'import_total_ms')},
+        'top_imports': [{'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+                        for name, self_us, cumulative_us, _ in top_level],
+        'deferred_loaded': deferred_loaded,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"結果: {os.path.abspath(args.output)}")
+    
+    first_frame_ms = report['median_ms']['first_frame_ms']
+    if args.max_ms is not None and first_frame_ms is not None and first_frame_ms > args.max_ms:
+        print(f"最初の画面までの時間が上限を超えました: {first_frame_ms:.1f} ms > {args.max_ms:.1f} ms")
+        return 1
+    return 1 if deferred_loaded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""打刻受付の負荷試験（シミュレーターのリーダーで大量の打刻を発生させる）
+
+カードリーダーなしで AttendanceService の打刻処理（UID読み取り・講師検索・出勤/退勤の判定・
+ジャーナル保存・DB書き込み）を実行し、処理件数と、カードをかざしてから
+記録完了（ジャーナル保存）・DB反映までの時間の p50/p95/p99 を表示する。
+
+使い方:
+    python benchmarks/bench_tap_storm.py --instructors 300 --duration 60 --double-tap-rate 0.05
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.constants import CHANNEL_TABLES, DUPLICATE_TAP_WINDOW
+from modules.database_manager import DatabaseManager
+from modules.card_reader_manager import CardReaderManager, SimulatedReaderBackend
+from modules.attendance_service import AttendanceService
+from modules.tap_debouncer import TapDebouncer
+from modules.tap_simulator import TapStreamBuilder, TapPlayer
+from modules.utils import SoundManager, NullBackend
+
+CLASS_READER = "Simulated Class Reader"
+MEETING_READER = "Simulated Meeting Reader"
+
+
+def percentile(values, p):
+    """p パーセンタイル（最近接順位法）"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def add_instructors(db_path, db_manager, count):
+    """講師を登録（UIDは講師番号から作る）"""
+    instructors = [(instructor_id, f"{instructor_id >> 8:02X} {instructor_id & 0xFF:02X} 00 01",
+                    f"講師{instructor_id:03d}") for instructor_id in range(1, count + 1)]
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO instructors (instructor_id, card_uid, name, created_at) VALUES (?, ?, ?, ?)",
+            [(instructor_id, uid, name, "2025-01-01 00:00:00") for instructor_id, uid, name in instructors]
+        )
+    conn.close()
+    db_manager.directory.invalidate()
+    return [uid for _, uid, _ in instructors]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="打刻受付の負荷試験")
+    parser.add_argument("--instructors", type=int, default=300, help="講師数")
+    parser.add_argument("--duration", type=float, default=60.0, help="出勤ラッシュの秒数")
+    parser.add_argument("--double-tap-rate", type=float, default=0.05, help="二度かざしする割合")
+    parser.add_argument("--meeting-rate", type=float, default=0.2,
+                        help="授業用・会議用に同時にかざす講師の割合")
+    parser.add_argument("--hold-ms", type=int, default=150, help="カードをかざしている時間")
+    parser.add_argument("--gap-ms", type=int, default=20, help="前の人が離してから次の人がかざすまでの時間")
+    parser.add_argument("--duplicate-window", type=float, default=DUPLICATE_TAP_WINDOW,
+                        help="二度かざしを無視する時間（秒、0で無効）")
+    parser.add_argument("--seed", type=int, default=1, help="乱数の種")
+    parser.add_argument("--keep", action="store_true", help="作業ディレクトリを削除しない")
+    args = parser.parse_args()
+    
+    work_dir = tempfile.mkdtemp(prefix="kintouch_tap_")
+    db_path = os.path.join(work_dir, "attendance.db")
+    
+    try:
+        print(f"作業ディレクトリ: {work_dir}")
+        db_manager = DatabaseManager(db_path)
+        uids = add_instructors(db_path, db_manager, args.instructors)
+        
+        # 打刻の一覧（出勤ラッシュ + 二度かざし + 授業用・会議用の同時打刻）
+        builder = TapStreamBuilder(seed=args.seed, hold_ms=args.hold_ms)
+        builder.rush(uids, CLASS_READER, args.duration)
+        builder.double_taps(args.double_tap_rate)
+        meeting_uids = uids[:int(len(uids) * args.meeting_rate)]
+        paired = [uid for pair in zip(uids[len(meeting_uids):], meeting_uids) for uid in pair]
+        builder.simultaneous(paired, (CLASS_READER, MEETING_READER), args.duration)
+        taps = builder.build()
+        
+        backend = SimulatedReaderBackend((CLASS_READER, MEETING_READER))
+        card_reader_manager = CardReaderManager(reader_backend=backend)
+        card_reader_manager.initialize_readers(CLASS_READER, MEETING_READER)
+        sound_manager = SoundManager(NullBackend())
+        service = AttendanceService(db_manager, card_reader_manager, sound_manager,
+                                    debouncer=TapDebouncer(args.duplicate_window))
+        
+        channels = {CLASS_READER: 'class', MEETING_READER: 'meeting'}
+        lock = threading.Lock()
+        tapped = {}
+        committed_keys = {}
+        record_ms = []
+        commit_ms = []
+        counts = {'punch': 0, 'unknown_card': 0, 'punch_failed': 0, 'duplicate_tap': 0}
+        
+        def on_tap(tap, tapped_at):
+            with lock:
+                tapped.setdefault((channels[tap['reader']], tap['uid']), deque()).append(tapped_at)
+        
+        def on_event(event):
+            if event['type'] not in counts:
+                return
+            now = time.perf_counter()
+            with lock:
+                counts[event['type']] += 1
+                queue = tapped.get((event['channel'], event['uid']))
+                if not queue:
+                    return
+                tapped_at = queue.popleft()
+                if event['type'] == 'punch':
+                    record_ms.append((now - tapped_at) * 1000)
+                    key = (CHANNEL_TABLES[event['channel']], event['uid'], event['timestamp'])
+                    committed_keys.setdefault(key, deque()).append(tapped_at)
+        
+        # DBへの書き込み完了時刻を記録（書き込みスレッドの一括書き込みを計測用に包む）
+        record_attendance_batch = db_manager.record_attendance_batch
+        
+        def timed_record_attendance_batch(entries):
+            record_attendance_batch(entries)
+            now = time.perf_counter()
+            with lock:
+                for entry in entries:
+                    queue = committed_keys.get((entry['table'], entry['card_uid'], entry['timestamp']))
+                    if queue:
+                        commit_ms.append((now - queue.popleft()) * 1000)
+        
+        db_manager.record_attendance_batch = timed_record_attendance_batch
+        
+        service.bus.subscribe(on_event)
+        service.start()
+        time.sleep(0.2)
+        
+        print(f"打刻: {len(taps)}件（講師{args.instructors}人 / 二度かざし{args.double_tap_rate:.0%} / "
+              f"同時打刻{len(meeting_uids)}組）")
+        elapsed = TapPlayer(backend.cards, gap_ms=args.gap_ms).play(taps, on_tap)
+        
+        # 処理中の打刻とDBへの書き込みが終わるのを待つ
+        time.sleep(0.5)
+        db_manager.flush_punches(timeout=10)
+        service.stop()
+        sound_manager.stop()
+        
+        recorded = counts['punch']
+        missed = len(taps) - recorded - counts['unknown_card'] - counts['punch_failed'] - counts['duplicate_tap']
+        print("-" * 60)
+        print(f"所要時間:     {elapsed:.1f}秒")
+        print(f"記録件数:     {recorded}件 ({recorded / elapsed:.1f}件/秒)")
+        print(f"記録失敗:     {counts['punch_failed']}件 / 読み取りなし: {missed}件")
+        print(f"二度かざし:   {counts['duplicate_tap']}件（{args.duplicate_window:g}秒以内の同じ打刻を無視）")
+        print("-" * 60)
+        print(f"{'':<24} {'p50(ms)':>10} {'p95(ms)':>10} {'p99(ms)':>10} {'最大(ms)':>10}")
+        for label, values in (("かざす → 記録完了", record_ms), ("かざす → DB反映", commit_ms)):
+            print(f"{label:<20} {percentile(values, 50):>10.1f} {percentile(values, 95):>10.1f} "
+                  f"{percentile(values, 99):>10.1f} {max(values, default=0.0):>10.1f}")
+        print("-" * 60)
+        
+        db_manager.close()
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""DatabaseManager・エクスポート処理のベンチマーク一式
+
+合成データベース（既定は講師500人・5年分の授業用/会議用の打刻）を作成し、
+DatabaseManager の検索・書き込みメソッド、日次集計・月次集計のエクスポート、
+講師登録の処理時間を計測して JSON で保存する。
+--baseline を指定すると前回の結果と比較し、しきい値を超えて遅くなった項目があれば
+終了コード 1 で終了する。
+
+使い方:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json --threshold 0.2
+    python benchmarks/run_benchmarks.py --db /tmp/kintouch_500x5.db   # 合成DBを作り直さずに再利用
+    python benchmarks/run_benchmarks.py --archive --baseline results.json   # 締めた年をアーカイブしてから計測
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.database_manager import DatabaseManager
+from modules.csv_exporter import CSVExporter
+from modules.monthly_exporter import MonthlyExporter
+from benchmarks.synthetic_data import build_synthetic_db
+
+RESULT_FORMAT_VERSION = 1
+
+
+def consume(iterator):
+    """ジェネレーターを最後まで読む（件数を返す）"""
+    count = 0
+    for _ in iterator:
+        count += 1
+    return count
+
+
+def read_cases(db_manager, day, month, uid, instructor_id):
+    """検索メソッドの計測項目 [(名前, 関数)]"""
+    cases = [
+        ("db.load_instructors", lambda: db_manager.load_instructors()),
+        ("db.load_instructors_full", lambda: db_manager.load_instructors_full()),
+        ("db.count_instructors", lambda: db_manager.count_instructors()),
+        ("db.get_instructors_page", lambda: db_manager.get_instructors_page(None, 100)),
+        ("db.get_next_instructor_id", lambda: db_manager.get_next_instructor_id()),
+        ("db.get_instructor_info_by_uid", lambda: db_manager.get_instructor_info_by_uid(uid)),
+        ("db.get_instructor_info_by_id", lambda: db_manager.get_instructor_info_by_id(instructor_id)),
+        ("db.get_punch_counts", lambda: db_manager.get_punch_counts(day)),
+        ("db.is_master_key", lambda: db_manager.is_master_key(uid)),
+        ("db.get_master_keys", lambda: db_manager.get_master_keys()),
+    ]
+    for table_name in ("time_records", "meeting_records"):
+        cases += [
+            (f"db.get_last_record[{table_name}]",
+             lambda t=table_name: db_manager.get_last_record(uid, t)),
+            (f"db.get_date_records[{table_name}]",
+             lambda t=table_name: db_manager.get_date_records(day, t)),
+            (f"db.count_date_records[{table_name}]",
+             lambda t=table_name: db_manager.count_date_records(day, t)),
+            (f"db.get_date_records_page[{table_name}]",
+             lambda t=table_name: db_manager.get_date_records_page(day, t, None, 100)),
+            (f"db.iter_date_records[{table_name}]",
+             lambda t=table_name: consume(db_manager.iter_date_records(day, t))),
+            (f"db.get_date_records_by_uid[{table_name}]",
+             lambda t=table_name: db_manager.get_date_records_by_uid(uid, day, t)),
+            (f"db.get_date_records_with_id[{table_name}]",
+             lambda t=table_name: db_manager.get_date_records_with_id(day, t)),
+            (f"db.get_date_summary[{table_name}]",
+             lambda t=table_name: db_manager.get_date_summary(day, t)),
+            (f"db.count_date_summary[{table_name}]",
+             lambda t=table_name: db_manager.count_date_summary(day, t)),
+            (f"db.get_date_summary_page[{table_name}]",
+             lambda t=table_name: db_manager.get_date_summary_page(day, t, None, 100)),
+            (f"db.get_monthly_dates[{table_name}]",
+             lambda t=table_name: db_manager.get_monthly_dates(month, t)),
+            (f"db.get_monthly_summary_data[{table_name}]",
+             lambda t=table_name: db_manager.get_monthly_summary_data(month, t)),
+            (f"db.get_instructor_monthly_records[{table_name}]",
+             lambda t=table_name: db_manager.get_instructor_monthly_records(month, instructor_id, t)),
+            (f"db.get_instructor_monthly_first_last[{table_name}]",
+             lambda t=table_name: db_manager.get_instructor_monthly_first_last(month, instructor_id, t)),
+            (f"db.iter_monthly_first_last[{table_name}]",
+             lambda t=table_name: consume(db_manager.iter_monthly_first_last(month, t))),
+        ]
+    return cases
+
+
+def export_cases(db_manager, day, month):
+    """エクスポートの計測項目 [(名前, 関数)]（カレントディレクトリに出力する）"""
+    csv_exporter = CSVExporter(db_manager)
+    monthly_exporter = MonthlyExporter(db_manager, csv_exporter)
+    cases = []
+    for table_name in ("time_records", "meeting_records"):
+        cases += [
+            (f"export.daily[{table_name}]",
+             lambda t=table_name: csv_exporter.export_records_to_csv(day, t)),
+            (f"export.monthly[{table_name}]",
+             lambda t=table_name: monthly_exporter.export_monthly_summary_to_csv(month, t, include_daily=False)),
+            (f"export.monthly_with_daily[{table_name}]",
+             lambda t=table_name: monthly_exporter.export_monthly_summary_to_csv(month, t, include_daily=True)),
+        ]
+    cases.append(("export.monthly_combined", lambda: monthly_exporter.export_combined_monthly_summary(month)))
+    return cases
+
+
+def write_cases(db_manager, day, uid, instructor_id, state):
+    """書き込みメソッドの計測項目 [(名前, 関数)]（実行のたびに別のデータを書き込む）"""
+    
+    def next_seq():
+        state['seq'] += 1
+        return state['seq']
+    
+    def record_one():
+        seq = next_seq()
+        timestamp = f"{day} 23:{seq // 60 % 60:02d}:{seq % 60:02d}"
+        return db_manager.record_attendance_to_db(uid, "計測", instructor_id, "OUT", timestamp)
+    
+    def record_batch():
+        entries = []
+        for _ in range(50):
+            seq = next_seq()
+            entries.append({'seq': seq, 'table': "time_records", 'card_uid': uid, 'name': "計測",
+                            'instructor_id': instructor_id, 'record_type': "OUT",
+                            'timestamp': f"{day} 22:{seq // 60 % 60:02d}:{seq % 60:02d}"})
+        db_manager.record_attendance_batch(entries)
+    
+    def delete_one():
+        record_id = db_manager.get_date_records_page(day, "time_records", None, 1)[0][0]
+        return db_manager.delete_attendance_record(record_id, "time_records")
+    
+    def import_instructors():
+        # 講師をまとめて登録（100人）
+        for _ in range(100):
+            seq = next_seq()
+            db_manager.add_instructor_with_id(900000 + seq, f"BENCH{seq:08X}", f"計測講師{seq}")
+    
+    def add_master_key():
+        seq = next_seq()
+        return db_manager.add_master_key(f"MASTER{seq:08X}", "計測")
+    
+    return [
+        ("db.record_attendance_to_db", record_one),
+        ("db.record_attendance_batch[50]", record_batch),
+        ("db.delete_attendance_record", delete_one),
+        ("db.add_master_key", add_master_key),
+        ("import.add_instructor_with_id[100]", import_instructors),
+    ]
+
+
+def run_case(func, repeat, warmup):
+    """1項目を計測（ミリ秒のリスト）"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """前回の結果と比較（中央値が threshold の割合かつ min_delta_ms 以上遅くなれば regression）"""
+    comparison = {}
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            comparison[name] = {'status': 'new'}
+            continue
+        
+        base_ms = base['median_ms']
+        current_ms = result['median_ms']
+        ratio = current_ms / base_ms if base_ms > 0 else 1.0
+        if current_ms > base_ms * (1 + threshold) and current_ms - base_ms >= min_delta_ms:
+            status = 'regression'
+        elif current_ms < base_ms * (1 - threshold) and base_ms - current_ms >= min_delta_ms:
+            status = 'improved'
+        else:
+            status = 'ok'
+        comparison[name] = {'status': status, 'baseline_ms': base_ms, 'ratio': round(ratio, 3)}
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DatabaseManager・エクスポート処理のベンチマーク一式")
+    parser.add_argument("--instructors", type=int, default=500, help="講師数")
+    parser.add_argument("--years", type=int, default=5, help="打刻の年数")
+    parser.add_argument("--start-year", type=int, default=2021, help="最初の年")
+    parser.add_argument("--seed", type=int, default=1, help="乱数の種")
+    parser.add_argument("--db", help="合成DBのパス（なければ作成し、あれば再利用する）")
+    parser.add_argument("--repeat", type=int, default=5, help="1項目あたりの計測回数")
+    parser.add_argument("--warmup", type=int, default=1, help="計測前に実行する回数")
+    parser.add_argument("--archive", action="store_true",
+                        help="締めた年の打刻を年ごとのアーカイブに移してから計測（アーカイブの検索を計測する）")
+    parser.add_argument("--filter", default="", help="名前にこの文字列を含む項目だけ計測")
+    parser.add_argument("--output", default="benchmark_results.json", help="結果のJSONファイル")
+    parser.add_argument("--baseline", help="比較する前回の結果のJSONファイル")
+    parser.add_argument("--threshold", type=float, default=0.2, help="遅くなったと判定する割合（0.2 = 20%%）")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="遅くなったと判定する最小の差（ms）")
+    args = parser.parse_args()
+    
+    work_dir = tempfile.mkdtemp(prefix="kintouch_bench_")
+    original_dir = os.getcwd()
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    
+    try:
+        # 合成DBを用意（書き込みの計測で変更されるため作業ディレクトリにコピーして使う）
+        source_db = os.path.abspath(args.db) if args.db else os.path.join(work_dir, "source.db")
+        started = time.perf_counter()
+        if not os.path.exists(source_db):
+            db_manager, _ = build_synthetic_db(source_db, args.instructors, args.start_year,
+                                               args.years, args.seed)
+            db_manager.close()
+            print(f"合成データ作成: {time.perf_counter() - started:.1f}秒", file=sys.stderr)
+        
+        db_path = os.path.join(work_dir, "attendance.db")
+        shutil.copyfile(source_db, db_path)
+        os.chdir(work_dir)
+        
+        db_manager = DatabaseManager(db_path)
+        conn = sqlite3.connect(db_path)
+        record_count = sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                           for t in ("time_records", "meeting_records"))
+        instructor_count = conn.execute("SELECT COUNT(*) FROM instructors").fetchone()[0]
+        last_timestamp = conn.execute("SELECT MAX(timestamp) FROM time_records").fetchone()[0]
+        instructor_id, uid = conn.execute(
+            "SELECT instructor_id, card_uid FROM instructors ORDER BY instructor_id LIMIT 1"
+        ).fetchone()
+        conn.close()
+        
+        # 最後の年の最後の打刻日・月を計測に使う
+        day = last_timestamp[:10]
+        month = last_timestamp[:7]
+        state = {'seq': 0}
+        
+        archived_years = []
+        if args.archive:
+            started = time.perf_counter()
+            archived_years = db_manager.archive_closed_periods()
+            print(f"アーカイブ作成: {archived_years} {time.perf_counter() - started:.1f}秒", file=sys.stderr)
+            # アーカイブ作成・VACUUM の書き込みがディスクへ書き出されるのを待つ（エクスポートの計測に影響する）
+            if hasattr(os, 'sync'):
+                os.sync()
+        
+        cases = (read_cases(db_manager, day, month, uid, instructor_id)
+                 + export_cases(db_manager, day, month)
+                 + write_cases(db_manager, day, uid, instructor_id, state))
+        
+        results = {}
+        for name, func in cases:
+            if args.filter not in name:
+                continue
+            timings = run_case(func, args.repeat, args.warmup)
+            results[name] = {
+                'median_ms': round(statistics.median(timings), 3),
+                'min_ms': round(min(timings), 3),
+                'max_ms': round(max(timings), 3),
+                'runs': len(timings),
+            }
+            print(f"{name:<52} {results[name]['median_ms']:>10.2f} ms", file=sys.stderr)
+        db_manager.close()
+        
+        report = {
+            'version': RESULT_FORMAT_VERSION,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+            },
+            'dataset': {
+                'instructors': instructor_count,
+                'records': record_count,
+                'years': args.years,
+                'start_year': args.start_year,
+                'day': day,
+                'month': month,
+                'archived_years': archived_years,
+            },
+            'settings': {'repeat': args.repeat, 'warmup': args.warmup},
+            'results': results,
+        }
+        
+        regressions = []
+        if baseline_path:
+            with open(baseline_path, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            report['comparison'] = compare(results, baseline, args.threshold, args.min_delta_ms)
+            report['threshold'] = {'ratio': args.threshold, 'min_delta_ms': args.min_delta_ms}
+            regressions = [name for name, c in report['comparison'].items() if c['status'] == 'regression']
+            for name in regressions:
+                c = report['comparison'][name]
+                print(f"遅くなった項目: {name} {c['baseline_ms']:.2f} ms → "
+                      f"{results[name]['median_ms']:.2f} ms ({c['ratio']:.2f}倍)", file=sys.stderr)
+        
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"結果: {output_path}", file=sys.stderr)
+        return 1 if regressions else 0
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
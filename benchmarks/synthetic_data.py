@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""ベンチマーク用の合成データベース"""
+
+import random
+import sqlite3
+from datetime import date, timedelta
+
+from modules.database_manager import DatabaseManager
+
+
+def synthetic_instructors(instructor_count):
+    """(講師番号, カードUID, 講師名) のリスト"""
+    return [(instructor_id, f"{instructor_id:08X}", f"講師{instructor_id:03d}")
+            for instructor_id in range(1, instructor_count + 1)]
+
+
+def synthetic_punches(instructors, year, rng):
+    """1年分の打刻（平日に出勤・退勤、会議は水曜日）"""
+    time_rows = []
+    meeting_rows = []
+    day = date(year, 1, 1)
+    while day.year == year:
+        if day.weekday() < 5:
+            for instructor_id, card_uid, name in instructors:
+                # 7割の講師がその日に出勤する
+                if rng.random() < 0.7:
+                    start_minute = rng.randint(8 * 60, 11 * 60)
+                    end_minute = start_minute + rng.randint(120, 480)
+                    for record_type, minute in (("IN", start_minute), ("OUT", end_minute)):
+                        timestamp = f"{day.isoformat()} {minute // 60:02d}:{minute % 60:02d}:{rng.randint(0, 59):02d}"
+                        time_rows.append((instructor_id, card_uid, name, record_type, timestamp))
+                if day.weekday() == 2 and rng.random() < 0.5:
+                    timestamp = f"{day.isoformat()} 18:{rng.randint(0, 59):02d}:00"
+                    meeting_rows.append((instructor_id, card_uid, name, "IN", timestamp))
+        day += timedelta(days=1)
+    return time_rows, meeting_rows
+
+
+def build_synthetic_db(db_path, instructor_count, start_year, years=1, seed=1):
+    """合成データベースを作成（戻り値: (DatabaseManager, 打刻件数)）"""
+    db_manager = DatabaseManager(db_path)
+    rng = random.Random(seed)
+    instructors = synthetic_instructors(instructor_count)
+    record_count = 0
+    
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO instructors (instructor_id, card_uid, name, created_at) VALUES (?, ?, ?, ?)",
+            [(instructor_id, card_uid, name, f"{start_year}-01-01 00:00:00")
+             for instructor_id, card_uid, name in instructors]
+        )
+    
+    # 1年ずつ作成して書き込む（大きなデータでもメモリに載せきらない）
+    for year in range(start_year, start_year + years):
+        time_rows, meeting_rows = synthetic_punches(instructors, year, rng)
+        with conn:
+            for table_name, rows in (("time_records", time_rows), ("meeting_records", meeting_rows)):
+                conn.executemany(f"""
+                    INSERT INTO {table_name} (instructor_id, card_uid, instructor_name, record_type, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                """, rows)
+        record_count += len(time_rows) + len(meeting_rows)
+    conn.close()
+    
+    # 打刻テーブルに直接書き込んだので講師・日付ごとの打刻集計を作り直す
+    db_manager.rebuild_daily_attendance()
+    db_manager.directory.invalidate()
+    return db_manager, record_count
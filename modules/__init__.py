@@ -1,12 +1,39 @@
 # 出退勤管理システム - モジュールパッケージ
 
-from .constants import JST, PASSWORD_HASH, DATA_DIR, CONFIG_PATH, WINDOW_WIDTH, WINDOW_HEIGHT
-from .database_manager import DatabaseManager
-from .card_reader_manager import CardReaderManager
-from .csv_exporter import CSVExporter
-from .monthly_exporter import MonthlyExporter
-from .utils import ConfigManager, SoundManager
-from .correction_manager import CorrectionManager
+import importlib
+
+from .constants import JST, PASSWORD_HASH, DATA_DIR, CONFIG_PATH, WINDOW_WIDTH, WINDOW_HEIGHT, CHANNEL_EXTRA_COLORS
+from .metrics import metrics
+
+# クラスは使われるときに読み込む（起動時に pyscard・エクスポート・tkinter の画面部品を読み込まない）
+_LAZY_IMPORTS = {
+    'DatabaseManager': '.database_manager',
+    'CardReaderManager': '.card_reader_manager',
+    'CARD_INSERTED': '.card_reader_manager',
+    'CARD_REMOVED': '.card_reader_manager',
+    'READ_OK': '.card_reader_manager',
+    'CSVExporter': '.csv_exporter',
+    'MonthlyExporter': '.monthly_exporter',
+    'ExportJobRunner': '.export_job_runner',
+    'EventBus': '.event_bus',
+    'AttendanceService': '.attendance_service',
+    'ConfigManager': '.utils',
+    'SoundManager': '.utils',
+    'CorrectionManager': '.correction_manager',
+    'VirtualTable': '.virtual_table',
+    'BackgroundLoader': '.background_loader',
+    'Channel': '.channel_registry',
+    'ChannelRegistry': '.channel_registry',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     'JST',
@@ -15,11 +42,23 @@ __all__ = [
     'CONFIG_PATH',
     'WINDOW_WIDTH',
     'WINDOW_HEIGHT',
+    'CHANNEL_EXTRA_COLORS',
     'DatabaseManager',
     'CardReaderManager',
+    'CARD_INSERTED',
+    'CARD_REMOVED',
+    'READ_OK',
     'CSVExporter',
     'MonthlyExporter',
+    'ExportJobRunner',
+    'EventBus',
+    'AttendanceService',
     'ConfigManager',
     'SoundManager',
+    'metrics',
     'CorrectionManager',
-]
+    'VirtualTable',
+    'BackgroundLoader',
+    'Channel',
+    'ChannelRegistry',
+]
\ No newline at end of file
@@ -0,0 +1,78 @@
+# 出退勤管理システム - 打刻アーカイブ一覧モジュール
+
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from modules.constants import ARCHIVE_FILE_NAME
+
+class ArchiveCatalog:
+    """年ごとの打刻アーカイブDB（archive/attendance_YYYY.db）の一覧"""
+    
+    # アーカイブには1年分の打刻テーブルと打刻集計（daily_attendance）が入っている。
+    # 一覧は起動時にフォルダーのファイル名から作り、テーブルの一覧は最初に使うときに読み込む。
+    
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self._lock = threading.Lock()
+        self._years = set()
+        self._tables = {}
+        pattern = re.escape(ARCHIVE_FILE_NAME).replace(re.escape("{year}"), r"(\d{4})")
+        self._file_pattern = re.compile(f"^{pattern}$")
+    
+    def refresh(self):
+        """フォルダーのアーカイブを読み込み直す"""
+        years = set()
+        if os.path.isdir(self.archive_dir):
+            for file_name in os.listdir(self.archive_dir):
+                match = self._file_pattern.match(file_name)
+                if match:
+                    years.add(int(match.group(1)))
+        with self._lock:
+            self._years = years
+            self._tables = {}
+    
+    def path(self, year):
+        """年のアーカイブのパス"""
+        return os.path.join(self.archive_dir, ARCHIVE_FILE_NAME.format(year=year))
+    
+    def add(self, year):
+        """アーカイブを作成した年を追加"""
+        with self._lock:
+            self._years.add(year)
+            self._tables.pop(year, None)
+    
+    def years(self):
+        with self._lock:
+            return sorted(self._years)
+    
+    def __contains__(self, year):
+        with self._lock:
+            return year in self._years
+    
+    def tables(self, year):
+        """アーカイブにあるテーブル名"""
+        with self._lock:
+            tables = self._tables.get(year)
+        if tables is not None:
+            return tables
+        
+        try:
+            uri = Path(self.path(year)).absolute().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True)
+            try:
+                tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"アーカイブ読み込みエラー ({year}): {e}")
+            return set()
+        with self._lock:
+            self._tables[year] = tables
+        return tables
+    
+    def invalidate_tables(self, year):
+        """テーブルを追加したアーカイブのテーブル名を読み込み直す"""
+        with self._lock:
+            self._tables.pop(year, None)
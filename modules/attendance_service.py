@@ -0,0 +1,327 @@
+# 出退勤管理システム - 打刻受付サービスモジュール（画面なしで動作）
+
+import os
+import queue
+import threading
+import time
+from modules.constants import DATA_DIR, CONFIG_PATH
+from modules.database_manager import DatabaseManager
+from modules.card_reader_manager import CardReaderManager, CARD_INSERTED, CARD_REMOVED, READ_OK
+from modules.event_bus import EventBus
+from modules.metrics import metrics
+from modules.reader_supervisor import ReaderSupervisor
+from modules.tap_debouncer import TapDebouncer
+from modules.utils import ConfigManager, SoundManager
+
+class AttendanceService:
+    """カード監視・出勤/退勤の判定・DBへの記録・音による通知を行うクラス（tkinter を使わない）"""
+    
+    # 処理の状況は bus にイベント（辞書）で通知する。画面はこれを購読して表示するだけにする。
+    #   reader_status: {'type', 'channel', 'status'}  status は 'waiting' / 'unavailable' / 'reconnecting'
+    #   card_detected: {'type', 'channel', 'uid'}
+    #   unknown_card:  {'type', 'channel', 'uid'}
+    #   punch:         {'type', 'channel', 'uid', 'instructor_id', 'name', 'record_type', 'timestamp', 'started_at'}
+    #                  started_at は打刻処理を始めた時刻（time.perf_counter 基準、画面表示までの時間の計測用）
+    #   punch_failed:  {'type', 'channel', 'uid'}
+    #   duplicate_tap: {'type', 'channel', 'uid', 'instructor_id', 'name', 'record_type', 'timestamp'}
+    #                  DUPLICATE_TAP_WINDOW 秒以内の同じカード・同じチャンネルの打刻（記録しない）。値は直前の打刻
+    
+    def __init__(self, db_manager, card_reader_manager, sound_manager, bus=None, supervisor=None, debouncer=None):
+        self.db_manager = db_manager
+        self.card_reader_manager = card_reader_manager
+        self.sound_manager = sound_manager
+        self.bus = bus if bus is not None else EventBus()
+        # リーダーの抜き差しを監視して割り当て直す（監視開始時に作成）
+        self.supervisor = supervisor
+        # 二度かざしの抑止（全リーダーで共有）
+        self.debouncer = debouncer if debouncer is not None else TapDebouncer()
+        self.monitoring = False
+        self._stopped = threading.Event()
+        self._watcher = None
+        self._thread = None
+        # チャンネル→(抜き差しのキュー, 読み取り・打刻処理スレッド)
+        self._workers = {}
+    
+    @property
+    def channels(self):
+        """チャンネル（リーダー名・記録先テーブル）の対応（CardReaderManager の設定を使う）"""
+        return self.card_reader_manager.channels
+    
+    def readers(self):
+        """チャンネルごとのリーダー"""
+        return {channel.key: self.card_reader_manager.get_reader(channel.key) for channel in self.channels}
+    
+    def start(self):
+        """記録先テーブルを用意し、リーダーの抜き差しの監視とカード監視スレッドを開始"""
+        if self.monitoring:
+            return
+        for table_name in self.channels.tables():
+            self.db_manager.ensure_record_table(table_name)
+        self.monitoring = True
+        self._stopped.clear()
+        if self.supervisor is None:
+            self.supervisor = ReaderSupervisor(self.card_reader_manager, bus=self.bus)
+        self.supervisor.start()
+        self._thread = threading.Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=2.0):
+        """監視を停止してスレッドの終了を待つ"""
+        self.monitoring = False
+        self._stopped.set()
+        if self.supervisor is not None:
+            self.supervisor.stop(timeout)
+        watcher = self._watcher
+        if watcher is not None:
+            watcher.stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        workers, self._workers = self._workers, {}
+        for events, _ in workers.values():
+            events.put(None)
+        for _, thread in workers.values():
+            thread.join(timeout)
+    
+    def reader_health(self):
+        """チャンネルごとのリーダーの状態（監視を開始していなければ空）"""
+        return self.supervisor.health() if self.supervisor is not None else {}
+    
+    def _monitor(self):
+        """カード監視スレッド（全リーダーを1回の待機で監視する）"""
+        try:
+            watcher = self.card_reader_manager.create_watcher()
+        except Exception as e:
+            print(f"監視エラー: {e}")
+            for channel in self.channels:
+                self.bus.publish({'type': 'reader_status', 'channel': channel.key, 'status': 'unavailable'})
+            return
+        self._watcher = watcher
+        
+        for channel, reader in self.readers().items():
+            if reader is None:
+                self.bus.publish({'type': 'reader_status', 'channel': channel, 'status': 'unavailable'})
+        
+        watching = {}
+        retry_at = {}
+        try:
+            while self.monitoring:
+                watching = self._update_watching(watcher, watching, retry_at)
+                if not watching:
+                    # 監視できるリーダーがなければ、割り当て・監視の再開を待つ
+                    self._stopped.wait(0.5)
+                    continue
+                
+                # カードの抜き差しをイベントで待つ（ポーリングしない）
+                try:
+                    events, failed = watcher.wait_events()
+                except Exception as e:
+                    events = []
+                    failed = {reader.name: e for reader in watching.values()}
+                
+                channels = {reader.name: channel for channel, reader in watching.items()}
+                for reader_name, error in failed.items():
+                    channel = channels.get(reader_name)
+                    if channel is None:
+                        continue
+                    # 取り外し・ドライバーのエラーなど（待ってから監視をやり直す）
+                    print(f"監視エラー ({channel}): {error}")
+                    retry_at[channel] = time.monotonic() + self.supervisor.report_error(channel, error)
+                
+                channel_events = {channels[reader_name]: event for reader_name, event in events
+                                  if reader_name in channels}
+                for channel, reader in watching.items():
+                    if reader.name not in failed:
+                        self.supervisor.report_ok(channel, channel_events.get(channel))
+                
+                # UIDの読み取り・打刻はチャンネルごとのスレッドで行い、監視はすぐに待機に戻る
+                for channel, event in channel_events.items():
+                    if watching[channel].name not in failed:
+                        self._dispatch(channel, watching[channel], event)
+        finally:
+            self._watcher = None
+            watcher.close()
+    
+    def _update_watching(self, watcher, watching, retry_at):
+        """監視するリーダーを更新（割り当てのないチャンネル・エラー後の待ち時間中のチャンネルは外す）"""
+        now = time.monotonic()
+        current = {}
+        for channel in self.channels:
+            reader = self.card_reader_manager.get_reader(channel.key)
+            if reader is not None and retry_at.get(channel.key, 0) <= now:
+                current[channel.key] = reader
+        
+        for channel in watching:
+            if current.get(channel) is not watching[channel] and channel in self._workers:
+                # リーダーが変わったら直前のカードを忘れる
+                self._dispatch(channel, watching[channel], CARD_REMOVED)
+        for channel, reader in current.items():
+            if watching.get(channel) is not reader:
+                retry_at.pop(channel, None)
+                self.bus.publish({'type': 'reader_status', 'channel': channel, 'status': 'waiting'})
+        
+        if [reader.name for reader in current.values()] != [reader.name for reader in watching.values()]:
+            watcher.set_readers([reader.name for reader in current.values()])
+        return current
+    
+    def _dispatch(self, channel, reader, event):
+        """カードの抜き差しをチャンネルの処理スレッドに渡す（スレッドは最初のイベントで開始）"""
+        worker = self._workers.get(channel)
+        if worker is None:
+            events = queue.Queue()
+            thread = threading.Thread(target=self._channel_worker, args=(channel, events), daemon=True)
+            worker = self._workers[channel] = (events, thread)
+            thread.start()
+        worker[0].put((reader, event))
+    
+    def _channel_worker(self, channel, events):
+        """チャンネル1つの読み取り・打刻処理スレッド（抜き差しを届いた順に処理する）"""
+        last_uid = None
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            reader, event = item
+            last_uid = self._handle_event(channel, reader, event, last_uid, events)
+    
+    def _handle_event(self, channel, reader, event, last_uid, events):
+        """カードの抜き差しを処理（かざされたらUIDを読み取って打刻、戻り値: かざされているカードのUID）"""
+        try:
+            if event == CARD_INSERTED:
+                started_at = time.perf_counter()
+                # かざした直後は読み取りに失敗することがあるため数回試す
+                # （次の抜き差しが届いていればもう離されているため試さない）
+                for attempt in range(3):
+                    result = self.card_reader_manager.read_uid(reader)
+                    if result['status'] == READ_OK:
+                        uid = result['uid']
+                        if uid != last_uid:
+                            self.process_card(uid, channel, started_at)
+                        return uid
+                    if not events.empty() or self._stopped.wait(0.1):
+                        break
+                metrics.increment("punch.read_failed")
+            elif event == CARD_REMOVED:
+                return None
+        except Exception as e:
+            print(f"打刻処理エラー ({channel}): {e}")
+        return last_uid
+    
+    def process_card(self, uid, channel, started_at=None):
+        """打刻処理（1回目の打刻は出勤、2回目以降は退勤）"""
+        if started_at is None:
+            started_at = time.perf_counter()
+        with metrics.span("punch.process"):
+            punched = self._process_card(uid, channel, started_at)
+        metrics.observe_ms("punch.total", (time.perf_counter() - started_at) * 1000)
+        return punched
+    
+    def _process_card(self, uid, channel, started_at):
+        # 直前に打刻したカードは記録しない（DBは検索しない）
+        last_punch = self.debouncer.check(uid, channel)
+        if last_punch is not None:
+            self.sound_manager.play_beep("duplicate")
+            metrics.increment("punch.duplicate")
+            self.bus.publish(dict(last_punch, type='duplicate_tap', channel=channel, uid=uid))
+            return None
+        
+        self.sound_manager.play_beep("card_detected")
+        self.bus.publish({'type': 'card_detected', 'channel': channel, 'uid': uid})
+        
+        instructor_info = self.db_manager.get_instructor_info_by_uid(uid)
+        if not instructor_info:
+            self.sound_manager.play_beep("error")
+            metrics.increment("punch.unknown_card")
+            self.bus.publish({'type': 'unknown_card', 'channel': channel, 'uid': uid})
+            return None
+        
+        # 当日の打刻回数はメモリで管理
+        punched = self.db_manager.record_punch(uid, instructor_info['name'],
+                                               instructor_info['instructor_id'], self.channels.table(channel))
+        if not punched:
+            self.sound_manager.play_beep("error")
+            metrics.increment("punch.failed")
+            self.bus.publish({'type': 'punch_failed', 'channel': channel, 'uid': uid})
+            return None
+        
+        record_type, timestamp_str = punched
+        self.debouncer.record(uid, channel, {
+            'instructor_id': instructor_info['instructor_id'],
+            'name': instructor_info['name'],
+            'record_type': record_type,
+            'timestamp': timestamp_str
+        })
+        self.sound_manager.play_beep("success")
+        metrics.increment("punch.recorded")
+        self.bus.publish({
+            'type': 'punch',
+            'channel': channel,
+            'uid': uid,
+            'instructor_id': instructor_info['instructor_id'],
+            'name': instructor_info['name'],
+            'record_type': record_type,
+            'timestamp': timestamp_str,
+            'started_at': started_at
+        })
+        return punched
+
+
+def print_event(event, channels=None):
+    """イベントをコンソールに表示（画面なしで実行する場合）"""
+    channel = channels.label(event['channel']) if channels is not None else event['channel']
+    if event['type'] == 'reader_status':
+        status = {'waiting': "カード待機中", 'reconnecting': "リーダー再接続中"}.get(event['status'], "リーダー未接続")
+        print(f"[{channel}] {status}")
+    elif event['type'] == 'unknown_card':
+        print(f"[{channel}] 未登録のカードです: {event['uid']}")
+    elif event['type'] == 'punch':
+        action = "出勤" if event['record_type'] == "IN" else "退勤"
+        print(f"[{channel}] {event['timestamp']} {event['instructor_id']} {event['name']} 【{action}】")
+    elif event['type'] == 'punch_failed':
+        print(f"[{channel}] 記録に失敗しました: {event['uid']}")
+    elif event['type'] == 'duplicate_tap':
+        action = "出勤" if event['record_type'] == "IN" else "退勤"
+        print(f"[{channel}] {event['instructor_id']} {event['name']} 打刻済みです（{event['timestamp']} {action}）")
+
+
+def main():
+    """画面なしで打刻受付を実行（python -m modules.attendance_service）"""
+    config = ConfigManager(CONFIG_PATH).load_config()
+    if not config:
+        print("リーダーが設定されていません（画面版のリーダー設定で設定してください）")
+        return 1
+    
+    card_reader_manager = CardReaderManager()
+    if not card_reader_manager.initialize_channels(config['channels']):
+        print("リーダーの初期化に失敗しました（設定を確認してください）")
+        return 1
+    
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+    db_manager = DatabaseManager(os.path.join(DATA_DIR, "attendance.db"))
+    sound_manager = SoundManager()
+    
+    service = AttendanceService(db_manager, card_reader_manager, sound_manager)
+    service.bus.subscribe(lambda event: print_event(event, card_reader_manager.channels))
+    # 締めた年の打刻をアーカイブに移動（打刻受付は待たずに開始する）
+    threading.Thread(target=db_manager.archive_closed_periods, daemon=True).start()
+    if metrics.enabled:
+        metrics.start_log(os.path.join(DATA_DIR, "metrics.log"))
+    service.start()
+    print("打刻受付を開始しました（Ctrl+C で終了）")
+    
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        sound_manager.stop()
+        metrics.stop_log()
+        db_manager.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
\ No newline at end of file
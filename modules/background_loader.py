@@ -0,0 +1,68 @@
+# 出退勤管理システム - 画面表示用データのバックグラウンド読み込みモジュール
+
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from modules.constants import LOAD_MAX_WORKERS
+
+class BackgroundLoader:
+    """画面に表示するデータをスレッドプールで読み込み、結果を root.after で画面側に渡すクラス"""
+    
+    # 同じ名前の読み込みが続けて要求された場合は、最後の要求の結果だけを画面に渡す
+    # （要求ごとに世代番号を進め、古い世代の結果は破棄する）。
+    
+    def __init__(self, root, max_workers=LOAD_MAX_WORKERS):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="loader")
+        self._lock = threading.Lock()
+        self._generations = {}
+    
+    def load(self, name, tasks, on_done, on_error=None):
+        """tasks（キー → 引数なしの関数）を並行して実行し、すべて終わったら画面のスレッドで on_done(結果の辞書) を呼び出す"""
+        with self._lock:
+            generation = self._generations.get(name, 0) + 1
+            self._generations[name] = generation
+        
+        futures = {}
+        remaining = [len(tasks)]
+        
+        def collect(future):
+            with self._lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            try:
+                self.root.after(0, lambda: self._deliver(name, generation, futures, on_done, on_error))
+            except (RuntimeError, tk.TclError):
+                # 画面が閉じられた後に読み込みが終わった
+                pass
+        
+        for key, func in tasks.items():
+            futures[key] = self._executor.submit(func)
+        for future in futures.values():
+            future.add_done_callback(collect)
+        return generation
+    
+    def discard(self, name):
+        """読み込み中の結果を破棄（画面を移動した場合など）"""
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+    
+    def _deliver(self, name, generation, futures, on_done, on_error):
+        """読み込み結果を画面に渡す（画面のスレッドで実行）"""
+        with self._lock:
+            if self._generations.get(name) != generation:
+                return
+        
+        try:
+            results = {key: future.result() for key, future in futures.items()}
+        except Exception as e:
+            print(f"データ読み込みエラー ({name}): {e}")
+            if on_error:
+                on_error(e)
+            return
+        on_done(results)
+    
+    def stop(self):
+        """待ちの読み込みを取り消してスレッドを終了"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
@@ -1,50 +1,516 @@
 # 出退勤管理システム - カードリーダー管理モジュール
 
-from smartcard.System import readers
-from smartcard.util import toHexString
-from smartcard.Exceptions import CardConnectionException, NoCardException
+import threading
+import time
+from collections import deque
+from modules.channel_registry import ChannelRegistry
+from modules.metrics import metrics
+
+try:
+    from smartcard.System import readers
+    from smartcard.util import toHexString
+    from smartcard.Exceptions import CardConnectionException, NoCardException
+    from smartcard.scard import (
+        SCardEstablishContext, SCardReleaseContext, SCardGetStatusChange, SCardCancel,
+        SCardGetErrorMessage, SCARD_SCOPE_USER, SCARD_S_SUCCESS, SCARD_E_TIMEOUT,
+        SCARD_E_CANCELLED, SCARD_STATE_UNAWARE, SCARD_STATE_EMPTY, SCARD_STATE_PRESENT,
+        SCARD_STATE_CHANGED, SCARD_STATE_UNKNOWN, SCARD_STATE_UNAVAILABLE
+    )
+except ImportError:
+    # pyscard がない環境ではシミュレーターのバックエンドだけを使用できる
+    readers = None
+    
+    class CardConnectionException(Exception):
+        pass
+    
+    class NoCardException(Exception):
+        pass
+    
+    def toHexString(data):
+        return " ".join(f"{value:02X}" for value in data)
+
+# カード状態イベント
+CARD_INSERTED = "inserted"
+CARD_REMOVED = "removed"
+
+# UID読み取り結果
+READ_OK = "ok"
+READ_NO_CARD = "no_card"
+READ_ERROR = "error"
+
+# UID取得APDU
+GET_UID_APDU = [0xFF, 0xCA, 0x00, 0x00, 0x00]
+
+# リーダーの追加・取り外しを通知するPC/SCの仮想リーダー名
+PNP_NOTIFICATION = "\\\\?PnP?\\Notification"
+
+
+class PcscStatusBackend:
+    """PC/SCのSCardGetStatusChangeでカード状態の変化を待つバックエンド"""
+    
+    def __init__(self):
+        hresult, self.hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
+        if hresult != SCARD_S_SUCCESS:
+            raise RuntimeError(f"PC/SCコンテキスト作成エラー: {SCardGetErrorMessage(hresult)}")
+        # リーダー名→前回の SCardGetStatusChange が返した状態（上位16ビットはカードの抜き差しの回数）
+        self._event_states = {}
+    
+    def wait_for_changes(self, states, timeout_ms):
+        """複数のリーダーのカードの有無が変わるまで1回の SCardGetStatusChange で待機
+        
+        states: {リーダー名: カードの有無}。None のリーダーがあれば現在の状態をすぐに返す。
+        戻り値: ({リーダー名: カードの有無}（変わったリーダーのみ）, {リーダー名: エラー内容}（使えないリーダー））
+                タイムアウト・中断時は ({}, {})
+        """
+        # 前回返された状態をそのまま渡し、待機していない間の抜き差しも変化として返させる
+        self._event_states = {reader_name: event_state for reader_name, event_state in self._event_states.items()
+                              if states.get(reader_name) is not None}
+        reader_states = []
+        for reader_name, present in states.items():
+            if present is None:
+                current_state = SCARD_STATE_UNAWARE
+            elif reader_name in self._event_states:
+                current_state = self._event_states[reader_name]
+            else:
+                current_state = SCARD_STATE_PRESENT if present else SCARD_STATE_EMPTY
+            reader_states.append((reader_name, current_state))
+        
+        hresult, results = SCardGetStatusChange(self.hcontext, timeout_ms, reader_states)
+        if hresult in (SCARD_E_TIMEOUT, SCARD_E_CANCELLED):
+            return {}, {}
+        if hresult != SCARD_S_SUCCESS:
+            raise RuntimeError(f"カード状態取得エラー: {SCardGetErrorMessage(hresult)}")
+        
+        changes = {}
+        failed = {}
+        for reader_name, event_state, _ in results:
+            previous_state = self._event_states.pop(reader_name, None)
+            if event_state & (SCARD_STATE_UNKNOWN | SCARD_STATE_UNAVAILABLE):
+                failed[reader_name] = f"リーダーが見つかりません: {reader_name}"
+                continue
+            self._event_states[reader_name] = event_state
+            present = bool(event_state & SCARD_STATE_PRESENT)
+            if present != states.get(reader_name):
+                changes[reader_name] = present
+            elif present and previous_state is not None and (event_state >> 16) != (previous_state >> 16):
+                # 離してすぐに次のカードがかざされた（抜き差しの回数だけが変わった）
+                changes[reader_name] = present
+        return changes, failed
+    
+    def cancel(self):
+        """待機中の wait_for_changes を中断"""
+        SCardCancel(self.hcontext)
+    
+    def close(self):
+        """コンテキストを解放"""
+        SCardReleaseContext(self.hcontext)
+
+
+class PcscReaderListBackend:
+    """PC/SCのリーダーの追加・取り外しを待つバックエンド（PnP通知を使用）"""
+    
+    def __init__(self):
+        hresult, self.hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
+        if hresult != SCARD_S_SUCCESS:
+            raise RuntimeError(f"PC/SCコンテキスト作成エラー: {SCardGetErrorMessage(hresult)}")
+        self._state = SCARD_STATE_UNAWARE
+    
+    def wait_for_change(self, timeout_ms):
+        """リーダーの一覧が変わるまで待機
+        
+        戻り値: 変わったら True、タイムアウト・中断時は False
+        """
+        hresult, states = SCardGetStatusChange(self.hcontext, timeout_ms, [(PNP_NOTIFICATION, self._state)])
+        if hresult in (SCARD_E_TIMEOUT, SCARD_E_CANCELLED):
+            return False
+        if hresult != SCARD_S_SUCCESS:
+            raise RuntimeError(f"リーダー一覧の監視エラー: {SCardGetErrorMessage(hresult)}")
+        
+        _, event_state, _ = states[0]
+        if event_state & SCARD_STATE_UNKNOWN:
+            raise RuntimeError("リーダーの追加・取り外しの通知に対応していません")
+        # 最初の呼び出しは現在の状態を取得するだけ
+        changed = self._state != SCARD_STATE_UNAWARE
+        self._state = event_state & ~SCARD_STATE_CHANGED
+        return changed
+    
+    def cancel(self):
+        """待機中の wait_for_change を中断"""
+        SCardCancel(self.hcontext)
+    
+    def close(self):
+        """コンテキストを解放"""
+        SCardReleaseContext(self.hcontext)
+
+
+class PcscReaderBackend:
+    """PC/SC（pyscard）のリーダーを使うバックエンド"""
+    
+    # リーダーのバックエンドは次の3つを持つ。
+    #   list_readers():         接続されているリーダー（.name と .createConnection() を持つ）のリスト
+    #   create_status_backend(): カードの抜き差しを待つオブジェクト（CardWatcher 1つにつき1つ）
+    #   create_reader_list_backend(): リーダーの追加・取り外しを待つオブジェクト（ReaderSupervisor が使う）
+    
+    def list_readers(self):
+        if readers is None:
+            raise RuntimeError("pyscard がインストールされていません")
+        return readers()
+    
+    def create_status_backend(self):
+        return PcscStatusBackend()
+    
+    def create_reader_list_backend(self):
+        return PcscReaderListBackend()
+
+
+class SimulatedCardBackend:
+    """カードの抜き差しをプログラムから発生させるバックエンド（動作確認用）"""
+    
+    # 抜き差しはリーダーごとに順番に記録し、監視側の待機が間に合わない速さで
+    # 抜き差ししても取りこぼさないようにする。
+    
+    def __init__(self):
+        self._cards = {}
+        self._changes = {}
+        self._disconnected = set()
+        self._condition = threading.Condition()
+        self._cancelled = False
+    
+    def insert(self, reader_name, uid):
+        """カードをかざす"""
+        with self._condition:
+            self._cards[reader_name] = uid
+            self._changes.setdefault(reader_name, deque()).append(True)
+            self._condition.notify_all()
+    
+    def remove(self, reader_name):
+        """カードを離す"""
+        with self._condition:
+            self._cards.pop(reader_name, None)
+            self._changes.setdefault(reader_name, deque()).append(False)
+            self._condition.notify_all()
+    
+    def set_connected(self, reader_name, connected):
+        """リーダーの接続・取り外し（取り外すと待機中の wait_for_changes はそのリーダーをエラーとして返す）"""
+        with self._condition:
+            if connected:
+                self._disconnected.discard(reader_name)
+            else:
+                self._disconnected.add(reader_name)
+                self._cards.pop(reader_name, None)
+            self._condition.notify_all()
+    
+    def is_connected(self, reader_name):
+        with self._condition:
+            return reader_name not in self._disconnected
+    
+    def get_uid(self, reader_name):
+        """かざされているカードのUID（なければ None）"""
+        with self._condition:
+            return self._cards.get(reader_name)
+    
+    def wait_for_changes(self, states, timeout_ms):
+        """複数のリーダーのカードの有無が変わるまで待機（戻り値は PcscStatusBackend と同じ）"""
+        with self._condition:
+            self._cancelled = False
+            changes, failed = self._collect_changes(states)
+            if changes or failed:
+                return changes, failed
+            
+            self._condition.wait_for(
+                lambda: self._cancelled or any(self._changes.get(reader_name) or reader_name in self._disconnected
+                                               for reader_name in states),
+                timeout=timeout_ms / 1000
+            )
+            if self._cancelled:
+                return {}, {}
+            return self._collect_changes(states)
+    
+    def _collect_changes(self, states):
+        """記録されている抜き差しを取り出す（ロック取得済みで呼び出す）"""
+        changes = {}
+        failed = {}
+        for reader_name, present in states.items():
+            if reader_name in self._disconnected:
+                failed[reader_name] = f"リーダーが見つかりません: {reader_name}"
+                continue
+            queue = self._changes.setdefault(reader_name, deque())
+            if present is None:
+                queue.clear()
+                changes[reader_name] = reader_name in self._cards
+                continue
+            while queue:
+                state = queue.popleft()
+                if state != present:
+                    changes[reader_name] = state
+                    break
+        return changes, failed
+    
+    def cancel(self):
+        with self._condition:
+            self._cancelled = True
+            self._condition.notify_all()
+    
+    def close(self):
+        pass
+    
+    def create_reader(self, reader_name):
+        """このバックエンドのカードを読み取るリーダー（read_uid に渡せる）"""
+        return SimulatedReader(reader_name, self)
+
+
+class SimulatedReaderBackend:
+    """カードリーダーなしで動作するバックエンド（動作確認・負荷試験用）"""
+    
+    def __init__(self, reader_names=("Simulated Reader 0", "Simulated Reader 1")):
+        self.cards = SimulatedCardBackend()
+        self._readers = [self.cards.create_reader(name) for name in reader_names]
+        self._condition = threading.Condition()
+        self._version = 0
+    
+    def list_readers(self):
+        with self._condition:
+            return list(self._readers)
+    
+    def create_status_backend(self):
+        # 全リーダーで1つのカード状態を共有する（tap_simulator から抜き差しする）
+        return self.cards
+    
+    def create_reader_list_backend(self):
+        return SimulatedReaderListBackend(self)
+    
+    def plug(self, reader_name):
+        """リーダーを接続"""
+        with self._condition:
+            if any(reader.name == reader_name for reader in self._readers):
+                return
+            self._readers.append(self.cards.create_reader(reader_name))
+            self.cards.set_connected(reader_name, True)
+            self._version += 1
+            self._condition.notify_all()
+    
+    def unplug(self, reader_name):
+        """リーダーを取り外す"""
+        with self._condition:
+            self._readers = [reader for reader in self._readers if reader.name != reader_name]
+            self.cards.set_connected(reader_name, False)
+            self._version += 1
+            self._condition.notify_all()
+
+
+class SimulatedReaderListBackend:
+    """SimulatedReaderBackend のリーダーの追加・取り外しを待つオブジェクト"""
+    
+    def __init__(self, reader_backend):
+        self.reader_backend = reader_backend
+        self._version = reader_backend._version
+        self._cancelled = False
+    
+    def wait_for_change(self, timeout_ms):
+        """リーダーの一覧が変わるまで待機（変わったら True、タイムアウト・中断時は False）"""
+        condition = self.reader_backend._condition
+        with condition:
+            self._cancelled = False
+            condition.wait_for(lambda: self._cancelled or self.reader_backend._version != self._version,
+                               timeout=timeout_ms / 1000)
+            changed = self.reader_backend._version != self._version
+            self._version = self.reader_backend._version
+            return changed
+    
+    def cancel(self):
+        with self.reader_backend._condition:
+            self._cancelled = True
+            self.reader_backend._condition.notify_all()
+    
+    def close(self):
+        pass
+
+
+class SimulatedReader:
+    """SimulatedCardBackend のカードを読み取るリーダー（smartcard のリーダーと同じ呼び出し方）"""
+    
+    def __init__(self, name, backend):
+        self.name = name
+        self.backend = backend
+    
+    def createConnection(self):
+        return SimulatedConnection(self)
+
+
+class SimulatedConnection:
+    """SimulatedReader への接続"""
+    
+    def __init__(self, reader):
+        self.reader = reader
+        self.uid = None
+    
+    def connect(self, protocol=None):
+        if not self.reader.backend.is_connected(self.reader.name):
+            raise CardConnectionException("リーダーが見つかりません")
+        self.uid = self.reader.backend.get_uid(self.reader.name)
+        if self.uid is None:
+            raise NoCardException("カードがありません", -1)
+    
+    def getProtocol(self):
+        return None
+    
+    def transmit(self, apdu):
+        if apdu != GET_UID_APDU:
+            return [], 0x6D, 0x00
+        return [int(part, 16) for part in self.uid.split()], 0x90, 0x00
+    
+    def disconnect(self):
+        self.uid = None
+
+
+class CardWatcher:
+    """複数のリーダーのカードの抜き差しを1つの待機で通知するクラス（リーダーごとのスレッドは使わない）"""
+    
+    def __init__(self, backend, timeout_ms=1000):
+        self.backend = backend
+        self.timeout_ms = timeout_ms
+        # リーダー名→カードの有無（None は監視開始前）
+        self.present = {}
+    
+    def set_readers(self, reader_names):
+        """監視するリーダーを変更（追加したリーダーは現在の状態から監視する）"""
+        self.present = {reader_name: self.present.get(reader_name) for reader_name in reader_names}
+    
+    def wait_events(self):
+        """次のイベントまで待機
+        
+        戻り値: ([(リーダー名, CARD_INSERTED / CARD_REMOVED)], {リーダー名: エラー内容})
+                タイムアウト・中断時は ([], {})
+        """
+        if not self.present:
+            return [], {}
+        changes, failed = self.backend.wait_for_changes(dict(self.present), self.timeout_ms)
+        
+        events = []
+        for reader_name, present in changes.items():
+            if reader_name not in self.present:
+                continue
+            # 監視開始時にカードがない場合はイベントにしない
+            initial = self.present[reader_name] is None
+            self.present[reader_name] = present
+            if present:
+                metrics.increment("reader.card_inserted")
+                events.append((reader_name, CARD_INSERTED))
+            elif not initial:
+                events.append((reader_name, CARD_REMOVED))
+        
+        # 使えないリーダーは、次に監視するときに現在の状態から読み直す
+        for reader_name in failed:
+            if reader_name in self.present:
+                self.present[reader_name] = None
+        return events, failed
+    
+    def stop(self):
+        """待機を中断（別スレッドから呼び出す）"""
+        try:
+            self.backend.cancel()
+        except Exception:
+            pass
+    
+    def close(self):
+        try:
+            self.backend.close()
+        except Exception:
+            pass
 
 
 class CardReaderManager:
     """カードリーダー管理クラス"""
     
-    def __init__(self):
-        self.class_reader = None
-        self.meeting_reader = None
-        self.class_reader_name = None
-        self.meeting_reader_name = None
+    def __init__(self, reader_backend=None, watcher_backend_factory=None):
+        # チャンネルとリーダー名の対応（initialize_channels / initialize_readers で設定）
+        self.channels = ChannelRegistry.default()
+        # チャンネル→割り当てられているリーダー（未接続なら None）
+        self._readers = {}
+        self.reader_backend = reader_backend if reader_backend is not None else PcscReaderBackend()
+        if watcher_backend_factory is None:
+            watcher_backend_factory = self.reader_backend.create_status_backend
+        self.watcher_backend_factory = watcher_backend_factory
+        # リーダー名→前回接続できたプロトコル（次回から交渉を省略する）
+        self._protocols = {}
+    
+    @property
+    def class_reader(self):
+        return self._readers.get('class')
+    
+    @class_reader.setter
+    def class_reader(self, reader):
+        self._readers['class'] = reader
+    
+    @property
+    def meeting_reader(self):
+        return self._readers.get('meeting')
+    
+    @meeting_reader.setter
+    def meeting_reader(self, reader):
+        self._readers['meeting'] = reader
     
     def get_available_readers(self):
         """利用可能なリーダーのリストを取得"""
         try:
-            r = readers()
+            r = self.reader_backend.list_readers()
             return [reader.name for reader in r]
         except Exception as e:
             print(f"リーダー取得エラー: {e}")
             return []
     
+    def initialize_channels(self, channels):
+        """チャンネルごとのリーダーを名前で割り当て（授業用・会議用だけなら initialize_readers と同じ）
+        
+        3チャンネル以上の場合は、接続されていないリーダーは ReaderSupervisor が接続時に割り当てる
+        （1台も見つからなければ False）。
+        """
+        self.channels = channels
+        if channels.is_default():
+            return self.initialize_readers(channels.get('class').reader_name, channels.get('meeting').reader_name)
+        
+        try:
+            found = {reader.name: reader for reader in self.reader_backend.list_readers()}
+        except Exception as e:
+            print(f"リーダー初期化エラー: {e}")
+            return False
+        
+        self._readers = {}
+        for channel in channels:
+            reader = found.get(channel.reader_name)
+            self._readers[channel.key] = reader
+            print(f"{channel.label}リーダー: {reader.name if reader else '未接続'}")
+        return any(reader is not None for reader in self._readers.values())
+    
     def initialize_readers(self, class_reader_name, meeting_reader_name):
         """リーダー初期化（Sony製リーダーを授業用に優先割り当て）"""
+        if not self.channels.is_default():
+            self.channels = ChannelRegistry.default()
+        class_channel = self.channels.get('class')
+        meeting_channel = self.channels.get('meeting')
+        self._readers = {}
         try:
-            r = readers()
+            r = self.reader_backend.list_readers()
             
             # リーダーが1台もない場合
             if len(r) == 0:
                 return False
             
             # リーダーが1台しかない場合は授業用のみに割り当て
+            # （会議用は設定のもう一方の名前のリーダーが接続されたら割り当てる）
             if len(r) == 1:
                 self.class_reader = r[0]
-                self.class_reader_name = r[0].name
                 self.meeting_reader = None
-                self.meeting_reader_name = None
+                class_channel.reader_name = r[0].name
+                meeting_channel.reader_name = (class_reader_name if meeting_reader_name == r[0].name
+                                               else meeting_reader_name)
                 print(f"授業用リーダー: {r[0].name}")
                 print("会議用リーダー: 未接続")
                 return True
             
             # 2台以上の場合は設定された名前で識別
-            self.class_reader_name = class_reader_name
-            self.meeting_reader_name = meeting_reader_name
+            class_channel.reader_name = class_reader_name
+            meeting_channel.reader_name = meeting_reader_name
             
             # リーダーを名前で識別
             for reader in r:
@@ -64,34 +530,17 @@ class CardReaderManager:
             print(f"リーダー初期化エラー: {e}")
             return False
     
-    def connect_to_card(self, reader):
-        """カードに接続"""
-        try:
-            connection = reader.createConnection()
-            connection.connect()
-            return connection
-        except (NoCardException, CardConnectionException):
-            return None
-        except Exception:
-            return None
+    def get_reader(self, channel):
+        """チャンネルに割り当てられているリーダー（未接続なら None）"""
+        return self._readers.get(channel)
     
-    def get_card_uid(self, connection):
-        """カードUID取得"""
-        if not connection:
-            return None
-            
-        try:
-            get_uid = [0xFF, 0xCA, 0x00, 0x00, 0x00]
-            data, sw1, sw2 = connection.transmit(get_uid)
-            
-            if sw1 == 0x90 and sw2 == 0x00:
-                uid = toHexString(data)
-                return uid
-            else:
-                return None
-                
-        except Exception:
-            return None
+    def set_reader(self, channel, reader):
+        """チャンネルのリーダーを差し替え（None で未接続）"""
+        self._readers[channel] = reader
+    
+    def reader_bindings(self):
+        """チャンネルごとのリーダー名（ReaderSupervisor はこの名前でリーダーを割り当て直す）"""
+        return {channel.key: channel.reader_name for channel in self.channels}
     
     def disconnect(self, connection):
         """接続切断"""
@@ -101,14 +550,64 @@ class CardReaderManager:
             except:
                 pass
     
-    def is_card_present(self, reader):
-        """カード存在チェック"""
+    def create_watcher(self, timeout_ms=1000):
+        """カードの抜き差しを待つ監視オブジェクトを作成（1つで複数のリーダーを監視する）"""
+        return CardWatcher(self.watcher_backend_factory(), timeout_ms)
+    
+    def read_uid(self, reader):
+        """1回の接続でカードUIDを読み取る
+        
+        戻り値: {'status': READ_OK / READ_NO_CARD / READ_ERROR, 'uid': UID,
+                 'connect_ms': 接続時間, 'apdu_ms': APDU送受信時間, 'total_ms': 合計時間,
+                 'error': エラー内容}
+        """
+        result = {'status': READ_ERROR, 'uid': None, 'connect_ms': 0.0,
+                  'apdu_ms': 0.0, 'total_ms': 0.0, 'error': None}
+        if reader is None:
+            result['error'] = "リーダー未接続"
+            return result
+        
+        start = time.perf_counter()
+        connection = None
         try:
-            test_connection = reader.createConnection()
-            test_connection.connect()
-            test_connection.disconnect()
-            return True
-        except (NoCardException, CardConnectionException):
-            return False
-        except Exception:
-            return False
\ No newline at end of file
+            connection = reader.createConnection()
+            protocol = self._protocols.get(reader.name)
+            try:
+                connection.connect(protocol)
+            except CardConnectionException:
+                if protocol is None:
+                    raise
+                # 前回のプロトコルで接続できない場合は交渉からやり直す
+                self._protocols.pop(reader.name, None)
+                connection.connect()
+            self._protocols[reader.name] = connection.getProtocol()
+            connected = time.perf_counter()
+            result['connect_ms'] = (connected - start) * 1000
+            
+            data, sw1, sw2 = connection.transmit(GET_UID_APDU)
+            result['apdu_ms'] = (time.perf_counter() - connected) * 1000
+            
+            if sw1 == 0x90 and sw2 == 0x00:
+                result['status'] = READ_OK
+                result['uid'] = toHexString(data)
+            else:
+                result['error'] = f"SW={sw1:02X}{sw2:02X}"
+        except NoCardException:
+            result['status'] = READ_NO_CARD
+        except CardConnectionException as e:
+            # カードを離した直後などは接続エラーになる
+            result['status'] = READ_NO_CARD
+            result['error'] = str(e)
+        except Exception as e:
+            result['error'] = str(e)
+        finally:
+            self.disconnect(connection)
+            result['total_ms'] = (time.perf_counter() - start) * 1000
+            if metrics.enabled:
+                metrics.increment(f"reader.read_{result['status']}")
+                if result['status'] == READ_OK:
+                    metrics.observe_ms("reader.connect", result['connect_ms'])
+                    metrics.observe_ms("reader.apdu", result['apdu_ms'])
+                metrics.observe_ms("reader.read_uid", result['total_ms'])
+            
+        return result
\ No newline at end of file
@@ -0,0 +1,125 @@
+# 出退勤管理システム - 打刻チャンネルモジュール
+
+import re
+from modules.constants import CHANNEL_TABLES, CHANNEL_LABELS, CHANNEL_COLORS, RECORD_TABLE_NAME_PATTERN
+
+class Channel:
+    """打刻チャンネル（リーダー1台と記録先の打刻テーブル）"""
+    
+    def __init__(self, key, label, reader_name, table, color="lightgray"):
+        self.key = key
+        self.label = label
+        self.reader_name = reader_name
+        self.table = table
+        self.color = color
+    
+    @property
+    def short_label(self):
+        """ファイル名・集計表の種別名（「授業用」なら「授業」）"""
+        return self.label[:-1] if self.label.endswith("用") and len(self.label) > 1 else self.label
+    
+    def to_config(self):
+        return {
+            'key': self.key,
+            'label': self.label,
+            'reader': self.reader_name,
+            'table': self.table,
+            'color': self.color,
+        }
+
+
+class ChannelRegistry:
+    """リーダー名 → チャンネル → 記録先テーブルの対応"""
+    
+    # reader_config.json の channels に次の形式で保存する（並び順は打刻受付画面の表示順）。
+    #   [{'key': 'class', 'label': '授業用', 'reader': リーダー名, 'table': 'time_records', 'color': 'lightblue'}, ...]
+    # channels がない旧形式（class_reader / meeting_reader）は授業用・会議用の2チャンネルとして読み込む。
+    
+    def __init__(self, channels=()):
+        self._channels = {}
+        for channel in channels:
+            self.add(channel)
+    
+    @classmethod
+    def default(cls, class_reader_name=None, meeting_reader_name=None):
+        """授業用・会議用の2チャンネル"""
+        names = {'class': class_reader_name, 'meeting': meeting_reader_name}
+        return cls(Channel(key, CHANNEL_LABELS[key], names[key], table, CHANNEL_COLORS[key])
+                   for key, table in CHANNEL_TABLES.items())
+    
+    @classmethod
+    def from_config(cls, config):
+        """設定（reader_config.json の内容）から作成"""
+        if not config.get('channels'):
+            return cls.default(config.get('class_reader') or None, config.get('meeting_reader') or None)
+        
+        channels = []
+        for item in config['channels']:
+            key = item['key']
+            channels.append(Channel(
+                key,
+                item.get('label') or CHANNEL_LABELS.get(key, key),
+                item.get('reader') or None,
+                item.get('table') or CHANNEL_TABLES.get(key, f"{key}_records"),
+                item.get('color') or CHANNEL_COLORS.get(key, "lightgray"),
+            ))
+        return cls(channels)
+    
+    def add(self, channel):
+        """チャンネルを追加（キーの重複・使えないテーブル名は ValueError）"""
+        if channel.key in self._channels:
+            raise ValueError(f"チャンネルが重複しています: {channel.key}")
+        if not re.match(RECORD_TABLE_NAME_PATTERN, channel.table):
+            raise ValueError(f"打刻テーブル名が不正です: {channel.table}")
+        self._channels[channel.key] = channel
+    
+    def __iter__(self):
+        return iter(list(self._channels.values()))
+    
+    def __len__(self):
+        return len(self._channels)
+    
+    def __contains__(self, key):
+        return key in self._channels
+    
+    def get(self, key):
+        return self._channels.get(key)
+    
+    def keys(self):
+        return list(self._channels)
+    
+    def label(self, key):
+        channel = self._channels.get(key)
+        return channel.label if channel else key
+    
+    def table(self, key):
+        return self._channels[key].table
+    
+    def tables(self):
+        """記録先の打刻テーブル（重複なし・登録順）"""
+        return list(dict.fromkeys(channel.table for channel in self._channels.values()))
+    
+    def by_table(self, table_name):
+        """記録先テーブルのチャンネル（同じテーブルのチャンネルが複数あれば最初のもの、なければ None）"""
+        for channel in self._channels.values():
+            if channel.table == table_name:
+                return channel
+        return None
+    
+    def table_channels(self):
+        """記録先テーブルごとのチャンネル（登録順、打刻表示・集計の表と選択肢に使う）"""
+        return [self.by_table(table_name) for table_name in self.tables()]
+    
+    def by_reader(self, reader_name):
+        """リーダー名のチャンネル（なければ None）"""
+        for channel in self._channels.values():
+            if channel.reader_name == reader_name:
+                return channel
+        return None
+    
+    def is_default(self):
+        """授業用・会議用の2チャンネルだけかどうか"""
+        return set(self._channels) == set(CHANNEL_TABLES)
+    
+    def to_config(self):
+        return [channel.to_config() for channel in self._channels.values()]
@@ -12,6 +12,64 @@ PASSWORD_HASH = "944381cba581a7ee3f59b5e2a97686c9b48fc0b7da14eb3fceff5f84f62d0ff
 DATA_DIR = "data"
 CONFIG_PATH = "reader_config.json"
 
+# リーダーのチャンネル（授業用・会議用）と記録先テーブル
+# reader_config.json に channels がない場合（旧形式）はこの2チャンネルを使う
+CHANNEL_TABLES = {
+    'class': "time_records",
+    'meeting': "meeting_records",
+}
+CHANNEL_LABELS = {
+    'class': "授業用",
+    'meeting': "会議用",
+}
+CHANNEL_COLORS = {
+    'class': "lightblue",
+    'meeting': "lightgreen",
+}
+# リーダー設定画面で追加したチャンネルの色（順に使う）
+CHANNEL_EXTRA_COLORS = ["lightyellow", "lightpink", "lavender", "lightcyan", "wheat"]
+# 打刻テーブル名（SQLに埋め込むため英小文字・数字・_ のみで、末尾は _records）
+RECORD_TABLE_NAME_PATTERN = r"^[a-z][a-z0-9_]*_records$"
+
+# データベース設定
+# スキーマを変更したら DB_SCHEMA_VERSION を上げ、DatabaseManager にマイグレーションを追加する
+DB_SCHEMA_VERSION = 4
+DB_STORAGE_PROFILE = {
+    'journal_mode': 'WAL',          # 読み込みが書き込みをブロックしない
+    'synchronous': 'NORMAL',        # WALではNORMALでもコミット済みデータは失われない
+    'mmap_size': 64 * 1024 * 1024,  # 64MB
+    'cache_size': -16000,           # 約16MB（負値はKiB単位）
+    'temp_store': 'MEMORY',
+}
+
+# 打刻のアーカイブ設定（締めた年の打刻は年ごとのDBに移し、本体のDBには最近の打刻だけを残す）
+ARCHIVE_DIR_NAME = "archive"                 # アーカイブの保存先（本体のDBと同じフォルダー内）
+ARCHIVE_FILE_NAME = "attendance_{year}.db"   # 1年分の打刻を保存するファイル
+ARCHIVE_AFTER_DAYS = 90                      # 年が終わってからアーカイブに移すまでの日数（前年分を修正する期間）
+ARCHIVE_MAX_ATTACHED = 8                     # 1つの接続に ATTACH したままにするアーカイブの数（SQLiteの上限は10）
+
+# エクスポート設定
+EXPORT_MAX_WORKERS = 4  # 講師別CSVを並列に書き込むスレッド数
+EXPORT_PROGRESS_ROWS = 1000  # 日次集計で進捗を通知する間隔（行数）
+
+# 画面表示設定
+LOAD_MAX_WORKERS = 4  # 打刻記録・集計画面のデータを並列に読み込むスレッド数
+
+# カードリーダーの抜き差しの監視設定
+READER_RESCAN_INTERVAL = 5.0    # リーダーの一覧を確認し直す間隔（秒、抜き差しの通知がない環境でも検出する）
+READER_RETRY_INITIAL = 1.0      # リーダーのエラー後、監視を再開するまでの待ち時間（秒）
+READER_RETRY_MAX = 30.0         # 待ち時間の上限（秒、エラーが続くたびに倍にする）
+READER_ERROR_WINDOW = 300       # エラー率を集計する期間（秒）
+
+# 二度かざしの抑止設定
+DUPLICATE_TAP_WINDOW = 60       # 同じカード・同じチャンネルの打刻を無視する時間（秒、0で無効）
+
+# 処理時間の計測設定（診断情報画面からも切り替えられる）
+METRICS_ENABLED = False
+METRICS_LOG_INTERVAL = 60               # 計測ログに書き出す間隔（秒）
+METRICS_LOG_MAX_BYTES = 1024 * 1024     # 計測ログ1ファイルの最大サイズ
+METRICS_LOG_BACKUP_COUNT = 3            # 残す古い計測ログの数
+
 # ウィンドウ設定
 WINDOW_WIDTH = 900
 WINDOW_HEIGHT = 600
\ No newline at end of file
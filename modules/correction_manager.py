@@ -5,6 +5,8 @@ from tkinter import ttk, messagebox, simpledialog
 import hashlib
 from datetime import datetime
 from modules.constants import JST, PASSWORD_HASH
+from modules.card_reader_manager import READ_OK
+from modules.virtual_table import VirtualTable
 
 class CorrectionManager:
     """打刻修正管理クラス"""
@@ -71,11 +73,11 @@ class CorrectionManager:
         reader_frame.pack(pady=10)
         
         tk.Label(reader_frame, text="使用するリーダー:", font=("Arial", 11)).pack(side=tk.LEFT, padx=5)
-        reader_var = tk.StringVar(value="class")
-        tk.Radiobutton(reader_frame, text="授業用", variable=reader_var, 
-                      value="class", font=("Arial", 10)).pack(side=tk.LEFT)
-        tk.Radiobutton(reader_frame, text="会議用", variable=reader_var, 
-                      value="meeting", font=("Arial", 10)).pack(side=tk.LEFT)
+        channels = self.card_reader_manager.channels
+        reader_var = tk.StringVar(value=channels.keys()[0])
+        for channel in channels:
+            tk.Radiobutton(reader_frame, text=channel.label, variable=reader_var, 
+                          value=channel.key, font=("Arial", 10)).pack(side=tk.LEFT)
         
         status_label = tk.Label(card_frame, text="マスターキーカードをかざしてください...",
                               font=("Arial", 12), fg="blue")
@@ -88,25 +90,22 @@ class CorrectionManager:
             if not auth_state['monitoring']:
                 return
             
-            selected_reader = self.card_reader_manager.class_reader if reader_var.get() == "class" else self.card_reader_manager.meeting_reader
+            selected_reader = self.card_reader_manager.get_reader(reader_var.get())
             
-            if selected_reader and self.card_reader_manager.is_card_present(selected_reader):
-                connection = self.card_reader_manager.connect_to_card(selected_reader)
-                if connection:
-                    uid = self.card_reader_manager.get_card_uid(connection)
-                    if uid:
-                        if self.db_manager.is_master_key(uid):
-                            auth_state['authenticated'] = True
-                            auth_state['monitoring'] = False
-                            status_label.config(text="認証成功！", fg="green")
-                            self.sound_manager.play_beep("success")
-                            self.root.after(500, self.show_correction_menu)
-                        else:
-                            status_label.config(text="このカードはマスターキーではありません", fg="red")
-                            self.sound_manager.play_beep("error")
-                            self.root.after(2000, lambda: status_label.config(
-                                text="マスターキーカードをかざしてください...", fg="blue"))
-                    self.card_reader_manager.disconnect(connection)
+            result = self.card_reader_manager.read_uid(selected_reader)
+            if result['status'] == READ_OK:
+                uid = result['uid']
+                if self.db_manager.is_master_key(uid):
+                    auth_state['authenticated'] = True
+                    auth_state['monitoring'] = False
+                    status_label.config(text="認証成功！", fg="green")
+                    self.sound_manager.play_beep("success")
+                    self.root.after(500, self.show_correction_menu)
+                else:
+                    status_label.config(text="このカードはマスターキーではありません", fg="red")
+                    self.sound_manager.play_beep("error")
+                    self.root.after(2000, lambda: status_label.config(
+                        text="マスターキーカードをかざしてください...", fg="blue"))
             
             if auth_state['monitoring']:
                 self.root.after(500, check_master_card)
@@ -264,37 +263,21 @@ class CorrectionManager:
         date_entry.insert(0, today)
         
         # 打刻一覧テーブル
-        table_frame = tk.Frame(self.root)
-        table_frame.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
-        
-        scrollbar = tk.Scrollbar(table_frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
         columns = ('ID', '講師名', '種別', '時刻')
-        tree = ttk.Treeview(table_frame, columns=columns, show='headings',
-                           yscrollcommand=scrollbar.set)
-        
-        tree.heading('ID', text='ID')
-        tree.heading('講師名', text='講師名')
-        tree.heading('種別', text='種別')
-        tree.heading('時刻', text='時刻')
-        
-        tree.column('ID', width=60)
-        tree.column('講師名', width=150)
-        tree.column('種別', width=80)
-        tree.column('時刻', width=180)
-        
-        tree.pack(fill=tk.BOTH, expand=True)
-        scrollbar.config(command=tree.yview)
+        widths = {'ID': 60, '講師名': 150, '種別': 80, '時刻': 180}
+        table = VirtualTable(self.root, columns, widths, height=10)
+        table.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
         
         count_label = tk.Label(self.root, text="", font=("Arial", 10))
         count_label.pack(pady=5)
         
+        def format_record(row):
+            record_id, name, record_type, timestamp = row
+            action = "出勤" if record_type == "IN" else "退勤"
+            return (record_id, name, action, timestamp)
+        
         def load_records():
             """打刻記録を読み込み"""
-            for item in tree.get_children():
-                tree.delete(item)
-            
             date_str = date_entry.get().strip()
             table_name = table_var.get()
             
@@ -304,30 +287,32 @@ class CorrectionManager:
                 messagebox.showerror("エラー", "日付形式が正しくありません (YYYY-MM-DD)")
                 return
             
-            records = self.db_manager.get_date_records_with_id(date_str, table_name)
-            
-            for record_id, name, record_type, timestamp in records:
-                action = "出勤" if record_type == "IN" else "退勤"
-                tree.insert('', tk.END, values=(record_id, name, action, timestamp))
-            
-            count_label.config(text=f"記録数: {len(records)}件")
+            # 表示範囲だけを読み込む（全件をTreeviewに入れ直さない）
+            table.set_source(
+                lambda: self.db_manager.count_date_records(date_str, table_name),
+                lambda after, limit: self.db_manager.get_date_records_page(date_str, table_name, after, limit),
+                key_func=lambda row: (row[3], row[0]),
+                format_func=format_record
+            )
+            count_label.config(text=f"記録数: {table.total}件")
         
         def delete_selected():
             """選択された打刻記録を削除"""
-            selected = tree.selection()
+            # スクロールで見えなくなった選択行も含む
+            selected = table.selected_rows()
             if not selected:
                 messagebox.showerror("エラー", "削除する記録を選択してください")
                 return
             
             # 複数選択対応
             items = []
-            for item in selected:
-                values = tree.item(item)['values']
+            for record_id, name, record_type, timestamp in selected:
                 items.append({
-                    'id': values[0],
-                    'name': values[1],
-                    'type': values[2],
-                    'time': values[3]
+                    'id': record_id,
+                    'date': timestamp[:10],
+                    'name': name,
+                    'type': "出勤" if record_type == "IN" else "退勤",
+                    'time': timestamp
                 })
             
             # 確認ダイアログ
@@ -344,7 +329,7 @@ class CorrectionManager:
             success_count = 0
             
             for item in items:
-                if self.db_manager.delete_attendance_record(item['id'], table_name):
+                if self.db_manager.delete_attendance_record(item['id'], table_name, item['date']):
                     success_count += 1
             
             if success_count == len(items):
@@ -474,11 +459,11 @@ class CorrectionManager:
         reader_frame.pack(pady=5)
         
         tk.Label(reader_frame, text="使用するリーダー:", font=("Arial", 11)).pack(side=tk.LEFT, padx=5)
-        reader_var = tk.StringVar(value="class")
-        tk.Radiobutton(reader_frame, text="授業用", variable=reader_var, 
-                      value="class", font=("Arial", 10)).pack(side=tk.LEFT)
-        tk.Radiobutton(reader_frame, text="会議用", variable=reader_var, 
-                      value="meeting", font=("Arial", 10)).pack(side=tk.LEFT)
+        channels = self.card_reader_manager.channels
+        reader_var = tk.StringVar(value=channels.keys()[0])
+        for channel in channels:
+            tk.Radiobutton(reader_frame, text=channel.label, variable=reader_var, 
+                          value=channel.key, font=("Arial", 10)).pack(side=tk.LEFT)
         
         status_label = tk.Label(add_window, text="カードをかざしてください...",
                               font=("Arial", 12), fg="blue")
@@ -499,21 +484,19 @@ class CorrectionManager:
         
         def check_card():
             if add_window.winfo_exists():
-                selected_reader = self.card_reader_manager.class_reader if reader_var.get() == "class" else self.card_reader_manager.meeting_reader
+                selected_reader = self.card_reader_manager.get_reader(reader_var.get())
                 
-                if self.card_reader_manager.is_card_present(selected_reader):
-                    connection = self.card_reader_manager.connect_to_card(selected_reader)
-                    if connection:
-                        uid = self.card_reader_manager.get_card_uid(connection)
-                        if uid and uid != detected_uid['uid']:
-                            detected_uid['uid'] = uid
-                            uid_entry.config(state='normal')
-                            uid_entry.delete(0, tk.END)
-                            uid_entry.insert(0, uid)
-                            uid_entry.config(state='readonly')
-                            status_label.config(text="カード検出！説明を入力してください", fg="green")
-                            self.sound_manager.play_beep("card_detected")
-                        self.card_reader_manager.disconnect(connection)
+                result = self.card_reader_manager.read_uid(selected_reader)
+                if result['status'] == READ_OK:
+                    uid = result['uid']
+                    if uid != detected_uid['uid']:
+                        detected_uid['uid'] = uid
+                        uid_entry.config(state='normal')
+                        uid_entry.delete(0, tk.END)
+                        uid_entry.insert(0, uid)
+                        uid_entry.config(state='readonly')
+                        status_label.config(text="カード検出！説明を入力してください", fg="green")
+                        self.sound_manager.play_beep("card_detected")
                 add_window.after(500, check_card)
         
         check_card()
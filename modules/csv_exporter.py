@@ -1,81 +1,142 @@
 # 出退勤管理システム - CSV出力モジュール
 
+import calendar
 import csv
 import os
 import shutil
+import tempfile
 from datetime import datetime
+from modules.channel_registry import Channel, ChannelRegistry
+from modules.constants import EXPORT_PROGRESS_ROWS
+from modules.export_job_runner import ExportCancelled, check_cancelled
 
 class CSVExporter:
     """CSV出力管理クラス"""
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, get_channels=None):
         self.db_manager = db_manager
+        # 最新のチャンネル設定（ChannelRegistry）を返す関数（省略時は授業用・会議用）
+        self.get_channels = get_channels
     
-    def export_records_to_csv(self, date_str, table_name="time_records"):
-        """日次CSVエクスポート"""
+    def channels(self):
+        """チャンネル設定（記録先テーブルの種別名・ファイル名に使う）"""
+        return self.get_channels() if self.get_channels is not None else ChannelRegistry.default()
+    
+    def table_channel(self, table_name):
+        """記録先テーブルのチャンネル（設定にないテーブルはテーブル名から種別名を作る）"""
+        channel = self.channels().by_table(table_name)
+        if channel is None:
+            key = table_name[:-len("_records")] if table_name.endswith("_records") else table_name
+            channel = Channel(key, key, None, table_name)
+        return channel
+    
+    def table_channels(self):
+        """記録先テーブルごとのチャンネル（登録順）"""
+        return self.channels().table_channels()
+    
+    def export_records_to_csv(self, date_str, table_name="time_records", progress=None, cancel_event=None):
+        """日次CSVエクスポート（progress: 進捗メッセージを受け取る関数、cancel_event: 中止要求）"""
+        temp_filename = None
         try:
-            # データ取得
-            results = self.db_manager.get_date_records(date_str, table_name)
+            # テーブルタイプ
+            channel = self.table_channel(table_name)
+            table_type_name = channel.label
             
-            if not results:
-                return f"{date_str} の打刻記録はありません。"
+            csv_filename, old_dir, base_filename = self.daily_csv_path(date_str, channel.key)
             
-            # テーブルタイプ
-            table_type = "class" if table_name == "time_records" else "meeting"
+            # 一時ファイルに書き込み、完成してから置き換える（途中までのCSVを残さない）
+            fd, temp_filename = tempfile.mkstemp(prefix=".export_", suffix=".tmp",
+                                                 dir=os.path.dirname(csv_filename))
             
-            # CSVファイル名を生成
-            csv_filename = self.generate_unique_csv_filename(date_str, table_type)
+            # 記録を少しずつ読みながら書き込み、統計情報も同時に集計する
+            record_count = 0
+            in_count = 0
+            out_count = 0
+            instructor_names = set()
             
-            # CSVファイルに書き込み
-            with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8-sig') as csvfile:
                 writer = csv.writer(csvfile)
-                table_type_name = "授業用" if table_name == "time_records" else "会議用"
                 writer.writerow([f'【{table_type_name}】講師名', '打刻種別', '打刻日時', 'カードUID'])
                 
-                for name, record_type, timestamp in results:
+                for name, record_type, timestamp in self.db_manager.iter_date_records(date_str, table_name):
+                    # 中止されたら一時ファイルを削除して終了する（既存のCSVはそのまま）
+                    check_cancelled(cancel_event)
                     # card_uidは元のコードに合わせて空にする（results構造が異なるため）
                     record_type_jp = "出勤" if record_type == "IN" else "退勤"
                     writer.writerow([name, record_type_jp, timestamp, ''])
             
-            # 統計情報
-            instructor_count = len(set(name for name, _, _ in results))
-            in_count = sum(1 for _, record_type, _ in results if record_type == "IN")
-            out_count = sum(1 for _, record_type, _ in results if record_type == "OUT")
+                    record_count += 1
+                    instructor_names.add(name)
+                    if record_type == "IN":
+                        in_count += 1
+                    elif record_type == "OUT":
+                        out_count += 1
+                    if progress and record_count % EXPORT_PROGRESS_ROWS == 0:
+                        progress(f"{date_str}: {record_count}件書き込み")
             
-            table_type_name = "授業用" if table_name == "time_records" else "会議用"
+            if progress and record_count % EXPORT_PROGRESS_ROWS:
+                progress(f"{date_str}: {record_count}件書き込み")
+            
+            if record_count == 0:
+                return f"{date_str} の打刻記録はありません。"
+            
+            # 既存ファイルは新しいファイルが完成してからoldフォルダに移動
+            # （Excelで開かれていて移動できなければ既存ファイルはそのまま残る）
+            self._move_to_old(csv_filename, old_dir, base_filename)
+            os.replace(temp_filename, csv_filename)
+            temp_filename = None
+            
+            # 統計情報
             result = f"=== CSVエクスポート完了 ===\n\n"
             result += f"種別: {table_type_name}\n"
             result += f"ファイル名: {csv_filename}\n"
             result += f"対象日: {date_str}\n"
-            result += f"エクスポート件数: {len(results)}件\n\n"
+            result += f"エクスポート件数: {record_count}件\n\n"
             result += f"=== エクスポート内容概要 ===\n"
-            result += f"打刻した講師数: {instructor_count}人\n"
+            result += f"打刻した講師数: {len(instructor_names)}人\n"
             result += f"出勤記録: {in_count}件\n"
             result += f"退勤記録: {out_count}件\n"
-            result += f"合計記録数: {len(results)}件\n"
+            result += f"合計記録数: {record_count}件\n"
             
             return result
             
+        except ExportCancelled:
+            raise
         except Exception as e:
             return f"CSVエクスポートエラー: {e}"
+        finally:
+            # 書き込み途中・置き換え前に失敗した一時ファイルを削除
+            if temp_filename and os.path.exists(temp_filename):
+                try:
+                    os.remove(temp_filename)
+                except OSError as e:
+                    print(f"一時ファイル削除エラー: {e}")
     
-    def generate_unique_csv_filename(self, date_str, table_type="class"):
-        """CSVファイル名を生成"""
+    def daily_csv_path(self, date_str, table_type="class"):
+        """日次CSVのファイル名を作成（table_type: チャンネルのキー、戻り値: (ファイル名, oldフォルダ, 拡張子なしのファイル名)）"""
         year_month = date_str[:7]
         
         daily_dir = "daily"
         month_dir = os.path.join(daily_dir, year_month)
         old_dir = os.path.join(month_dir, "old")
         
-        if not os.path.exists(month_dir):
-            os.makedirs(month_dir)
-        if not os.path.exists(old_dir):
-            os.makedirs(old_dir)
+        os.makedirs(old_dir, exist_ok=True)
         
-        type_prefix = "授業" if table_type == "class" else "会議"
+        channel = self.channels().get(table_type)
+        type_prefix = channel.short_label if channel is not None else table_type
         base_filename = f"【{type_prefix}】日次記録_{date_str}"
         csv_filename = os.path.join(month_dir, f"{base_filename}.csv")
         
+        return csv_filename, old_dir, base_filename
+    
+    def generate_unique_csv_filename(self, date_str, table_type="class"):
+        """CSVファイル名を生成"""
+        csv_filename, old_dir, base_filename = self.daily_csv_path(date_str, table_type)
+        self._move_to_old(csv_filename, old_dir, base_filename)
+        return csv_filename
+    
+    def _move_to_old(self, csv_filename, old_dir, base_filename):
+        """既存ファイルをoldフォルダに移動"""
         if os.path.exists(csv_filename):
             file_mtime = os.path.getmtime(csv_filename)
             file_datetime = datetime.fromtimestamp(file_mtime)
@@ -92,98 +153,79 @@ class CSVExporter:
                     counter += 1
             
             shutil.move(csv_filename, old_filename)
+    
+    def build_instructor_daily_rows(self, month_str, instructor_id, instructor_name, first_last):
+        """講師別日次集計の行を作成（first_last: 日付→(最初の打刻時刻, 最後の打刻時刻)）"""
+        year, month = map(int, month_str.split('-'))
+        _, last_day = calendar.monthrange(year, month)
         
-        return csv_filename
+        rows = []
+        # 月の各日について出力
+        for day in range(1, last_day + 1):
+            date_str = f"{month_str}-{day:02d}"
+            
+            # その日の打刻時刻を取得
+            if date_str in first_last:
+                start_time, end_time = first_last[date_str]
+                rows.append([
+                    instructor_id,
+                    instructor_name,
+                    date_str,
+                    start_time,  # 最も早い打刻
+                    end_time,    # 最も遅い打刻
+                    '',  # 外出時刻(空欄)
+                    '',  # 復帰時刻(空欄)
+                    ''   # 備考(空欄)
+                ])
+            else:
+                # 打刻がない日は空欄
+                rows.append([
+                    instructor_id,
+                    instructor_name,
+                    date_str,
+                    '',  # 出社時刻(空欄)
+                    '',  # 退社時刻(空欄)
+                    '',  # 外出時刻(空欄)
+                    '',  # 復帰時刻(空欄)
+                    ''   # 備考(空欄)
+                ])
+        return rows
     
-    def export_instructor_daily_summary(self, month_str, instructor_id, instructor_name, output_dir, table_name="time_records"):
-        """講師別日次集計CSVエクスポート"""
+    def export_instructor_daily_summary(self, month_str, instructor_id, instructor_name, output_dir,
+                                        table_name="time_records", first_last=None):
+        """講師別日次集計CSVエクスポート（first_last を渡した場合はDBを検索しない）"""
         try:
-            import calendar
-            
-            # 月の日数を取得
-            year, month = map(int, month_str.split('-'))
-            _, last_day = calendar.monthrange(year, month)
-            
-            # データベースから打刻記録を取得
-            records = self.db_manager.get_instructor_monthly_records(month_str, instructor_id, table_name)
-            
-            # 日付ごとにデータを整理
-            daily_data = {}
-            for date_str, time_str in records:
-                if date_str not in daily_data:
-                    daily_data[date_str] = []
-                daily_data[date_str].append(time_str)
-            
-            # テーブルタイプに応じたファイル名プレフィックス
-            table_type_prefix = "授業" if table_name == "time_records" else "会議"
-            
-            # CSVファイル名
-            base_filename = f"【{table_type_prefix}】出退勤記録_{month_str}_{instructor_id}_{instructor_name}"
-            csv_filename = os.path.join(output_dir, f"{base_filename}.csv")
-            
-            # 既存ファイルがある場合はoldフォルダに移動
-            old_dir = os.path.join(output_dir, "old")
-            if not os.path.exists(old_dir):
-                os.makedirs(old_dir)
-            
-            if os.path.exists(csv_filename):
-                file_mtime = os.path.getmtime(csv_filename)
-                file_datetime = datetime.fromtimestamp(file_mtime)
-                timestamp_str = file_datetime.strftime("%H%M%S")
-                
-                old_filename = os.path.join(old_dir, f"{base_filename}_{timestamp_str}.csv")
-                
-                if os.path.exists(old_filename):
-                    counter = 2
-                    while True:
-                        old_filename = os.path.join(old_dir, f"{base_filename}_{timestamp_str}_{counter}.csv")
-                        if not os.path.exists(old_filename):
-                            break
-                        counter += 1
-                
-                shutil.move(csv_filename, old_filename)
-            
-            # CSVファイルに書き込み
-            with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(['講師ID', '講師名', '日付', '出社時刻', '退社時刻', '外出時刻', '復帰時刻', '備考'])
-                
-                # 月の各日について出力
-                for day in range(1, last_day + 1):
-                    date_obj = datetime(year, month, day)
-                    date_str = date_obj.strftime('%Y-%m-%d')
-                    
-                    # その日の打刻時刻を取得
-                    if date_str in daily_data:
-                        times = sorted(daily_data[date_str])
-                        start_time = times[0]   # 最も早い打刻
-                        end_time = times[-1]    # 最も遅い打刻
-                        
-                        writer.writerow([
-                            instructor_id,
-                            instructor_name,
-                            date_str,
-                            start_time,
-                            end_time,
-                            '',  # 外出時刻(空欄)
-                            '',  # 復帰時刻(空欄)
-                            ''   # 備考(空欄)
-                        ])
-                    else:
-                        # 打刻がない日は空欄
-                        writer.writerow([
-                            instructor_id,
-                            instructor_name,
-                            date_str,
-                            '',  # 出社時刻(空欄)
-                            '',  # 退社時刻(空欄)
-                            '',  # 外出時刻(空欄)
-                            '',  # 復帰時刻(空欄)
-                            ''   # 備考(空欄)
-                        ])
-            
+            self.write_instructor_daily_summary(month_str, instructor_id, instructor_name, output_dir,
+                                                table_name, first_last)
             return True
             
         except Exception as e:
             print(f"講師別日次集計エラー ({instructor_name}): {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def write_instructor_daily_summary(self, month_str, instructor_id, instructor_name, output_dir,
+                                       table_name="time_records", first_last=None):
+        """講師別日次集計CSVを書き込み（エラーは呼び出し元に送出、戻り値: ファイル名）"""
+        if first_last is None:
+            # 打刻集計から日付ごとの最初と最後の時刻を取得
+            first_last = self.db_manager.get_instructor_monthly_first_last(month_str, instructor_id, table_name)
+        
+        # テーブルタイプに応じたファイル名プレフィックス
+        table_type_prefix = self.table_channel(table_name).short_label
+        
+        # CSVファイル名
+        base_filename = f"【{table_type_prefix}】出退勤記録_{month_str}_{instructor_id}_{instructor_name}"
+        csv_filename = os.path.join(output_dir, f"{base_filename}.csv")
+        
+        # 既存ファイルがある場合はoldフォルダに移動
+        old_dir = os.path.join(output_dir, "old")
+        os.makedirs(old_dir, exist_ok=True)
+        self._move_to_old(csv_filename, old_dir, base_filename)
+        
+        # CSVファイルに書き込み
+        with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['講師ID', '講師名', '日付', '出社時刻', '退社時刻', '外出時刻', '復帰時刻', '備考'])
+            writer.writerows(self.build_instructor_daily_rows(month_str, instructor_id, instructor_name, first_last))
+            
+        return csv_filename
\ No newline at end of file
@@ -1,109 +1,671 @@
 # 出退勤管理システム - データベース管理モジュール
 
+import os
+import re
 import sqlite3
-import time
-from datetime import datetime
-from modules.constants import JST
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from modules.constants import (
+    JST, DB_SCHEMA_VERSION, DB_STORAGE_PROFILE, RECORD_TABLE_NAME_PATTERN,
+    ARCHIVE_DIR_NAME, ARCHIVE_AFTER_DAYS, ARCHIVE_MAX_ATTACHED
+)
+from modules.archive_catalog import ArchiveCatalog
+from modules.instructor_directory import InstructorDirectory
+from modules.day_state import DayState
+from modules.punch_journal import PunchWriter
+from modules.metrics import metrics
+
+# 打刻テーブル（インデックス・マイグレーションの対象）
+# チャンネルを追加すると ensure_record_table で同じ構造のテーブルを作成する
+RECORD_TABLES = ("time_records", "meeting_records")
+
+# 打刻テーブル・打刻集計の列（アーカイブとの間で行を移す・まとめて読むときに列の順序をそろえる）
+RECORD_COLUMNS = "id, instructor_id, card_uid, instructor_name, record_type, timestamp"
+DAILY_COLUMNS = "table_name, instructor_id, date, instructor_name, first_punch, last_punch, punch_count"
+
+
+def day_range(date_str):
+    """日付（YYYY-MM-DD）を半開区間 [当日, 翌日) の境界文字列に変換"""
+    start = datetime.strptime(date_str, "%Y-%m-%d")
+    end = start + timedelta(days=1)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def month_range(month_str):
+    """月（YYYY-MM）を半開区間 [月初, 翌月初) の境界文字列に変換"""
+    start = datetime.strptime(month_str, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+class PooledConnection(sqlite3.Connection):
+    """接続プールの接続（ATTACH したアーカイブを覚えておき、返却後も ATTACH したまま使い回す）"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attached = []
+
+
+class ConnectionPool:
+    """SQLite接続プール（スレッド間で接続を使い回す）"""
+    
+    def __init__(self, db_path, max_idle=4, timeout=10.0, cached_statements=128, pragmas=None):
+        self.db_path = db_path
+        self.pragmas = pragmas or {}
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+    
+    def _create_connection(self):
+        """新しい接続を作成"""
+        # 接続は貸し出し中に1スレッドだけが使うため、スレッド間の受け渡しを許可する
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=PooledConnection
+        )
+        # journal_mode はDBファイルに保存されるため初期化時に1回だけ設定する
+        for name, value in self.pragmas.items():
+            if name != 'journal_mode':
+                conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+    
+    def acquire(self):
+        """接続を借りる（待機中の接続があれば再利用）"""
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("接続プールは終了しています")
+            if self._idle:
+                return self._idle.pop()
+        return self._create_connection()
+    
+    def release(self, conn):
+        """接続を返却"""
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+    
+    @contextmanager
+    def connection(self):
+        """接続を借りて、終了時にコミット（例外時はロールバック）して返却"""
+        conn = self.acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+    
+    def close(self):
+        """待機中の接続をすべて閉じる（貸し出し中の接続は返却時に閉じる）"""
+        with self._lock:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
 
 class DatabaseManager:
     """データベース管理クラス"""
     
     def __init__(self, db_path):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, pragmas=DB_STORAGE_PROFILE)
+        # 同一プロセス内の書き込みを直列化して "database is locked" を防ぐ
+        self._write_lock = threading.Lock()
+        # 打刻テーブル（授業用・会議用と、チャンネルの追加で作成したテーブル）
+        self.record_tables = list(RECORD_TABLES)
         self.init_database()
+        self._load_record_tables()
+        
+        # 締めた年の打刻のアーカイブ（検索する期間と重なる年だけ ATTACH する）
+        self.archives = ArchiveCatalog(os.path.join(os.path.dirname(os.path.abspath(db_path)), ARCHIVE_DIR_NAME))
+        self.archives.refresh()
+    
+        # 打刻時の講師・マスターキー検索用キャッシュ
+        self.directory = InstructorDirectory(db_path)
+        try:
+            self.directory.refresh()
+        except Exception as e:
+            print(f"講師データ読み込みエラー: {e}")
+        
+        # カード打刻の非同期書き込み（ジャーナルに残った未反映分はここで再投入される）
+        self.punch_writer = PunchWriter(self, db_path + "-punch.journal")
+        try:
+            self.punch_writer.start()
+        except Exception as e:
+            print(f"打刻ジャーナル初期化エラー: {e}")
+        
+        # 当日の打刻回数（出勤・退勤の判定用）
+        self.day_state = DayState(self)
+        try:
+            self.day_state.rebuild()
+        except Exception as e:
+            print(f"当日打刻状態の読み込みエラー: {e}")
+    
+    @contextmanager
+    def _connection(self):
+        """読み込み用の接続を取得"""
+        with self.pool.connection() as conn:
+            yield conn
+    
+    @contextmanager
+    def _write_connection(self):
+        """書き込み用の接続を取得（プロセス内で1つずつ）"""
+        with self._write_lock:
+            with self.pool.connection() as conn:
+                yield conn
+    
+    def _partition_schemas(self, start, end):
+        """[start, end) の期間と重なるパーティションのスキーマ名（本体のDBは main、アーカイブは archive_YYYY）"""
+        last = datetime.strptime(end, "%Y-%m-%d") - timedelta(days=1)
+        schemas = []
+        for year in range(int(start[:4]), last.year + 1):
+            schema = f"archive_{year}" if year in self.archives else "main"
+            if schema not in schemas:
+                schemas.append(schema)
+        return schemas or ["main"]
+    
+    def _schema_for_timestamp(self, timestamp):
+        """打刻日時（YYYY-MM-DD...）の打刻を保存するパーティション"""
+        year = int(timestamp[:4])
+        return f"archive_{year}" if year in self.archives else "main"
+    
+    def _schema_tables(self, schema):
+        """パーティションにある打刻テーブル"""
+        if schema == "main":
+            return list(self.record_tables)
+        tables = self.archives.tables(int(schema[len("archive_"):]))
+        return [table_name for table_name in self.record_tables if table_name in tables]
+    
+    def _attach_partitions(self, conn, schemas):
+        """アーカイブを ATTACH（借りた直後のトランザクションの外で呼び出す）"""
+        needed = [schema for schema in schemas if schema != "main" and schema not in conn.attached]
+        if not needed:
+            return
+        if len(conn.attached) + len(needed) > ARCHIVE_MAX_ATTACHED:
+            # 今回使わないアーカイブを外して上限を超えないようにする
+            for schema in [schema for schema in conn.attached if schema not in schemas]:
+                conn.execute(f"DETACH DATABASE {schema}")
+                conn.attached.remove(schema)
+        for schema in needed:
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (self.archives.path(int(schema[len("archive_"):])),))
+            conn.attached.append(schema)
+    
+    @contextmanager
+    def _partition_connection(self, start=None, end=None, write=False, schemas=None):
+        """期間と重なるアーカイブを ATTACH した接続を取得（戻り値: (接続, スキーマ名のリスト)）"""
+        if schemas is None:
+            schemas = self._partition_schemas(start, end)
+        connection = self._write_connection() if write else self._connection()
+        with connection as conn:
+            self._attach_partitions(conn, schemas)
+            yield conn, schemas
+    
+    def _note_created_table(self, schema, table_name):
+        """作成した打刻テーブルを一覧に反映（コミット後に呼び出すため例外を出さない）"""
+        if schema == "main":
+            if table_name not in self.record_tables:
+                self.record_tables.append(table_name)
+        else:
+            self.archives.invalidate_tables(int(schema[len("archive_"):]))
+    
+    def _create_missing_record_table(self, cursor, table_name, schema):
+        """パーティションにない打刻テーブルを作成（名前が不正なら ValueError）"""
+        if not re.match(RECORD_TABLE_NAME_PATTERN, table_name):
+            raise ValueError(f"打刻テーブル名が不正です: {table_name}")
+        self._create_record_table(cursor, table_name, schema)
+    
+    def _record_source(self, schemas, table_name):
+        """パーティションの打刻テーブル（複数なら UNION ALL でまとめる）を FROM 句に書く形で返す"""
+        sources = [f"{schema}.{table_name}" for schema in schemas if table_name in self._schema_tables(schema)]
+        if not sources:
+            return f"(SELECT {RECORD_COLUMNS} FROM main.{table_name} WHERE 0)"
+        if len(sources) == 1:
+            return sources[0]
+        return "(" + " UNION ALL ".join(f"SELECT {RECORD_COLUMNS} FROM {source}" for source in sources) + ")"
+    
+    def _daily_source(self, schemas):
+        """パーティションの打刻集計を FROM 句に書く形で返す"""
+        if len(schemas) == 1:
+            return f"{schemas[0]}.daily_attendance"
+        return "(" + " UNION ALL ".join(f"SELECT {DAILY_COLUMNS} FROM {schema}.daily_attendance"
+                                        for schema in schemas) + ")"
+    
+    def close(self):
+        """データベース接続をすべて閉じる（終了時に呼び出す）"""
+        self.punch_writer.stop()
+        self.directory.close()
+        self.pool.close()
     
     def init_database(self):
         """データベース初期化"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # time_records テーブル（授業用）
-            cursor.execute("PRAGMA table_info(time_records)")
-            columns = cursor.fetchall()
-            column_names = [col[1] for col in columns]
-            
-            if not columns:
-                cursor.execute('''
-                    CREATE TABLE time_records (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        instructor_id INTEGER,
-                        card_uid TEXT NOT NULL,
-                        instructor_name TEXT NOT NULL,
-                        record_type TEXT NOT NULL CHECK (record_type IN ('IN', 'OUT')),
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+            with self._write_connection() as conn:
+                cursor = conn.cursor()
+                
+                # WALモード（トランザクション外で設定する必要がある）
+                journal_mode = DB_STORAGE_PROFILE.get('journal_mode')
+                if journal_mode:
+                    cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+                
+                # スキーマバージョンが最新ならテーブル構造の確認を省略
+                cursor.execute("PRAGMA user_version")
+                version = cursor.fetchone()[0]
+                if version == DB_SCHEMA_VERSION:
+                    return
+                
+                cursor.execute("BEGIN IMMEDIATE")
+                self._migrate_schema(cursor, version)
+                cursor.execute(f"PRAGMA user_version = {DB_SCHEMA_VERSION}")
+                
+        except Exception as e:
+            print(f"データベース初期化エラー: {e}")
+    
+    def _migrate_schema(self, cursor, version):
+        """スキーマを最新バージョンに移行"""
+        if version < 1:
+            self._migrate_v1(cursor)
+        if version < 2:
+            self._migrate_v2(cursor)
+        if version < 3:
+            self._migrate_v3(cursor)
+        if version < 4:
+            self._migrate_v4(cursor)
+    
+    def _migrate_v1(self, cursor):
+        """v1: 基本テーブルの作成と旧スキーマの列追加"""
+        # time_records テーブル（授業用）
+        cursor.execute("PRAGMA table_info(time_records)")
+        columns = cursor.fetchall()
+        column_names = [col[1] for col in columns]
+        
+        if not columns:
+            cursor.execute('''
+                CREATE TABLE time_records (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    instructor_id INTEGER,
+                    card_uid TEXT NOT NULL,
+                    instructor_name TEXT NOT NULL,
+                    record_type TEXT NOT NULL CHECK (record_type IN ('IN', 'OUT')),
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        else:
+            if 'instructor_name' not in column_names:
+                cursor.execute("ALTER TABLE time_records ADD COLUMN instructor_name TEXT DEFAULT '未登録'")
+            if 'instructor_id' not in column_names:
+                cursor.execute("ALTER TABLE time_records ADD COLUMN instructor_id INTEGER")
+        
+        # meeting_records テーブル（会議用）
+        cursor.execute("PRAGMA table_info(meeting_records)")
+        meeting_columns = cursor.fetchall()
+        
+        if not meeting_columns:
+            cursor.execute('''
+                CREATE TABLE meeting_records (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    instructor_id INTEGER,
+                    card_uid TEXT NOT NULL,
+                    instructor_name TEXT NOT NULL,
+                    record_type TEXT NOT NULL CHECK (record_type IN ('IN', 'OUT')),
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        
+        # instructors テーブル（講師マスタ）
+        cursor.execute("PRAGMA table_info(instructors)")
+        instructors_columns = cursor.fetchall()
+        
+        if not instructors_columns:
+            cursor.execute('''
+                CREATE TABLE instructors (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    instructor_id INTEGER UNIQUE NOT NULL,
+                    card_uid TEXT UNIQUE NOT NULL,
+                    name TEXT NOT NULL,
+                    created_at TIMESTAMP NOT NULL
+                )
+            ''')
+        
+        # master_keys テーブル（マスターキーカード管理）
+        cursor.execute("PRAGMA table_info(master_keys)")
+        master_keys_columns = cursor.fetchall()
+        
+        if not master_keys_columns:
+            cursor.execute('''
+                CREATE TABLE master_keys (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    card_uid TEXT UNIQUE NOT NULL,
+                    description TEXT,
+                    created_at TIMESTAMP NOT NULL,
+                    is_active INTEGER DEFAULT 1
+                )
+            ''')
+    
+    def _migrate_v2(self, cursor):
+        """v2: 打刻テーブルの検索用インデックスを作成"""
+        for table_name in RECORD_TABLES:
+            self._create_record_indexes(cursor, table_name)
+    
+    def _create_record_table(self, cursor, table_name, schema="main"):
+        """打刻テーブルとインデックスを作成（schema: 作成先のパーティション）"""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}.{table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                instructor_id INTEGER,
+                card_uid TEXT NOT NULL,
+                instructor_name TEXT NOT NULL,
+                record_type TEXT NOT NULL CHECK (record_type IN ('IN', 'OUT')),
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._create_record_indexes(cursor, table_name, schema)
+    
+    def _create_record_indexes(self, cursor, table_name, schema="main"):
+        """打刻テーブルの検索用インデックスを作成"""
+        # timestamp は "YYYY-MM-DD HH:MM:SS" 形式の文字列なので範囲検索でインデックスが効く
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS {schema}.idx_{table_name}_uid_ts
+            ON {table_name} (card_uid, timestamp, record_type)
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS {schema}.idx_{table_name}_instructor_ts
+            ON {table_name} (instructor_id, timestamp)
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS {schema}.idx_{table_name}_ts
+            ON {table_name} (timestamp, instructor_id, instructor_name, record_type)
+        """)
+    
+    def _migrate_v3(self, cursor):
+        """v3: 打刻ジャーナルの反映済み連番を保存するテーブルを作成"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS punch_journal_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_seq INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO punch_journal_state (id, last_seq) VALUES (1, 0)")
+    
+    def _migrate_v4(self, cursor):
+        """v4: 講師・日付ごとの打刻集計テーブルを作成し、既存の打刻から集計"""
+        # 月次集計は打刻を毎回集計し直さず、このテーブル（講師数×日数の行）を読む
+        self._create_daily_attendance(cursor)
+        self._rebuild_daily_attendance(cursor)
+    
+    def _create_daily_attendance(self, cursor, schema="main"):
+        """打刻集計テーブルを作成（schema: 作成先のパーティション）"""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}.daily_attendance (
+                table_name TEXT NOT NULL,
+                instructor_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                instructor_name TEXT NOT NULL,
+                first_punch TEXT NOT NULL,
+                last_punch TEXT NOT NULL,
+                punch_count INTEGER NOT NULL,
+                PRIMARY KEY (table_name, instructor_id, date)
+            )
+        ''')
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS {schema}.idx_daily_attendance_date
+            ON daily_attendance (table_name, date, instructor_id)
+        """)
+    
+    def _load_record_tables(self):
+        """DBにある打刻テーブル（名前が RECORD_TABLE_NAME_PATTERN に合うもの）を読み込む"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+                names = [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"打刻テーブル読み込みエラー: {e}")
+            return
+        for name in names:
+            if re.match(RECORD_TABLE_NAME_PATTERN, name) and name not in self.record_tables:
+                self.record_tables.append(name)
+    
+    def ensure_record_table(self, table_name):
+        """打刻テーブルがなければ作成（チャンネルを追加したとき、使える状態なら True）"""
+        if table_name in self.record_tables:
+            return True
+        if not re.match(RECORD_TABLE_NAME_PATTERN, table_name):
+            print(f"打刻テーブル名が不正です: {table_name}")
+            return False
+        try:
+            with self._write_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                self._create_record_table(cursor, table_name)
+            self.record_tables.append(table_name)
+            return True
+        except Exception as e:
+            print(f"打刻テーブル作成エラー: {e}")
+            return False
+    
+    def _rebuild_daily_attendance(self, cursor, table_name=None, instructor_id=None, date_str=None, schema="main"):
+        """打刻テーブルから打刻集計を作り直す（講師ID・日付を指定すればその1行だけ、schema: パーティション）"""
+        # 打刻集計は講師ID・日付ごとに1行とする（旧来の打刻テーブルの検索から意図して変えた点）。
+        #   講師IDのない旧データは講師ID 0 として1つにまとめる（旧来は講師IDが NULL の行として講師名ごとに分かれた）
+        #   同じ日に講師名を変更した場合は、その日の最後の打刻の講師名で1行にする（旧来は講師名ごとに分かれた）
+        for record_table in self._schema_tables(schema):
+            if table_name is not None and record_table != table_name:
+                continue
+            
+            if date_str is None:
+                cursor.execute(f"DELETE FROM {schema}.daily_attendance WHERE table_name = ?", (record_table,))
+                condition = ""
+                params = (record_table,)
             else:
-                if 'instructor_name' not in column_names:
-                    cursor.execute("ALTER TABLE time_records ADD COLUMN instructor_name TEXT DEFAULT '未登録'")
-                if 'instructor_id' not in column_names:
-                    cursor.execute("ALTER TABLE time_records ADD COLUMN instructor_id INTEGER")
-            
-            # meeting_records テーブル（会議用）
-            cursor.execute("PRAGMA table_info(meeting_records)")
-            meeting_columns = cursor.fetchall()
-            
-            if not meeting_columns:
-                cursor.execute('''
-                    CREATE TABLE meeting_records (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        instructor_id INTEGER,
-                        card_uid TEXT NOT NULL,
-                        instructor_name TEXT NOT NULL,
-                        record_type TEXT NOT NULL CHECK (record_type IN ('IN', 'OUT')),
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-            
-            # instructors テーブル（講師マスタ）
-            cursor.execute("PRAGMA table_info(instructors)")
-            instructors_columns = cursor.fetchall()
-            
-            if not instructors_columns:
-                cursor.execute('''
-                    CREATE TABLE instructors (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        instructor_id INTEGER UNIQUE NOT NULL,
-                        card_uid TEXT UNIQUE NOT NULL,
-                        name TEXT NOT NULL,
-                        created_at TIMESTAMP NOT NULL
-                    )
-                ''')
-            
-            # master_keys テーブル（マスターキーカード管理）
-            cursor.execute("PRAGMA table_info(master_keys)")
-            master_keys_columns = cursor.fetchall()
-            
-            if not master_keys_columns:
-                cursor.execute('''
-                    CREATE TABLE master_keys (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        card_uid TEXT UNIQUE NOT NULL,
-                        description TEXT,
-                        created_at TIMESTAMP NOT NULL,
-                        is_active INTEGER DEFAULT 1
-                    )
-                ''')
+                cursor.execute(f"""
+                    DELETE FROM {schema}.daily_attendance
+                    WHERE table_name = ? AND instructor_id = ? AND date = ?
+                """, (record_table, instructor_id, date_str))
+                condition = "WHERE timestamp >= ? AND timestamp < ? AND COALESCE(instructor_id, 0) = ?"
+                params = (record_table, *day_range(date_str), instructor_id)
+            
+            cursor.execute(f'''
+                INSERT INTO {schema}.daily_attendance
+                    (table_name, instructor_id, date, instructor_name, first_punch, last_punch, punch_count)
+                SELECT ?, COALESCE(instructor_id, 0), DATE(timestamp),
+                       SUBSTR(MAX(timestamp || instructor_name), LENGTH(MAX(timestamp)) + 1),
+                       MIN(timestamp), MAX(timestamp), COUNT(*)
+                FROM {schema}.{record_table}
+                {condition}
+                GROUP BY COALESCE(instructor_id, 0), DATE(timestamp)
+            ''', params)
+    
+    def _add_to_daily_attendance(self, cursor, table_name, rows, schema="main"):
+        """打刻を打刻集計に反映（rows: (講師ID, カードUID, 講師名, 打刻種別, 打刻日時) のリスト）"""
+        # 講師名はその日の最後の打刻のもの（_rebuild_daily_attendance と同じ）
+        cursor.executemany(f'''
+            INSERT INTO {schema}.daily_attendance
+                (table_name, instructor_id, date, instructor_name, first_punch, last_punch, punch_count)
+            VALUES (?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT (table_name, instructor_id, date) DO UPDATE SET
+                instructor_name = CASE WHEN excluded.last_punch >= last_punch
+                                       THEN excluded.instructor_name ELSE instructor_name END,
+                first_punch = MIN(first_punch, excluded.first_punch),
+                last_punch = MAX(last_punch, excluded.last_punch),
+                punch_count = punch_count + 1
+        ''', [
+            (table_name, instructor_id if instructor_id is not None else 0, timestamp[:10], name, timestamp, timestamp)
+            for instructor_id, card_uid, name, record_type, timestamp in rows
+        ])
+    
+    def rebuild_daily_attendance(self):
+        """打刻集計をすべて（アーカイブも）作り直す（打刻テーブルを直接編集した後に使用）"""
+        try:
+            schemas = ["main"] + [f"archive_{year}" for year in self.archives.years()]
+            for schema in schemas:
+                with self._partition_connection(write=True, schemas=[schema]) as (conn, _):
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    self._rebuild_daily_attendance(cursor, schema=schema)
+            return True
+        except Exception as e:
+            print(f"打刻集計作成エラー: {e}")
+            return False
+    
+    def archive_closed_periods(self, today=None, vacuum=True):
+        """締めた年（終わってから ARCHIVE_AFTER_DAYS 日以上たった年）の打刻を年ごとのアーカイブに移動（移動した年のリストを返す）"""
+        if today is None:
+            today = datetime.now(JST).date()
+        # 書き込み待ちの打刻を先にDBへ反映する
+        self.flush_punches(timeout=10)
+        
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                firsts = []
+                for table_name in list(self.record_tables):
+                    cursor.execute(f"SELECT MIN(timestamp) FROM {table_name}")
+                    first = cursor.fetchone()[0]
+                    if first:
+                        firsts.append(first)
+        except Exception as e:
+            print(f"アーカイブ対象の確認エラー: {e}")
+            return []
+        if not firsts:
+            return []
+        
+        archived = []
+        for year in range(int(min(firsts)[:4]), today.year):
+            if (today - datetime(year + 1, 1, 1).date()).days < ARCHIVE_AFTER_DAYS:
+                break
+            moved = self._archive_year(year)
+            if moved is None:
+                break
+            if moved:
+                archived.append(year)
+        
+        if archived and vacuum:
+            # 移動した分だけ本体のDBのファイルを小さくする
+            try:
+                with self._write_connection() as conn:
+                    conn.execute("VACUUM")
+                    # WALでは最適化した内容をDBファイルに書き戻すまでファイルが小さくならない
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except Exception as e:
+                print(f"データベース最適化エラー: {e}")
+        return archived
+    
+    def _archive_year(self, year):
+        """1年分の打刻をアーカイブに移動（移動したら True、本体のDBになければ False、失敗したら None）"""
+        # アーカイブへの複写と本体からの削除は別のトランザクションで行う
+        start, end = f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+        schema = f"archive_{year}"
+        tables = list(self.record_tables)
+        path = self.archives.path(year)
+        # 新しいアーカイブは別名で作り、複写が終わってから名前を変える（途中で止まったファイルを使わない）
+        target = path if os.path.exists(path) else path + ".partial"
+        if target != path:
+            schema = "archive_partial"
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                exists = False
+                for table_name in tables:
+                    cursor.execute(f"SELECT 1 FROM {table_name} WHERE timestamp >= ? AND timestamp < ? LIMIT 1",
+                                   (start, end))
+                    exists = exists or cursor.fetchone() is not None
+            if not exists:
+                return False
             
-            conn.commit()
-            conn.close()
+            os.makedirs(self.archives.archive_dir, exist_ok=True)
+            with self._write_connection() as conn:
+                # 1. アーカイブに複写（既にある同じIDの行は飛ばす）
+                if target == path:
+                    self._attach_partitions(conn, [schema])
+                else:
+                    conn.execute(f"ATTACH DATABASE ? AS {schema}", (target,))
+                try:
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    self._create_daily_attendance(cursor, schema)
+                    for table_name in tables:
+                        self._create_record_table(cursor, table_name, schema)
+                        cursor.execute(f"""
+                            INSERT OR IGNORE INTO {schema}.{table_name} ({RECORD_COLUMNS})
+                            SELECT {RECORD_COLUMNS} FROM main.{table_name}
+                            WHERE timestamp >= ? AND timestamp < ?
+                        """, (start, end))
+                        
+                        # すべての行を複写できたことを確認してから本体の行を消す
+                        cursor.execute(f"""
+                            SELECT COUNT(*) FROM main.{table_name} AS m
+                            WHERE m.timestamp >= ? AND m.timestamp < ? AND NOT EXISTS (
+                                SELECT 1 FROM {schema}.{table_name} AS a
+                                WHERE a.id = m.id AND a.card_uid = m.card_uid AND a.timestamp = m.timestamp
+                            )
+                        """, (start, end))
+                        missing = cursor.fetchone()[0]
+                        if missing:
+                            raise sqlite3.IntegrityError(f"{table_name} の {missing} 件を複写できませんでした")
+                    cursor.execute(f"""
+                        INSERT OR REPLACE INTO {schema}.daily_attendance ({DAILY_COLUMNS})
+                        SELECT {DAILY_COLUMNS} FROM main.daily_attendance
+                        WHERE date >= ? AND date < ?
+                    """, (start, end))
+                    conn.commit()
+                finally:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    if target != path:
+                        conn.execute(f"DETACH DATABASE {schema}")
+                
+                if target != path:
+                    os.replace(target, path)
+                # ここからは検索がアーカイブに向く
+                self.archives.add(year)
+                
+                # 2. 本体のDBから削除
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                for table_name in tables:
+                    cursor.execute(f"DELETE FROM {table_name} WHERE timestamp >= ? AND timestamp < ?", (start, end))
+                cursor.execute("DELETE FROM daily_attendance WHERE date >= ? AND date < ?", (start, end))
             
+            print(f"{year}年の打刻をアーカイブしました: {path}")
+            return True
         except Exception as e:
-            print(f"データベース初期化エラー: {e}")
+            print(f"アーカイブ作成エラー ({year}): {e}")
+            if target != path and os.path.exists(target):
+                try:
+                    os.remove(target)
+                except OSError:
+                    pass
+            return None
     
     def load_instructors(self):
         """DBから講師データ読み込み（UID→名前の辞書）"""
         instructors = {}
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT card_uid, name FROM instructors")
-            for card_uid, name in cursor.fetchall():
-                instructors[card_uid] = name
-            
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("SELECT card_uid, name FROM instructors")
+                for card_uid, name in cursor.fetchall():
+                    instructors[card_uid] = name
+                    
             return instructors
         except Exception as e:
             print(f"講師データ読み込みエラー: {e}")
@@ -113,38 +675,73 @@ class DatabaseManager:
         """DBから講師データ読み込み（全情報）"""
         instructors = []
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT instructor_id, card_uid, name, created_at
-                FROM instructors
-                ORDER BY instructor_id
-            """)
-            
-            for instructor_id, card_uid, name, created_at in cursor.fetchall():
-                instructors.append({
-                    'instructor_id': str(instructor_id),
-                    'card_uid': card_uid,
-                    'name': name,
-                    'created_at': created_at
-                })
-            
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    SELECT instructor_id, card_uid, name, created_at
+                    FROM instructors
+                    ORDER BY instructor_id
+                """)
+                
+                for instructor_id, card_uid, name, created_at in cursor.fetchall():
+                    instructors.append({
+                        'instructor_id': str(instructor_id),
+                        'card_uid': card_uid,
+                        'name': name,
+                        'created_at': created_at
+                    })
+                    
             return instructors
         except Exception as e:
             print(f"講師データ読み込みエラー: {e}")
             return []
     
+    def count_instructors(self):
+        """登録講師数"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM instructors")
+                return cursor.fetchone()[0]
+        except Exception as e:
+            print(f"講師数取得エラー: {e}")
+            return 0
+    
+    def get_instructors_page(self, after=None, limit=100):
+        """(講師番号, カードUID, 講師名, 登録日時) を講師番号順に limit 件取得（after: 前のページの最後の講師番号）"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                if after is None:
+                    condition = ""
+                    params = (limit,)
+                else:
+                    condition = "WHERE instructor_id > ?"
+                    params = (after, limit)
+                
+                cursor.execute(f"""
+                    SELECT instructor_id, card_uid, name, created_at
+                    FROM instructors
+                    {condition}
+                    ORDER BY instructor_id
+                    LIMIT ?
+                """, params)
+                return cursor.fetchall()
+                
+        except Exception as e:
+            print(f"講師データ読み込みエラー: {e}")
+            return []
+    
     def get_next_instructor_id(self):
         """次の講師番号を取得"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT MAX(instructor_id) FROM instructors")
-            result = cursor.fetchone()
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("SELECT MAX(instructor_id) FROM instructors")
+                result = cursor.fetchone()
             
             max_id = result[0] if result[0] is not None else 0
             return max_id + 1
@@ -153,27 +750,10 @@ class DatabaseManager:
             return 1
     
     def get_instructor_info_by_uid(self, card_uid):
-        """UIDから講師情報取得"""
+        """UIDから講師情報取得（メモリキャッシュから）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT instructor_id, card_uid, name
-                FROM instructors
-                WHERE card_uid = ?
-            """, (card_uid,))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result:
-                return {
-                    'instructor_id': result[0],
-                    'card_uid': result[1],
-                    'name': result[2]
-                }
-            return None
+            with metrics.span("db.instructor_lookup"):
+                return self.directory.get_by_uid(card_uid)
         except Exception as e:
             print(f"講師情報取得エラー: {e}")
             return None
@@ -181,17 +761,16 @@ class DatabaseManager:
     def get_instructor_info_by_id(self, instructor_id):
         """講師番号から講師情報取得"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT instructor_id, card_uid, name
-                FROM instructors
-                WHERE instructor_id = ?
-            """, (instructor_id,))
-            
-            result = cursor.fetchone()
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    SELECT instructor_id, card_uid, name
+                    FROM instructors
+                    WHERE instructor_id = ?
+                """, (instructor_id,))
+                
+                result = cursor.fetchone()
             
             if result:
                 return {
@@ -207,43 +786,45 @@ class DatabaseManager:
     def add_instructor_with_id(self, instructor_id, card_uid, name):
         """講師を指定IDで追加"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 重複チェック
-            cursor.execute("SELECT instructor_id FROM instructors WHERE card_uid = ?", (card_uid,))
-            if cursor.fetchone():
-                conn.close()
-                return False
-            
-            # 挿入
-            created_at = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
-            cursor.execute("""
-                INSERT INTO instructors (instructor_id, card_uid, name, created_at)
-                VALUES (?, ?, ?, ?)
-            """, (instructor_id, card_uid, name, created_at))
-            
-            conn.commit()
-            conn.close()
+            with self._write_connection() as conn:
+                cursor = conn.cursor()
+                
+                # 重複チェック
+                cursor.execute("SELECT instructor_id FROM instructors WHERE card_uid = ?", (card_uid,))
+                if cursor.fetchone():
+                    return False
+                
+                # 挿入
+                created_at = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
+                cursor.execute("""
+                    INSERT INTO instructors (instructor_id, card_uid, name, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, (instructor_id, card_uid, name, created_at))
+                
+            self.directory.invalidate()
             return True
             
         except Exception as e:
             print(f"講師登録エラー: {e}")
-            if 'conn' in locals():
-                conn.close()
             return False
     
     def get_last_record(self, card_uid, table_name="time_records"):
         """最後の打刻記録を取得"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = f"SELECT record_type, timestamp FROM {table_name} WHERE card_uid = ? ORDER BY timestamp DESC LIMIT 1"
-            cursor.execute(query, (card_uid,))
-            
-            result = cursor.fetchone()
-            conn.close()
+            # 本体のDB、新しいアーカイブの順に探す
+            result = None
+            for schema in ["main"] + [f"archive_{year}" for year in reversed(self.archives.years())]:
+                if table_name not in self._schema_tables(schema):
+                    continue
+                with self._partition_connection(schemas=[schema]) as (conn, _):
+                    cursor = conn.cursor()
+                    
+                    query = f"SELECT record_type, timestamp FROM {schema}.{table_name} WHERE card_uid = ? ORDER BY timestamp DESC LIMIT 1"
+                    cursor.execute(query, (card_uid,))
+                    
+                    result = cursor.fetchone()
+                if result:
+                    break
             
             if result:
                 return {"type": result[0], "timestamp": result[1]}
@@ -255,76 +836,231 @@ class DatabaseManager:
     
     def record_attendance_to_db(self, card_uid, name, instructor_id, record_type, timestamp, table_name="time_records"):
         """データベースに打刻記録"""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                conn = sqlite3.connect(self.db_path, timeout=10.0)
+        try:
+            # 書き込みはプロセス内で直列化し、他プロセスとの競合はbusy timeoutで待機する
+            # アーカイブした年の日時（打刻の修正）はその年のアーカイブに記録する
+            schema = self._schema_for_timestamp(timestamp)
+            created = table_name not in self._schema_tables(schema)
+            with self._partition_connection(write=True, schemas=[schema]) as (conn, _):
                 cursor = conn.cursor()
                 
-                query = f"INSERT INTO {table_name} (instructor_id, card_uid, instructor_name, record_type, timestamp) VALUES (?, ?, ?, ?, ?)"
-                cursor.execute(query, (instructor_id, card_uid, name, record_type, timestamp))
+                if created:
+                    # 追加したチャンネル（アーカイブの後に追加した場合も）の打刻テーブル
+                    self._create_missing_record_table(cursor, table_name, schema)
                 
-                conn.commit()
-                conn.close()
-                return True
+                query = f"INSERT INTO {schema}.{table_name} (instructor_id, card_uid, instructor_name, record_type, timestamp) VALUES (?, ?, ?, ?, ?)"
+                cursor.execute(query, (instructor_id, card_uid, name, record_type, timestamp))
                 
-            except sqlite3.OperationalError as e:
-                if "database is locked" in str(e) and attempt < max_retries - 1:
-                    time.sleep(0.5)
-                    continue
-                else:
-                    print(f"打刻記録エラー: {e}")
-                    return False
-            except Exception as e:
-                print(f"打刻記録エラー: {e}")
-                return False
-            finally:
-                try:
-                    if 'conn' in locals():
-                        conn.close()
-                except:
-                    pass
+                # 打刻集計も同じトランザクションで更新
+                self._add_to_daily_attendance(
+                    cursor, table_name, [(instructor_id, card_uid, name, record_type, timestamp)], schema
+                )
+            if created:
+                self._note_created_table(schema, table_name)
+            
+            self.day_state.note_insert(card_uid, timestamp, table_name)
+            return True
+            
+        except Exception as e:
+            print(f"打刻記録エラー: {e}")
+            return False
+    
+    def record_punch(self, card_uid, name, instructor_id, table_name="time_records"):
+        """カード打刻を記録（出勤・退勤を自動判定、戻り値: (打刻種別, 打刻日時)、失敗時は None）"""
+        try:
+            with metrics.span("db.record_punch"):
+                return self.day_state.punch(card_uid, name, instructor_id, table_name)
+        except Exception as e:
+            print(f"打刻記録エラー: {e}")
+            return None
+    
+    def enqueue_attendance(self, card_uid, name, instructor_id, record_type, timestamp, table_name="time_records"):
+        """打刻をジャーナルに保存し、DBへは書き込みスレッドで記録（保存できれば True）"""
+        return self.punch_writer.submit(card_uid, name, instructor_id, record_type, timestamp, table_name)
+    
+    def record_attendance_batch(self, entries):
+        """ジャーナルの打刻をまとめて記録（反映済みの連番も同じトランザクションで更新）"""
+        # 打刻は通常すべて本体のDB（アーカイブした年の日時のものだけアーカイブ）に記録する
+        rows_by_table = {}
+        for entry in entries:
+            schema = self._schema_for_timestamp(entry['timestamp'])
+            rows_by_table.setdefault((schema, entry['table']), []).append((
+                entry['instructor_id'], entry['card_uid'], entry['name'],
+                entry['record_type'], entry['timestamp']
+            ))
+        schemas = list(dict.fromkeys(schema for schema, _ in rows_by_table))
+        created = [(schema, table_name) for schema, table_name in rows_by_table
+                   if table_name not in self._schema_tables(schema)]
         
-        return False
+        with metrics.span("db.write_batch"), \
+                self._partition_connection(write=True, schemas=schemas or ["main"]) as (conn, _):
+            cursor = conn.cursor()
+            
+            for (schema, table_name), rows in rows_by_table.items():
+                if (schema, table_name) in created:
+                    self._create_missing_record_table(cursor, table_name, schema)
+                query = f"INSERT INTO {schema}.{table_name} (instructor_id, card_uid, instructor_name, record_type, timestamp) VALUES (?, ?, ?, ?, ?)"
+                cursor.executemany(query, rows)
+                self._add_to_daily_attendance(cursor, table_name, rows, schema)
+            
+            last_seq = max(entry['seq'] for entry in entries)
+            cursor.execute("UPDATE punch_journal_state SET last_seq = ? WHERE id = 1", (last_seq,))
+        # コミット後は例外を出さない（出すと書き込みスレッドが同じ打刻を記録し直す）
+        for schema, table_name in created:
+            self._note_created_table(schema, table_name)
+        metrics.increment("db.rows_written", len(entries))
+    
+    def get_journal_last_seq(self):
+        """DBに反映済みの打刻ジャーナル連番を取得"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT last_seq FROM punch_journal_state WHERE id = 1")
+            result = cursor.fetchone()
+        return result[0] if result else 0
+    
+    def advance_journal_last_seq(self, seq):
+        """退避した打刻の連番まで反映済みにする（再起動時に再投入しないため）"""
+        with self._write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE punch_journal_state SET last_seq = MAX(last_seq, ?) WHERE id = 1", (seq,))
+    
+    def flush_punches(self, timeout=None):
+        """書き込み待ちの打刻がDBに反映されるまで待機"""
+        return self.punch_writer.flush(timeout)
+    
+    def get_punch_counts(self, date_str):
+        """特定日付のテーブル・UID別打刻回数を取得（{(テーブル名, UID): 回数}、書き込み待ちを含む）"""
+        counts = {}
+        start, end = day_range(date_str)
+        # 書き込み待ちはDBを読む前に取得し、読んだ時点で反映済みの連番以下は除く（二重計上・計上漏れを防ぐ）
+        pending = self.punch_writer.pending_entries()
+        with self._partition_connection(start, end) as (conn, schemas):
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT last_seq FROM punch_journal_state WHERE id = 1")
+            result = cursor.fetchone()
+            last_seq = result[0] if result else 0
+            
+            for table_name in list(self.record_tables):
+                query = f'''
+                    SELECT card_uid, COUNT(*)
+                    FROM {self._record_source(schemas, table_name)}
+                    WHERE timestamp >= ? AND timestamp < ?
+                    GROUP BY card_uid
+                '''
+                cursor.execute(query, (start, end))
+                for card_uid, count in cursor.fetchall():
+                    counts[(table_name, card_uid)] = count
+        
+        for entry in pending:
+            if entry['seq'] > last_seq and entry['timestamp'].startswith(date_str):
+                key = (entry['table'], entry['card_uid'])
+                counts[key] = counts.get(key, 0) + 1
+                    
+        return counts
     
     def get_date_records(self, date_str, table_name="time_records"):
         """特定日付の打刻記録取得"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = f'''
-                SELECT instructor_name, record_type, timestamp 
-                FROM {table_name}
-                WHERE DATE(timestamp) = ?
-                ORDER BY timestamp DESC
-            '''
-            cursor.execute(query, (date_str,))
-            
-            results = cursor.fetchall()
-            conn.close()
+            start, end = day_range(date_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f'''
+                    SELECT instructor_name, record_type, timestamp
+                    FROM {self._record_source(schemas, table_name)}
+                    WHERE timestamp >= ? AND timestamp < ?
+                    ORDER BY timestamp DESC
+                '''
+                cursor.execute(query, (start, end))
+                
+                results = cursor.fetchall()
             return results
             
         except Exception as e:
             print(f"記録取得エラー: {e}")
             return []
     
-    def get_date_records_by_uid(self, card_uid, date_str, table_name="time_records"):
-        """特定のUIDとその日の打刻記録を取得"""
+    def count_date_records(self, date_str, table_name="time_records"):
+        """特定日付の打刻記録数"""
+        try:
+            start, end = day_range(date_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f"SELECT COUNT(*) FROM {self._record_source(schemas, table_name)} WHERE timestamp >= ? AND timestamp < ?"
+                cursor.execute(query, (start, end))
+                return cursor.fetchone()[0]
+                
+        except Exception as e:
+            print(f"記録件数取得エラー: {e}")
+            return 0
+    
+    def get_date_records_page(self, date_str, table_name="time_records", after=None, limit=100):
+        """特定日付の (ID, 講師名, 打刻種別, 打刻日時) を新しい順に limit 件取得（after: 前のページの最後の (打刻日時, ID)）"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            start, end = day_range(date_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                if after is None:
+                    condition = ""
+                    params = (start, end, limit)
+                else:
+                    condition = "AND (timestamp, id) < (?, ?)"
+                    params = (start, end, *after, limit)
+                
+                query = f'''
+                    SELECT id, instructor_name, record_type, timestamp
+                    FROM {self._record_source(schemas, table_name)}
+                    WHERE timestamp >= ? AND timestamp < ? {condition}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                '''
+                cursor.execute(query, params)
+                return cursor.fetchall()
+                
+        except Exception as e:
+            print(f"記録取得エラー: {e}")
+            return []
+    
+    def iter_date_records(self, date_str, table_name="time_records", fetch_size=1000):
+        """特定日付の打刻記録を fetch_size 件ずつ読み込みながら返す（並び順は get_date_records と同じ）"""
+        start, end = day_range(date_str)
+        with self._partition_connection(start, end) as (conn, schemas):
             cursor = conn.cursor()
             
             query = f'''
-                SELECT record_type, timestamp 
-                FROM {table_name}
-                WHERE card_uid = ? AND DATE(timestamp) = ?
-                ORDER BY timestamp
+                SELECT instructor_name, record_type, timestamp
+                FROM {self._record_source(schemas, table_name)}
+                WHERE timestamp >= ? AND timestamp < ?
+                ORDER BY timestamp DESC
             '''
-            cursor.execute(query, (card_uid, date_str))
-            
-            results = cursor.fetchall()
-            conn.close()
+            cursor.execute(query, (start, end))
+            
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+    
+    def get_date_records_by_uid(self, card_uid, date_str, table_name="time_records"):
+        """特定のUIDとその日の打刻記録を取得"""
+        try:
+            start, end = day_range(date_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f'''
+                    SELECT record_type, timestamp
+                    FROM {self._record_source(schemas, table_name)}
+                    WHERE card_uid = ? AND timestamp >= ? AND timestamp < ?
+                    ORDER BY timestamp
+                '''
+                cursor.execute(query, (card_uid, start, end))
+                
+                results = cursor.fetchall()
             return results
             
         except Exception as e:
@@ -334,46 +1070,111 @@ class DatabaseManager:
     def get_date_summary(self, date_str, table_name="time_records"):
         """特定日付のサマリー取得"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = f'''
-                SELECT instructor_name, record_type, timestamp
-                FROM {table_name}
-                WHERE DATE(timestamp) = ?
-                ORDER BY instructor_name, timestamp
-            '''
-            cursor.execute(query, (date_str,))
+            start, end = day_range(date_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f'''
+                    SELECT instructor_name, record_type, timestamp
+                    FROM {self._record_source(schemas, table_name)}
+                    WHERE timestamp >= ? AND timestamp < ?
+                    ORDER BY instructor_name, timestamp
+                '''
+                cursor.execute(query, (start, end))
+                
+                results = cursor.fetchall()
             
-            results = cursor.fetchall()
-            conn.close()
+            return self._summarize_records(results)
             
-            if not results:
-                return []
+        except Exception as e:
+            print(f"サマリー取得エラー: {e}")
+            return []
             
-            # 講師ごとにグループ化
-            instructor_records = {}
-            for name, record_type, timestamp in results:
-                if name not in instructor_records:
-                    instructor_records[name] = []
-                instructor_records[name].append((record_type, timestamp))
+    def _summarize_records(self, results):
+        """(講師名, 打刻種別, 打刻日時) の講師名・時刻順のリストを講師ごとのサマリーにまとめる"""
+        if not results:
+            return []
+                
+        # 講師ごとにグループ化
+        instructor_records = {}
+        for name, record_type, timestamp in results:
+            if name not in instructor_records:
+                instructor_records[name] = []
+            instructor_records[name].append((record_type, timestamp))
+                
+        summary = []
+        for name, records in instructor_records.items():
+            last_record = records[-1]
+            status = "出勤中" if last_record[0] == "IN" else "退勤済"
+            last_time = last_record[1]
+                
+            # その日の記録を文字列化
+            record_str = ""
+            for record_type, timestamp in records:
+                time_only = timestamp.split()[1][:5] if ' ' in timestamp else timestamp[:5]
+                action = "出" if record_type == "IN" else "退"
+                record_str += f"{action}:{time_only} "
             
-            summary = []
-            for name, records in instructor_records.items():
-                last_record = records[-1]
-                status = "出勤中" if last_record[0] == "IN" else "退勤済"
-                last_time = last_record[1]
-                
-                # その日の記録を文字列化
-                record_str = ""
-                for record_type, timestamp in records:
-                    time_only = timestamp.split()[1][:5] if ' ' in timestamp else timestamp[:5]
-                    action = "出" if record_type == "IN" else "退"
-                    record_str += f"{action}:{time_only} "
-                
-                summary.append((name, status, last_time, record_str.strip()))
+            summary.append((name, status, last_time, record_str.strip()))
             
-            return summary
+        return summary
+    
+    def count_date_summary(self, date_str, table_name="time_records"):
+        """特定日付に打刻した講師数（サマリーの行数）"""
+        try:
+            start, end = day_range(date_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f'''
+                    SELECT COUNT(DISTINCT instructor_name)
+                    FROM {self._record_source(schemas, table_name)}
+                    WHERE timestamp >= ? AND timestamp < ?
+                '''
+                cursor.execute(query, (start, end))
+                return cursor.fetchone()[0]
+                
+        except Exception as e:
+            print(f"サマリー件数取得エラー: {e}")
+            return 0
+    
+    def get_date_summary_page(self, date_str, table_name="time_records", after=None, limit=100):
+        """特定日付のサマリーを講師名順に limit 人分取得（after: 前のページの最後の講師名）"""
+        try:
+            start, end = day_range(date_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                source = self._record_source(schemas, table_name)
+                
+                if after is None:
+                    condition = ""
+                    params = (start, end, limit)
+                else:
+                    condition = "AND instructor_name > ?"
+                    params = (start, end, after, limit)
+                
+                cursor.execute(f'''
+                    SELECT DISTINCT instructor_name
+                    FROM {source}
+                    WHERE timestamp >= ? AND timestamp < ? {condition}
+                    ORDER BY instructor_name
+                    LIMIT ?
+                ''', params)
+                names = [row[0] for row in cursor.fetchall()]
+                
+                if not names:
+                    return []
+                
+                placeholders = ", ".join("?" * len(names))
+                cursor.execute(f'''
+                    SELECT instructor_name, record_type, timestamp
+                    FROM {source}
+                    WHERE timestamp >= ? AND timestamp < ? AND instructor_name IN ({placeholders})
+                    ORDER BY instructor_name, timestamp
+                ''', (start, end, *names))
+                results = cursor.fetchall()
+                
+            return self._summarize_records(results)
             
         except Exception as e:
             print(f"サマリー取得エラー: {e}")
@@ -382,19 +1183,19 @@ class DatabaseManager:
     def get_monthly_dates(self, month_str, table_name="time_records"):
         """対象月の日付一覧を取得"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = f'''
-                SELECT DISTINCT DATE(timestamp) as date
-                FROM {table_name}
-                WHERE strftime('%Y-%m', timestamp) = ?
-                ORDER BY date
-            '''
-            cursor.execute(query, (month_str,))
-            dates = [row[0] for row in cursor.fetchall()]
-            
-            conn.close()
+            start, end = month_range(month_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f'''
+                    SELECT DISTINCT date
+                    FROM {self._daily_source(schemas)}
+                    WHERE table_name = ? AND date >= ? AND date < ?
+                    ORDER BY date
+                '''
+                cursor.execute(query, (table_name, start, end))
+                dates = [row[0] for row in cursor.fetchall()]
+                
             return dates
         except Exception as e:
             print(f"日付一覧取得エラー: {e}")
@@ -403,20 +1204,19 @@ class DatabaseManager:
     def get_monthly_summary_data(self, month_str, table_name="time_records"):
         """月次集計データ取得"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = f'''
-                SELECT instructor_id, instructor_name, DATE(timestamp) as date
-                FROM {table_name}
-                WHERE strftime('%Y-%m', timestamp) = ?
-                GROUP BY instructor_id, instructor_name, DATE(timestamp)
-                ORDER BY instructor_id
-            '''
-            cursor.execute(query, (month_str,))
-            
-            results = cursor.fetchall()
-            conn.close()
+            start, end = month_range(month_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f'''
+                    SELECT instructor_id, instructor_name, date
+                    FROM {self._daily_source(schemas)}
+                    WHERE table_name = ? AND date >= ? AND date < ?
+                    ORDER BY instructor_id, date
+                '''
+                cursor.execute(query, (table_name, start, end))
+                
+                results = cursor.fetchall()
             return results
             
         except Exception as e:
@@ -424,41 +1224,73 @@ class DatabaseManager:
             return []
     
     def get_instructor_monthly_records(self, month_str, instructor_id, table_name="time_records"):
-        """講師の月次打刻記録を取得"""
+        """講師の月次打刻記録を取得（すべての打刻の (日付, 時刻) を日付・時刻順に）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = f'''
-                SELECT DATE(timestamp) as date, TIME(timestamp) as time
-                FROM {table_name}
-                WHERE instructor_id = ? AND strftime('%Y-%m', timestamp) = ?
-                ORDER BY date, time
-            '''
-            cursor.execute(query, (instructor_id, month_str))
-            records = cursor.fetchall()
-            
-            conn.close()
+            start, end = month_range(month_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f'''
+                    SELECT DATE(timestamp) as date, TIME(timestamp) as time
+                    FROM {self._record_source(schemas, table_name)}
+                    WHERE instructor_id = ? AND timestamp >= ? AND timestamp < ?
+                    ORDER BY date, time
+                '''
+                cursor.execute(query, (instructor_id, start, end))
+                records = cursor.fetchall()
+                
             return records
         except Exception as e:
             print(f"講師別記録取得エラー: {e}")
             return []
     
-    def is_master_key(self, card_uid):
-        """マスターキーカードかどうかを確認"""
+    def get_instructor_monthly_first_last(self, month_str, instructor_id, table_name="time_records"):
+        """講師の月内の日ごとの最初と最後の打刻時刻を取得（{日付: (最初の時刻, 最後の時刻)}、打刻集計から）"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            start, end = month_range(month_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f'''
+                    SELECT date, TIME(first_punch), TIME(last_punch)
+                    FROM {self._daily_source(schemas)}
+                    WHERE table_name = ? AND instructor_id = ? AND date >= ? AND date < ?
+                    ORDER BY date
+                '''
+                cursor.execute(query, (table_name, instructor_id, start, end))
+                first_last = {date_str: (first_time, last_time) for date_str, first_time, last_time in cursor.fetchall()}
+                
+            return first_last
+        except Exception as e:
+            print(f"講師別記録取得エラー: {e}")
+            return {}
+    
+    def iter_monthly_first_last(self, month_str, table_name="time_records", fetch_size=1000):
+        """月内の講師・日付ごとの (講師ID, 日付, 最初の打刻時刻, 最後の打刻時刻) を講師ID・日付順に返す"""
+        start, end = month_range(month_str)
+        with self._partition_connection(start, end) as (conn, schemas):
             cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT id FROM master_keys
-                WHERE card_uid = ? AND is_active = 1
-            """, (card_uid,))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            return result is not None
+            # 講師ごとに月の打刻を検索し直さず、1回の検索で全講師分をまとめて読む
+            query = f'''
+                SELECT instructor_id, date, TIME(first_punch), TIME(last_punch)
+                FROM {self._daily_source(schemas)}
+                WHERE table_name = ? AND date >= ? AND date < ?
+                ORDER BY instructor_id, date
+            '''
+            cursor.execute(query, (table_name, start, end))
+            
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+    
+    def is_master_key(self, card_uid):
+        """マスターキーカードかどうかを確認（メモリキャッシュから）"""
+        try:
+            return self.directory.is_master_key(card_uid)
         except Exception as e:
             print(f"マスターキー確認エラー: {e}")
             return False
@@ -466,55 +1298,50 @@ class DatabaseManager:
     def add_master_key(self, card_uid, description=""):
         """マスターキーカードを追加"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 重複チェック
-            cursor.execute("SELECT id FROM master_keys WHERE card_uid = ?", (card_uid,))
-            if cursor.fetchone():
-                conn.close()
-                return False
-            
-            # 挿入
-            created_at = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
-            cursor.execute("""
-                INSERT INTO master_keys (card_uid, description, created_at, is_active)
-                VALUES (?, ?, ?, 1)
-            """, (card_uid, description, created_at))
-            
-            conn.commit()
-            conn.close()
+            with self._write_connection() as conn:
+                cursor = conn.cursor()
+                
+                # 重複チェック
+                cursor.execute("SELECT id FROM master_keys WHERE card_uid = ?", (card_uid,))
+                if cursor.fetchone():
+                    return False
+                
+                # 挿入
+                created_at = datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
+                cursor.execute("""
+                    INSERT INTO master_keys (card_uid, description, created_at, is_active)
+                    VALUES (?, ?, ?, 1)
+                """, (card_uid, description, created_at))
+                
+            self.directory.invalidate()
             return True
             
         except Exception as e:
             print(f"マスターキー登録エラー: {e}")
-            if 'conn' in locals():
-                conn.close()
             return False
     
     def get_master_keys(self):
         """マスターキーカード一覧を取得"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, card_uid, description, created_at, is_active
-                FROM master_keys
-                ORDER BY created_at DESC
-            """)
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'id': row[0],
-                    'card_uid': row[1],
-                    'description': row[2],
-                    'created_at': row[3],
-                    'is_active': row[4]
-                })
-            
-            conn.close()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    SELECT id, card_uid, description, created_at, is_active
+                    FROM master_keys
+                    ORDER BY created_at DESC
+                """)
+                
+                results = []
+                for row in cursor.fetchall():
+                    results.append({
+                        'id': row[0],
+                        'card_uid': row[1],
+                        'description': row[2],
+                        'created_at': row[3],
+                        'is_active': row[4]
+                    })
+                    
             return results
         except Exception as e:
             print(f"マスターキー一覧取得エラー: {e}")
@@ -523,13 +1350,12 @@ class DatabaseManager:
     def delete_master_key(self, card_uid):
         """マスターキーカードを削除"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM master_keys WHERE card_uid = ?", (card_uid,))
-            
-            conn.commit()
-            conn.close()
+            with self._write_connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("DELETE FROM master_keys WHERE card_uid = ?", (card_uid,))
+                
+            self.directory.invalidate()
             return True
         except Exception as e:
             print(f"マスターキー削除エラー: {e}")
@@ -538,36 +1364,58 @@ class DatabaseManager:
     def get_date_records_with_id(self, date_str, table_name="time_records"):
         """特定日付の打刻記録をIDつきで取得"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = f'''
-                SELECT id, instructor_name, record_type, timestamp 
-                FROM {table_name}
-                WHERE DATE(timestamp) = ?
-                ORDER BY timestamp DESC
-            '''
-            cursor.execute(query, (date_str,))
-            
-            results = cursor.fetchall()
-            conn.close()
+            start, end = day_range(date_str)
+            with self._partition_connection(start, end) as (conn, schemas):
+                cursor = conn.cursor()
+                
+                query = f'''
+                    SELECT id, instructor_name, record_type, timestamp
+                    FROM {self._record_source(schemas, table_name)}
+                    WHERE timestamp >= ? AND timestamp < ?
+                    ORDER BY timestamp DESC
+                '''
+                cursor.execute(query, (start, end))
+                
+                results = cursor.fetchall()
             return results
             
         except Exception as e:
             print(f"記録取得エラー: {e}")
             return []
     
-    def delete_attendance_record(self, record_id, table_name="time_records"):
-        """打刻記録を削除"""
+    def delete_attendance_record(self, record_id, table_name="time_records", date_str=None):
+        """打刻記録を削除（date_str: 打刻の日付、指定すればその日のパーティションだけを探す）"""
+        # IDはパーティションごとに振られるため、日付がなければ本体のDB、新しいアーカイブの順に探す
+        if date_str is not None:
+            schemas = self._partition_schemas(*day_range(date_str))
+        else:
+            schemas = ["main"] + [f"archive_{year}" for year in reversed(self.archives.years())]
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            query = f"DELETE FROM {table_name} WHERE id = ?"
-            cursor.execute(query, (record_id,))
-            
-            conn.commit()
-            conn.close()
+            for schema in schemas:
+                if table_name not in self._schema_tables(schema):
+                    continue
+                with self._partition_connection(write=True, schemas=[schema]) as (conn, _):
+                    cursor = conn.cursor()
+                    
+                    cursor.execute(f"SELECT instructor_id, DATE(timestamp) FROM {schema}.{table_name} WHERE id = ?",
+                                   (record_id,))
+                    deleted = cursor.fetchone()
+                    if date_str is not None and deleted and deleted[1] != date_str:
+                        deleted = None
+                    if not deleted:
+                        continue
+                    
+                    query = f"DELETE FROM {schema}.{table_name} WHERE id = ?"
+                    cursor.execute(query, (record_id,))
+                    
+                    # 削除した打刻の日の打刻集計を作り直す
+                    instructor_id, deleted_date = deleted
+                    self._rebuild_daily_attendance(
+                        cursor, table_name, instructor_id if instructor_id is not None else 0, deleted_date, schema
+                    )
+                break
+                
+            self.day_state.invalidate()
             return True
         except Exception as e:
             print(f"打刻記録削除エラー: {e}")
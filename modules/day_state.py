@@ -0,0 +1,71 @@
+# 出退勤管理システム - 当日打刻状態モジュール
+
+import threading
+from datetime import datetime
+from modules.constants import JST
+from modules.metrics import metrics
+
+class DayState:
+    """当日の打刻回数（テーブル・UID別）をメモリに保持するクラス"""
+    
+    # 1回目の打刻は出勤、2回目以降は退勤という判定をDBを検索せずに行う。
+    # 起動時と日付が変わった後の最初の打刻時にDBから作り直す。
+    
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        # 判定とDBへの記録を1つの操作にするため、記録中も保持する（再入可能）
+        self._lock = threading.RLock()
+        self._date = None
+        self._counts = {}
+    
+    def rebuild(self, date_str=None):
+        """DBから当日の打刻回数を読み込み直す"""
+        if date_str is None:
+            date_str = datetime.now(JST).strftime("%Y-%m-%d")
+        
+        with self._lock:
+            self._counts = self.db_manager.get_punch_counts(date_str)
+            self._date = date_str
+    
+    def invalidate(self):
+        """打刻回数を破棄（次回の判定時に読み込み直す）"""
+        with self._lock:
+            self._date = None
+            self._counts = {}
+    
+    def _ensure_date(self, date_str):
+        """保持している日付が違えば作り直す（ロック取得済みで呼び出す）"""
+        if self._date != date_str:
+            self.rebuild(date_str)
+    
+    def decide_record_type(self, card_uid, table_name, date_str):
+        """打刻種別を判定（1回目は IN、2回目以降は OUT）"""
+        with self._lock:
+            self._ensure_date(date_str)
+            count = self._counts.get((table_name, card_uid), 0)
+        return "IN" if count == 0 else "OUT"
+    
+    def note_insert(self, card_uid, timestamp, table_name):
+        """打刻がDBに記録されたことを反映"""
+        with self._lock:
+            if self._date is not None and timestamp.startswith(self._date):
+                key = (table_name, card_uid)
+                self._counts[key] = self._counts.get(key, 0) + 1
+    
+    def punch(self, card_uid, name, instructor_id, table_name):
+        """打刻種別を判定してDBに記録（戻り値: (打刻種別, 打刻日時)、失敗時は None）"""
+        with self._lock:
+            jst_now = datetime.now(JST)
+            date_str = jst_now.strftime("%Y-%m-%d")
+            timestamp_str = jst_now.strftime("%Y-%m-%d %H:%M:%S")
+            
+            with metrics.span("punch.decide"):
+                record_type = self.decide_record_type(card_uid, table_name, date_str)
+            
+            # ジャーナルに保存できた時点で記録済みとして扱う（DBへは書き込みスレッドが反映）
+            if not self.db_manager.enqueue_attendance(card_uid, name, instructor_id,
+                                                      record_type, timestamp_str, table_name):
+                return None
+            self.note_insert(card_uid, timestamp_str, table_name)
+                
+        return record_type, timestamp_str
@@ -0,0 +1,38 @@
+# 出退勤管理システム - イベント通知モジュール
+
+import threading
+
+class EventBus:
+    """イベント（'type' を持つ辞書）を購読者に通知するクラス"""
+    
+    # 通知は publish したスレッドでそのまま行う。
+    # 画面側は受け取ったイベントを root.after で画面のスレッドに渡して表示する。
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = []
+    
+    def subscribe(self, handler, event_type=None):
+        """購読（event_type が None ならすべてのイベント）。戻り値は unsubscribe に渡す"""
+        token = (event_type, handler)
+        with self._lock:
+            self._handlers.append(token)
+        return token
+    
+    def unsubscribe(self, token):
+        """購読を解除"""
+        with self._lock:
+            if token in self._handlers:
+                self._handlers.remove(token)
+    
+    def publish(self, event):
+        """イベントを通知（購読者のエラーは発行元に伝えない）"""
+        with self._lock:
+            handlers = [handler for event_type, handler in self._handlers
+                        if event_type is None or event_type == event['type']]
+        
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                print(f"イベント通知エラー ({event['type']}): {e}")
\ No newline at end of file
@@ -0,0 +1,104 @@
+# 出退勤管理システム - エクスポート処理のバックグラウンド実行モジュール
+
+import queue
+import threading
+import time
+
+class ExportCancelled(Exception):
+    """エクスポートが中止された"""
+
+
+def check_cancelled(cancel_event):
+    """中止が要求されていれば ExportCancelled を送出"""
+    if cancel_event is not None and cancel_event.is_set():
+        raise ExportCancelled()
+
+
+class ExportJobRunner:
+    """エクスポート処理を専用スレッドで順番に実行するクラス"""
+    
+    # 処理の状況は events キューに辞書で送る（画面側が root.after で取り出して表示する）。
+    #   start:     {'type', 'job'}
+    #   progress:  {'type', 'job', 'message'}
+    #   done:      {'type', 'job', 'result', 'elapsed'}
+    #   cancelled: {'type', 'job', 'elapsed'}
+    #   error:     {'type', 'job', 'error', 'elapsed'}
+    #   finished:  {'type', 'elapsed'}  待ちの処理がすべて終わった（elapsed は全体の処理時間）
+    
+    def __init__(self):
+        self.events = queue.Queue()
+        self._jobs = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._started_at = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def submit(self, name, func):
+        """処理を追加（func(progress, cancel_event) は結果の文字列を返す）"""
+        with self._lock:
+            if self._active == 0:
+                self._cancel_event.clear()
+                self._started_at = time.perf_counter()
+            self._active += 1
+        self._jobs.put((name, func))
+    
+    def cancel(self):
+        """実行中・待ちの処理を中止"""
+        self._cancel_event.set()
+    
+    def is_busy(self):
+        """実行中・待ちの処理があるかどうか"""
+        with self._lock:
+            return self._active > 0
+    
+    def poll_events(self):
+        """届いている処理状況をすべて取り出す"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+    
+    def _run(self):
+        """実行スレッド"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            
+            name, func = job
+            started = time.perf_counter()
+            
+            if self._cancel_event.is_set():
+                self.events.put({'type': 'cancelled', 'job': name, 'elapsed': 0.0})
+            else:
+                self.events.put({'type': 'start', 'job': name})
+                
+                def progress(message, name=name):
+                    self.events.put({'type': 'progress', 'job': name, 'message': message})
+                
+                try:
+                    result = func(progress, self._cancel_event)
+                    self.events.put({'type': 'done', 'job': name, 'result': result,
+                                     'elapsed': time.perf_counter() - started})
+                except ExportCancelled:
+                    self.events.put({'type': 'cancelled', 'job': name,
+                                     'elapsed': time.perf_counter() - started})
+                except Exception as e:
+                    print(f"エクスポート処理エラー ({name}): {e}")
+                    self.events.put({'type': 'error', 'job': name, 'error': f"{e}",
+                                     'elapsed': time.perf_counter() - started})
+            
+            with self._lock:
+                self._active -= 1
+                if self._active == 0:
+                    self.events.put({'type': 'finished',
+                                     'elapsed': time.perf_counter() - self._started_at})
+    
+    def stop(self):
+        """実行中の処理を中止してスレッドを終了"""
+        self.cancel()
+        self._jobs.put(None)
\ No newline at end of file
@@ -0,0 +1,129 @@
+# 出退勤管理システム - 講師ディレクトリ（メモリキャッシュ）モジュール
+
+import sqlite3
+import threading
+import time
+
+class InstructorDirectory:
+    """講師・マスターキー情報のメモリキャッシュ"""
+    
+    # instructors / master_keys を一度だけ読み込み、打刻時の検索をDBアクセスなしで行う。
+    # このアプリからの変更は invalidate() で世代を進めて次の検索時に読み込み直す。
+    # 外部ツールからの変更は PRAGMA data_version の変化で検知し（check_interval 秒ごと）、
+    # 打刻の書き込みでも値は変わるため、検索を止めないよう別スレッドで読み込み直す。
+    
+    def __init__(self, db_path, check_interval=5.0):
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._by_uid = None
+        self._master_keys = set()
+        self._generation = 0
+        self._loaded_generation = None
+        self._data_version = None
+        self._last_check = 0.0
+        self._reloading = False
+        self._conn = None
+    
+    def _watch_connection(self):
+        """data_version 監視用の専用接続（他の接続のコミットで値が変わる）"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._conn
+    
+    def _read(self, conn):
+        """講師・マスターキーを読み込み（戻り値: (UID別の講師情報, マスターキーのUID)）"""
+        cursor = conn.cursor()
+        
+        by_uid = {}
+        cursor.execute("SELECT instructor_id, card_uid, name FROM instructors")
+        for instructor_id, card_uid, name in cursor.fetchall():
+            by_uid[card_uid] = {
+                'instructor_id': instructor_id,
+                'card_uid': card_uid,
+                'name': name
+            }
+        
+        cursor.execute("SELECT card_uid FROM master_keys WHERE is_active = 1")
+        master_keys = {row[0] for row in cursor.fetchall()}
+        return by_uid, master_keys
+    
+    def _load(self):
+        """講師・マスターキーを読み込み（ロック取得済みで呼び出す）"""
+        conn = self._watch_connection()
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA data_version")
+        data_version = cursor.fetchone()[0]
+        
+        self._by_uid, self._master_keys = self._read(conn)
+        self._loaded_generation = self._generation
+        self._data_version = data_version
+        self._last_check = time.monotonic()
+    
+    def _reload(self, data_version, generation):
+        """外部で変更されたデータを別スレッドで読み込み直す"""
+        by_uid = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                by_uid, master_keys = self._read(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"講師データ読み込みエラー: {e}")
+        
+        with self._lock:
+            self._reloading = False
+            # 読み込み中にこのアプリから変更されていれば、次の検索時の読み込みに任せる
+            if by_uid is not None and generation == self._generation:
+                self._by_uid = by_uid
+                self._master_keys = master_keys
+                self._data_version = data_version
+    
+    def _ensure_loaded(self):
+        """未読込・このアプリで変更済みなら読み込み、外部で変更されていれば別スレッドで読み込み（ロック取得済みで呼び出す）"""
+        if self._by_uid is None or self._loaded_generation != self._generation:
+            self._load()
+            return
+        
+        now = time.monotonic()
+        if self._reloading or now - self._last_check < self.check_interval:
+            return
+        
+        self._last_check = now
+        cursor = self._watch_connection().cursor()
+        cursor.execute("PRAGMA data_version")
+        data_version = cursor.fetchone()[0]
+        if data_version != self._data_version:
+            self._reloading = True
+            threading.Thread(target=self._reload, args=(data_version, self._generation), daemon=True).start()
+    
+    def refresh(self):
+        """すぐに読み込み直す"""
+        with self._lock:
+            self._load()
+    
+    def invalidate(self):
+        """このアプリで講師・マスターキーを変更したら呼び出す（次回の検索時に読み込み直す）"""
+        with self._lock:
+            self._generation += 1
+    
+    def get_by_uid(self, card_uid):
+        """UIDから講師情報取得（未登録なら None）"""
+        with self._lock:
+            self._ensure_loaded()
+            info = self._by_uid.get(card_uid)
+        return dict(info) if info else None
+    
+    def is_master_key(self, card_uid):
+        """有効なマスターキーカードかどうか"""
+        with self._lock:
+            self._ensure_loaded()
+            return card_uid in self._master_keys
+    
+    def close(self):
+        """監視用の接続を閉じる"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
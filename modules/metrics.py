@@ -0,0 +1,206 @@
+# 出退勤管理システム - 処理時間の計測モジュール
+
+import json
+import threading
+import time
+from datetime import datetime
+from modules.constants import METRICS_ENABLED, METRICS_LOG_INTERVAL, METRICS_LOG_MAX_BYTES, METRICS_LOG_BACKUP_COUNT
+
+# 2のべき乗の区間をいくつに分けるか（相対誤差は約 1/16 = 6%）
+SUB_BUCKET_BITS = 4
+
+
+class LatencyHistogram:
+    """処理時間のヒストグラム（HDR形式: 2のべき乗ごとの区間を等分、マイクロ秒単位）"""
+    
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+    
+    def record(self, us):
+        us = max(0, int(us))
+        # 区間の下限をキーにする（小さい値はそのまま、大きい値は上位 SUB_BUCKET_BITS+1 ビットに丸める）
+        shift = max(0, us.bit_length() - SUB_BUCKET_BITS - 1)
+        bucket = (us >> shift) << shift
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total_us += us
+        self.min_us = us if self.min_us is None else min(self.min_us, us)
+        self.max_us = max(self.max_us, us)
+    
+    def percentile(self, p):
+        """p パーセンタイル（その区間の上限、マイクロ秒）"""
+        if self.count == 0:
+            return 0
+        target = max(1, int(round(self.count * p / 100)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                shift = max(0, bucket.bit_length() - SUB_BUCKET_BITS - 1)
+                return min(self.max_us, bucket + (1 << shift) - 1)
+        return self.max_us
+    
+    def summary(self):
+        """件数・平均・パーセンタイル（ミリ秒）"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_us / self.count / 1000, 3) if self.count else 0.0,
+            'min_ms': round((self.min_us or 0) / 1000, 3),
+            'p50_ms': round(self.percentile(50) / 1000, 3),
+            'p95_ms': round(self.percentile(95) / 1000, 3),
+            'p99_ms': round(self.percentile(99) / 1000, 3),
+            'max_ms': round(self.max_us / 1000, 3),
+        }
+
+
+class _Span:
+    """with 文の間の処理時間をヒストグラムに記録"""
+    
+    __slots__ = ('metrics', 'name', 'started')
+    
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+    
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe_us(self.name, (time.perf_counter_ns() - self.started) / 1000)
+        return False
+
+
+class _NullSpan:
+    """計測が無効なときの何もしない span"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """処理段階ごとの処理時間（ヒストグラム）と回数（カウンター）を集計するクラス"""
+    
+    # 無効なときは span() が共有の何もしないオブジェクトを返し、他の記録も enabled の確認だけで戻る。
+    
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._started_at = time.time()
+        self._log_thread = None
+        self._log_stop = threading.Event()
+    
+    def enable(self, enabled=True):
+        """計測の有効・無効を切り替え"""
+        self.enabled = enabled
+    
+    def span(self, name):
+        """with metrics.span("段階名"): で囲んだ処理の時間を記録"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+    
+    def observe_ms(self, name, ms):
+        """処理時間を記録（ミリ秒）"""
+        if self.enabled:
+            self.observe_us(name, ms * 1000)
+    
+    def observe_us(self, name, us):
+        """処理時間を記録（マイクロ秒）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.record(us)
+    
+    def increment(self, name, amount=1):
+        """カウンターを加算"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+    
+    def reset(self):
+        """集計を破棄"""
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+            self._started_at = time.time()
+    
+    def snapshot(self):
+        """現在の集計（辞書）"""
+        with self._lock:
+            return {
+                'since': datetime.fromtimestamp(self._started_at).isoformat(timespec='seconds'),
+                'counters': dict(sorted(self._counters.items())),
+                'histograms': {name: histogram.summary()
+                               for name, histogram in sorted(self._histograms.items())},
+            }
+    
+    def format_report(self):
+        """集計を表示用の文字列に整形"""
+        snapshot = self.snapshot()
+        lines = [f"計測: {'有効' if self.enabled else '無効'}（{snapshot['since']} から）", ""]
+        lines.append(f"{'段階':<28} {'件数':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'最大':>9}  (ms)")
+        for name, summary in snapshot['histograms'].items():
+            lines.append(f"{name:<28} {summary['count']:>7} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} "
+                         f"{summary['p99_ms']:>9.2f} {summary['max_ms']:>9.2f}")
+        lines.append("")
+        lines.append("カウンター")
+        for name, value in snapshot['counters'].items():
+            lines.append(f"  {name:<30} {value:>9}")
+        return "\n".join(lines)
+    
+    def start_log(self, path, interval=METRICS_LOG_INTERVAL):
+        """集計を定期的にファイルへ書き出す（1行1件のJSON、サイズで世代交代）"""
+        if self._log_thread is not None:
+            return
+        # logging は計測ログを使うときだけ読み込む（起動時間を短くする）
+        import logging
+        from logging.handlers import RotatingFileHandler
+        logger = logging.getLogger("kintouch.metrics")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            logger.addHandler(RotatingFileHandler(path, maxBytes=METRICS_LOG_MAX_BYTES,
+                                                  backupCount=METRICS_LOG_BACKUP_COUNT, encoding='utf-8'))
+        
+        def run():
+            while not self._log_stop.wait(interval):
+                if self.enabled:
+                    try:
+                        logger.info(json.dumps(self.snapshot(), ensure_ascii=False))
+                    except Exception as e:
+                        print(f"計測ログ書き込みエラー: {e}")
+        
+        self._log_stop.clear()
+        self._log_thread = threading.Thread(target=run, daemon=True)
+        self._log_thread.start()
+    
+    def stop_log(self):
+        """定期的な書き出しを終了"""
+        if self._log_thread is None:
+            return
+        self._log_stop.set()
+        self._log_thread.join(1.0)
+        self._log_thread = None
+
+
+# アプリケーション全体で共有する計測
+metrics = Metrics(enabled=METRICS_ENABLED)
\ No newline at end of file
@@ -3,18 +3,22 @@
 import csv
 import os
 import shutil
-import calendar
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from modules.constants import EXPORT_MAX_WORKERS
+from modules.export_job_runner import ExportCancelled, check_cancelled
 
 class MonthlyExporter:
     """月次集計管理クラス"""
     
-    def __init__(self, db_manager, csv_exporter):
+    def __init__(self, db_manager, csv_exporter, max_workers=EXPORT_MAX_WORKERS):
         self.db_manager = db_manager
         self.csv_exporter = csv_exporter
+        self.max_workers = max_workers
     
-    def export_monthly_summary_to_csv(self, month_str, table_name="time_records", include_daily=True):
-        """月次集計CSVエクスポート"""
+    def export_monthly_summary_to_csv(self, month_str, table_name="time_records", include_daily=True,
+                                      file_progress=None, progress=None, cancel_event=None):
+        """月次集計CSVエクスポート（progress: 進捗メッセージを受け取る関数、cancel_event: 中止要求）"""
         try:
             # 対象月の日付一覧を取得
             dates = self.db_manager.get_monthly_dates(month_str, table_name)
@@ -31,8 +35,11 @@ class MonthlyExporter:
             if include_daily:
                 result += f"--- 日次集計処理 ---\n"
                 
-                for date in dates:
-                    daily_result = self.csv_exporter.export_records_to_csv(date, table_name)
+                for index, date in enumerate(dates, 1):
+                    check_cancelled(cancel_event)
+                    if progress:
+                        progress(f"日次集計 {index}/{len(dates)}日: {date}")
+                    daily_result = self.csv_exporter.export_records_to_csv(date, table_name, cancel_event=cancel_event)
                     if "エクスポート完了" in daily_result:
                         daily_export_count += 1
                         result += f"✓ {date}: 日次集計完了\n"
@@ -44,19 +51,23 @@ class MonthlyExporter:
                 result += f"日次集計: スキップ\n\n"
             
             # ステップ2: 月次集計を実行
+            check_cancelled(cancel_event)
+            if progress:
+                progress("月次集計CSVを作成中")
             result += f"--- 月次集計処理 ---\n"
             
-            results = self.db_manager.get_monthly_summary_data(month_str, table_name)
-            
-            # 講師ごとに出勤日数をカウント
-            instructor_attendance = {}
-            for instructor_id, name, date in results:
-                if name not in instructor_attendance:
-                    instructor_attendance[name] = 0
-                instructor_attendance[name] += 1
+            # 1回の検索で全講師分の日ごとの最初・最後の打刻時刻を読み込む
+            # （まとめCSV・講師別CSV・集計結果はすべてここから作成する）
+            monthly_first_last = {}
+            for instructor_id, date_str, start_time, end_time in self.db_manager.iter_monthly_first_last(month_str, table_name):
+                instructor_key = str(instructor_id)
+                if instructor_key not in monthly_first_last:
+                    monthly_first_last[instructor_key] = {}
+                monthly_first_last[instructor_key][date_str] = (start_time, end_time)
             
             # テーブルタイプ
-            table_type_prefix = "授業" if table_name == "time_records" else "会議"
+            channel = self.csv_exporter.table_channel(table_name)
+            table_type_prefix = channel.short_label
             
             # monthlyフォルダの準備
             monthly_dir = "monthly"
@@ -78,9 +89,6 @@ class MonthlyExporter:
             all_instructors_sorted = sorted(all_instructors, key=lambda x: int(x['instructor_id']))
             
             # まとめCSVファイルに書き込み
-            year, month = map(int, month_str.split('-'))
-            _, last_day = calendar.monthrange(year, month)
-            
             with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(['講師ID', '講師名', '日付', '出社時刻', '退社時刻', '外出時刻', '復帰時刻', '備考'])
@@ -88,51 +96,18 @@ class MonthlyExporter:
                 # すべての講師について日次データを出力
                 for instructor in all_instructors_sorted:
                     instructor_id = instructor['instructor_id']
-                    instructor_name = instructor['name']
-                    
-                    # 打刻記録を取得
-                    records_daily = self.db_manager.get_instructor_monthly_records(month_str, instructor_id, table_name)
-                    
-                    # 日付ごとにデータを整理
-                    daily_data_per_instructor = {}
-                    for date_str, time_str in records_daily:
-                        if date_str not in daily_data_per_instructor:
-                            daily_data_per_instructor[date_str] = []
-                        daily_data_per_instructor[date_str].append(time_str)
-                    
-                    # 月の各日について出力
-                    for day in range(1, last_day + 1):
-                        date_obj = datetime(year, month, day)
-                        date_str = date_obj.strftime('%Y-%m-%d')
-                        
-                        if date_str in daily_data_per_instructor:
-                            times = sorted(daily_data_per_instructor[date_str])
-                            start_time = times[0]
-                            end_time = times[-1]
-                            
-                            writer.writerow([
-                                instructor_id,
-                                instructor_name,
-                                date_str,
-                                start_time,
-                                end_time,
-                                '', '', ''
-                            ])
-                        else:
-                            writer.writerow([
-                                instructor_id,
-                                instructor_name,
-                                date_str,
-                                '', '', '', '', ''
-                            ])
+                    writer.writerows(self.csv_exporter.build_instructor_daily_rows(
+                        month_str, instructor_id, instructor['name'],
+                        monthly_first_last.get(instructor_id, {})
+                    ))
             
             # 統計情報
             total_instructors_registered = len(all_instructors_sorted)
-            total_instructors_attended = len(instructor_attendance)
-            total_days = sum(instructor_attendance.values())
+            total_instructors_attended = len(monthly_first_last)
+            total_days = sum(len(first_last) for first_last in monthly_first_last.values())
             
             result += f"\n=== 月次集計エクスポート完了 ===\n\n"
-            result += f"種別: {table_type_prefix}用\n"
+            result += f"種別: {channel.label}\n"
             result += f"ファイル名: {csv_filename}\n"
             result += f"対象月: {month_str}\n\n"
             result += f"=== 集計結果 ===\n"
@@ -144,20 +119,31 @@ class MonthlyExporter:
             for instructor in all_instructors_sorted:
                 name = instructor['name']
                 instructor_id = instructor['instructor_id']
-                count = instructor_attendance.get(name, 0)
+                count = len(monthly_first_last.get(instructor_id, {}))
                 result += f"[{instructor_id}] {name}: {count}回\n"
             
             # ステップ3: 講師別日次集計を実行
             result += f"\n--- 講師別日次集計処理 ---\n"
             
+            def report_file(done_count, total, instructor, error):
+                if file_progress:
+                    file_progress(done_count, total, instructor, error)
+                if progress and (done_count % 10 == 0 or done_count == total):
+                    progress(f"講師別日次集計 {done_count}/{total}人")
+            
+            errors = self.write_instructor_files(
+                month_str, all_instructors_sorted, monthly_first_last, month_subdir, table_name,
+                report_file, cancel_event
+            )
+            
             instructor_daily_count = 0
             for instructor in all_instructors_sorted:
                 instructor_id = instructor['instructor_id']
                 instructor_name = instructor['name']
                 
-                if self.csv_exporter.export_instructor_daily_summary(
-                    month_str, instructor_id, instructor_name, month_subdir, table_name
-                ):
+                if instructor_id in errors:
+                    result += f"✗ [{instructor_id}] {instructor_name}: 日次集計失敗 ({errors[instructor_id]})\n"
+                else:
                     instructor_daily_count += 1
                     result += f"✓ [{instructor_id}] {instructor_name}: 日次集計完了\n"
             
@@ -171,32 +157,55 @@ class MonthlyExporter:
             
             return result
             
+        except ExportCancelled:
+            raise
         except Exception as e:
             return f"月次集計エクスポートエラー: {e}"
     
+    def write_instructor_files(self, month_str, instructors, monthly_first_last, output_dir,
+                               table_name="time_records", file_progress=None, cancel_event=None):
+        """講師別日次集計CSVをスレッドプールで並列に書き込み（戻り値: 講師ID→エラーの辞書）"""
+        # データはメモリ上にあるので、書き込みとoldフォルダへの移動（NAS上では遅い）だけを並列にする
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = {}
+            for instructor in instructors:
+                instructor_id = instructor['instructor_id']
+                future = executor.submit(
+                    self.csv_exporter.write_instructor_daily_summary,
+                    month_str, instructor_id, instructor['name'], output_dir, table_name,
+                    monthly_first_last.get(instructor_id, {})
+                )
+                futures[future] = instructor
+            
+            for done_count, future in enumerate(as_completed(futures), 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    # 未着手のファイルは書き込まない（書き込み中のものは終わるまで待つ）
+                    for pending in futures:
+                        pending.cancel()
+                    raise ExportCancelled()
+                
+                instructor = futures[future]
+                error = future.exception()
+                if error is not None:
+                    print(f"講師別日次集計エラー ({instructor['name']}): {error}")
+                    errors[instructor['instructor_id']] = error
+                
+                if file_progress:
+                    file_progress(done_count, len(futures), instructor, error)
+                    
+        return errors
+    
     def export_combined_monthly_summary(self, month_str):
-        """授業と会議を統合した月次集計CSVエクスポート"""
+        """登録されているすべての記録先テーブル（授業・会議など）を統合した月次集計CSVエクスポート"""
         try:
-            # 授業記録・会議記録を取得
-            class_results = self.db_manager.get_monthly_summary_data(month_str, "time_records")
-            meeting_results = self.db_manager.get_monthly_summary_data(month_str, "meeting_records")
+            channels = self.csv_exporter.table_channels()
             
-            # 講師ごとに集計
+            # 講師ごと・テーブルごとに打刻のあった日付を集計
             instructor_summary = {}
-            
-            # 授業回数を集計
-            for instructor_id, name, date in class_results:
-                key = str(instructor_id)
-                if key not in instructor_summary:
-                    instructor_summary[key] = {'class_dates': set(), 'meeting_dates': set()}
-                instructor_summary[key]['class_dates'].add(date)
-            
-            # 会議回数を集計
-            for instructor_id, name, date in meeting_results:
-                key = str(instructor_id)
-                if key not in instructor_summary:
-                    instructor_summary[key] = {'class_dates': set(), 'meeting_dates': set()}
-                instructor_summary[key]['meeting_dates'].add(date)
+            for channel in channels:
+                for instructor_id, name, date in self.db_manager.get_monthly_summary_data(month_str, channel.table):
+                    instructor_summary.setdefault(str(instructor_id), {}).setdefault(channel.table, set()).add(date)
             
             # すべての講師を取得してID順にソート
             all_instructors = self.db_manager.load_instructors_full()
@@ -217,39 +226,48 @@ class MonthlyExporter:
             # 既存ファイルがある場合はoldフォルダに移動
             self._move_to_old(csv_filename, old_dir, f"【まとめ】出退勤記録_{month_str}")
             
-            # CSVファイルに書き込み
+            # CSVファイルに書き込み（授業は回数の後に時間数を出力する）
+            header = ['【まとめ】講師ID', '【まとめ】講師名']
+            for channel in channels:
+                header.append(f"{channel.short_label}回数")
+                if channel.table == "time_records":
+                    header.append('時間数（3.25h）')
+            header.append('出勤回数')
+            
             with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
                 writer = csv.writer(csvfile)
-                writer.writerow(['【まとめ】講師ID', '【まとめ】講師名', '授業回数', '時間数（3.25h）', '会議回数', '出勤回数'])
+                writer.writerow(header)
                 
                 for instructor in all_instructors_sorted:
                     instructor_id = instructor['instructor_id']
-                    name = instructor['name']
-                    
-                    summary = instructor_summary.get(instructor_id, {'class_dates': set(), 'meeting_dates': set()})
-                    class_dates = summary['class_dates']
-                    meeting_dates = summary['meeting_dates']
+                    summary = instructor_summary.get(instructor_id, {})
                     
-                    class_count = len(class_dates)
-                    meeting_count = len(meeting_dates)
-                    total_attendance = len(class_dates | meeting_dates)
-                    hours = class_count * 3.25
+                    row = [instructor_id, instructor['name']]
+                    attended_dates = set()
+                    for channel in channels:
+                        dates = summary.get(channel.table, set())
+                        attended_dates |= dates
+                        row.append(len(dates))
+                        if channel.table == "time_records":
+                            row.append(len(dates) * 3.25)
+                    row.append(len(attended_dates))
                     
-                    writer.writerow([instructor_id, name, class_count, hours, meeting_count, total_attendance])
+                    writer.writerow(row)
             
             # 統計情報
             total_instructors_registered = len(all_instructors_sorted)
-            total_class_days = sum(len(summary.get('class_dates', set())) for summary in instructor_summary.values())
-            total_meeting_days = sum(len(summary.get('meeting_dates', set())) for summary in instructor_summary.values())
             
             result = f"=== 統合月次集計エクスポート完了 ===\n\n"
             result += f"ファイル名: {csv_filename}\n"
             result += f"対象月: {month_str}\n\n"
             result += f"=== 集計結果 ===\n"
             result += f"登録講師数: {total_instructors_registered}人\n"
-            result += f"総授業日数: {total_class_days}日\n"
-            result += f"総会議日数: {total_meeting_days}日\n"
-            result += f"総出勤日数: {total_class_days + total_meeting_days}日\n"
+            total_days = 0
+            for channel in channels:
+                days = sum(len(summary.get(channel.table, set())) for summary in instructor_summary.values())
+                total_days += days
+                result += f"総{channel.short_label}日数: {days}日\n"
+            result += f"総出勤日数: {total_days}日\n"
             
             return result
             
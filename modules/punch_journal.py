@@ -0,0 +1,218 @@
+# 出退勤管理システム - 打刻ジャーナル・非同期書き込みモジュール
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from modules.metrics import metrics
+
+class PunchJournal:
+    """打刻ジャーナル（DBに書き込む前の打刻を1行1件で保存するファイル）"""
+    
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+    
+    def append(self, entry):
+        """1件追記してディスクに書き出す（fsync）"""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def read_entries(self):
+        """保存されている打刻を読み込み（書き込み途中の壊れた行は無視）"""
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    print(f"ジャーナル読み込みエラー: {line}")
+        return entries
+    
+    def truncate(self):
+        """すべてDBに反映済みになったら空にする"""
+        self.close()
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class PunchWriter:
+    """打刻をジャーナルに保存してすぐに応答し、専用スレッドでDBにまとめて書き込むクラス"""
+    
+    def __init__(self, db_manager, journal_path, batch_size=50, retry_interval=0.5):
+        self.db_manager = db_manager
+        self.journal = PunchJournal(journal_path)
+        # DBに書き込めない打刻の退避先（自動では消さない）
+        self.dead_letters = PunchJournal(journal_path + ".dead")
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._pending = {}
+        self._next_seq = 1
+        self._last_submitted = 0
+        self._last_committed = 0
+        self._thread = None
+    
+    def start(self):
+        """未反映の打刻を再投入してから書き込みスレッドを開始"""
+        last_seq = self.db_manager.get_journal_last_seq()
+        pending = [e for e in self.journal.read_entries() if e['seq'] > last_seq]
+        
+        with self._lock:
+            self._last_committed = last_seq
+            if pending:
+                # ジャーナルに残したまま書き込みスレッドで反映する
+                print(f"未反映の打刻を再投入します: {len(pending)}件")
+                for entry in pending:
+                    self._pending[entry['seq']] = entry
+                    self._queue.put(entry)
+                last_seq = max(e['seq'] for e in pending)
+            else:
+                self.journal.truncate()
+            
+            self._next_seq = last_seq + 1
+            self._last_submitted = last_seq
+        
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def submit(self, card_uid, name, instructor_id, record_type, timestamp, table_name):
+        """打刻をジャーナルに保存して書き込み待ちにする（保存できれば True）"""
+        with self._lock:
+            entry = {
+                'seq': self._next_seq,
+                'table': table_name,
+                'card_uid': card_uid,
+                'name': name,
+                'instructor_id': instructor_id,
+                'record_type': record_type,
+                'timestamp': timestamp
+            }
+            try:
+                with metrics.span("punch.journal_append"):
+                    self.journal.append(entry)
+            except Exception as e:
+                print(f"ジャーナル書き込みエラー: {e}")
+                return False
+            
+            self._next_seq += 1
+            self._last_submitted = entry['seq']
+            self._pending[entry['seq']] = entry
+            # 連番順に書き込まれるようにロック内でキューに入れる
+            self._queue.put(entry)
+            
+        return True
+    
+    def pending_entries(self):
+        """DBにまだ書き込まれていない打刻"""
+        with self._lock:
+            return list(self._pending.values())
+    
+    def _run(self):
+        """書き込みスレッド"""
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            
+            batch = [entry]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stop = True
+                    break
+                batch.append(entry)
+            
+            self._write_batch(batch)
+            if stop:
+                return
+    
+    def _write_batch(self, batch):
+        """まとめてDBに書き込み（書き込めない打刻は1件ずつ確かめて退避）"""
+        if not self._write_with_retry(batch):
+            for entry in batch:
+                if not self._write_with_retry([entry]):
+                    self._dead_letter(entry)
+        
+        with self._lock:
+            for entry in batch:
+                self._pending.pop(entry['seq'], None)
+            self._last_committed = max(self._last_committed, batch[-1]['seq'])
+            
+            # すべて反映済みならジャーナルを空にする
+            if self._last_committed >= self._last_submitted:
+                try:
+                    self.journal.truncate()
+                except Exception as e:
+                    print(f"ジャーナル整理エラー: {e}")
+            self._committed.notify_all()
+    
+    def _write_with_retry(self, batch):
+        """DBに書き込み（ロック待ちなど一時的なエラーだけ再試行、書き込めなければ False）"""
+        interval = self.retry_interval
+        while True:
+            try:
+                self.db_manager.record_attendance_batch(batch)
+                return True
+            except sqlite3.OperationalError as e:
+                message = str(e).lower()
+                if "locked" not in message and "busy" not in message:
+                    print(f"打刻一括記録エラー: {e}")
+                    return False
+                print(f"打刻一括記録エラー（再試行します）: {e}")
+                metrics.increment("db.write_batch_retry")
+                time.sleep(interval)
+                interval = min(interval * 2, 5.0)
+            except Exception as e:
+                print(f"打刻一括記録エラー: {e}")
+                return False
+    
+    def _dead_letter(self, entry):
+        """書き込めない打刻を退避ファイルに移し、反映済みの連番を進める"""
+        print(f"DBに記録できない打刻を退避します: {entry}")
+        metrics.increment("punch.dead_letter")
+        try:
+            self.dead_letters.append(entry)
+            self.db_manager.advance_journal_last_seq(entry['seq'])
+        except Exception as e:
+            print(f"打刻退避エラー: {e}")
+    
+    def flush(self, timeout=None):
+        """書き込み待ちの打刻がすべてDBに反映されるまで待機"""
+        with self._lock:
+            target = self._last_submitted
+            return self._committed.wait_for(lambda: self._last_committed >= target, timeout)
+    
+    def stop(self, timeout=5.0):
+        """書き込み待ちを反映してからスレッドを終了"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        with self._lock:
+            self.journal.close()
+            self.dead_letters.close()
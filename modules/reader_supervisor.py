@@ -0,0 +1,239 @@
+# 出退勤管理システム - カードリーダーの抜き差し監視モジュール
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from modules.constants import (
+    JST, READER_RESCAN_INTERVAL, READER_RETRY_INITIAL, READER_RETRY_MAX, READER_ERROR_WINDOW
+)
+from modules.metrics import metrics
+
+class ReaderHealth:
+    """チャンネル1つのリーダーの状態（診断情報画面に表示する）"""
+    
+    def __init__(self, reader_name, connected):
+        self.reader_name = reader_name
+        self.connected = connected
+        self.last_event = None
+        self.last_event_at = None
+        self.reconnects = 0
+        self.consecutive_errors = 0
+        self.last_error = None
+        self._error_times = deque()
+    
+    def record_event(self, event):
+        self.last_event = event
+        self.last_event_at = datetime.now(JST)
+    
+    def record_error(self, error):
+        self.consecutive_errors += 1
+        self.last_error = f"{error}"
+        self._error_times.append(time.monotonic())
+        self.record_event("error")
+    
+    def error_rate(self):
+        """直近 READER_ERROR_WINDOW 秒のエラー数（1分あたり）"""
+        limit = time.monotonic() - READER_ERROR_WINDOW
+        while self._error_times and self._error_times[0] < limit:
+            self._error_times.popleft()
+        return len(self._error_times) * 60 / READER_ERROR_WINDOW
+    
+    def snapshot(self):
+        return {
+            'reader': self.reader_name,
+            'connected': self.connected,
+            'last_event': self.last_event,
+            'last_event_at': self.last_event_at.strftime("%Y-%m-%d %H:%M:%S") if self.last_event_at else None,
+            'error_rate': round(self.error_rate(), 2),
+            'consecutive_errors': self.consecutive_errors,
+            'last_error': self.last_error,
+            'reconnects': self.reconnects,
+        }
+
+
+class ReaderSupervisor:
+    """リーダーの追加・取り外しを監視し、設定の名前でチャンネルに割り当て直すクラス"""
+    
+    # リーダーの一覧はPnP通知（対応していない環境では READER_RESCAN_INTERVAL 秒ごと）で確認し、
+    # 取り外されたリーダーは割り当てを外し、同じ名前のリーダーが接続されたら割り当て直す。
+    # カード監視側はエラーを report_error で報告し、戻り値の秒数だけ待ってから監視をやり直す
+    # （エラーが続くたびに待ち時間を倍にし、正常に待機できたら report_ok で元に戻す）。
+    # 取り外し・エラーは bus に reader_status イベントで通知する。
+    #   reader_status: {'type', 'channel', 'status'}  status は 'unavailable' / 'reconnecting'
+    
+    def __init__(self, card_reader_manager, bindings=None, bus=None, rescan_interval=READER_RESCAN_INTERVAL):
+        self.card_reader_manager = card_reader_manager
+        # bindings を渡さなければ、開始するたびに CardReaderManager のチャンネル設定から作り直す
+        self._fixed_bindings = bindings
+        self.bus = bus
+        self.rescan_interval = rescan_interval
+        self._condition = threading.Condition()
+        self.bindings = {}
+        self._health = {}
+        self._update_bindings()
+        self._list_backend = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+    
+    def _update_bindings(self):
+        """チャンネルとリーダー名の対応を更新（名前が変わらないチャンネルは状態を引き継ぐ）"""
+        bindings = self._fixed_bindings
+        if bindings is None:
+            bindings = self.card_reader_manager.reader_bindings()
+        with self._condition:
+            self.bindings = {channel: name for channel, name in bindings.items() if name}
+            health = {}
+            for channel, name in self.bindings.items():
+                current = self._health.get(channel)
+                if current is None or current.reader_name != name:
+                    current = ReaderHealth(name, self.card_reader_manager.get_reader(channel) is not None)
+                health[channel] = current
+            self._health = health
+    
+    def start(self):
+        """リーダーの一覧の監視を開始（チャンネル設定の変更はここで反映する）"""
+        if self._thread is not None:
+            return
+        self._update_bindings()
+        self._stopped.clear()
+        try:
+            self._list_backend = self.card_reader_manager.reader_backend.create_reader_list_backend()
+        except Exception as e:
+            # 通知を使えない場合は一定間隔で確認する
+            print(f"リーダー一覧の監視エラー（{self.rescan_interval}秒ごとに確認します）: {e}")
+            self._list_backend = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=2.0):
+        """監視を停止"""
+        self._stopped.set()
+        self._wake()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        list_backend, self._list_backend = self._list_backend, None
+        if list_backend is not None:
+            try:
+                list_backend.close()
+            except Exception:
+                pass
+    
+    def _wake(self):
+        """一覧の変化の待機を中断して確認し直す"""
+        self._wakeup.set()
+        list_backend = self._list_backend
+        if list_backend is not None:
+            try:
+                list_backend.cancel()
+            except Exception:
+                pass
+    
+    def _run(self):
+        """監視スレッド"""
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            self.rescan()
+            if self._list_backend is None:
+                self._wakeup.wait(self.rescan_interval)
+                continue
+            try:
+                self._list_backend.wait_for_change(int(self.rescan_interval * 1000))
+            except Exception as e:
+                # 通知を使えなくなったら一定間隔で確認する
+                metrics.increment("reader.list_error")
+                print(f"リーダー一覧の監視エラー（{self.rescan_interval}秒ごとに確認します）: {e}")
+                list_backend, self._list_backend = self._list_backend, None
+                try:
+                    list_backend.close()
+                except Exception:
+                    pass
+    
+    def rescan(self):
+        """リーダーの一覧を取得してチャンネルの割り当てを更新"""
+        try:
+            reader_list = self.card_reader_manager.reader_backend.list_readers()
+        except Exception as e:
+            # 一覧を取得できないときは割り当てを変えない
+            metrics.increment("reader.list_error")
+            print(f"リーダー取得エラー: {e}")
+            return
+        
+        found = {reader.name: reader for reader in reader_list}
+        removed = []
+        with self._condition:
+            for channel, name in self.bindings.items():
+                health = self._health[channel]
+                current = self.card_reader_manager.get_reader(channel)
+                reader = found.get(name)
+                if current is not None and reader is None:
+                    self.card_reader_manager.set_reader(channel, None)
+                    health.connected = False
+                    health.consecutive_errors = 0
+                    health.record_event("reader_removed")
+                    metrics.increment("reader.removed")
+                    removed.append(channel)
+                    print(f"リーダー取り外し ({channel}): {name}")
+                elif current is None and reader is not None:
+                    self.card_reader_manager.set_reader(channel, reader)
+                    health.connected = True
+                    health.reconnects += 1
+                    health.record_event("reader_attached")
+                    metrics.increment("reader.reconnected")
+                    print(f"リーダー接続 ({channel}): {name}")
+            self._condition.notify_all()
+        
+        for channel in removed:
+            self._publish(channel, 'unavailable')
+    
+    def wait_reader(self, channel, timeout=None):
+        """チャンネルにリーダーが割り当てられるまで待機（停止・タイムアウト時は None）"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._stopped.is_set() or self.card_reader_manager.get_reader(channel) is not None,
+                timeout
+            )
+            if self._stopped.is_set():
+                return None
+            return self.card_reader_manager.get_reader(channel)
+    
+    def report_ok(self, channel, event=None):
+        """カード監視の待機が正常に終わった（event はカードの抜き差し、なければ None）"""
+        with self._condition:
+            health = self._health.get(channel)
+            if health is None:
+                return
+            if health.consecutive_errors:
+                # エラーの後に監視を再開できた
+                health.consecutive_errors = 0
+                health.reconnects += 1
+                metrics.increment("reader.reconnected")
+            if event is not None:
+                health.record_event(event)
+    
+    def report_error(self, channel, error):
+        """カード監視のエラーを記録し、監視をやり直すまでの待ち時間（秒）を返す"""
+        with self._condition:
+            health = self._health.get(channel)
+            if health is None:
+                return READER_RETRY_INITIAL
+            health.record_error(error)
+            delay = min(READER_RETRY_MAX, READER_RETRY_INITIAL * 2 ** (health.consecutive_errors - 1))
+        metrics.increment("reader.error")
+        self._publish(channel, 'reconnecting')
+        # 取り外されていないか確認する
+        self._wake()
+        return delay
+    
+    def health(self):
+        """チャンネルごとのリーダーの状態"""
+        with self._condition:
+            return {channel: health.snapshot() for channel, health in self._health.items()}
+    
+    def _publish(self, channel, status):
+        if self.bus is not None:
+            self.bus.publish({'type': 'reader_status', 'channel': channel, 'status': status})
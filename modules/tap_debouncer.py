@@ -0,0 +1,55 @@
+# 出退勤管理システム - 二度かざし抑止モジュール
+
+import threading
+import time
+from collections import OrderedDict
+from modules.constants import DUPLICATE_TAP_WINDOW
+
+class TapDebouncer:
+    """直近の打刻（UID・チャンネル別）をメモリに保持し、一定時間内の同じ打刻を抑止するクラス"""
+    
+    # 打刻を記録した時刻から window 秒の間、同じカード・同じチャンネルの打刻を無視する（DBは検索しない）。
+    # 全リーダーで共有する。無視した打刻では期限を延ばさない（かざし続けても window 秒後には打刻できる）。
+    # 期限は記録順に並ぶため、古いものから順に捨てる。
+    
+    def __init__(self, window=DUPLICATE_TAP_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        # (UID, チャンネル) → (期限, 打刻の情報)
+        self._entries = OrderedDict()
+    
+    def _expire(self, now):
+        """期限切れの打刻を捨てる（ロック取得済みで呼び出す）"""
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+    
+    def check(self, uid, channel):
+        """抑止する打刻なら直前の打刻の情報、そうでなければ None を返す"""
+        if self.window <= 0:
+            return None
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get((uid, channel))
+        return entry[1] if entry else None
+    
+    def record(self, uid, channel, info=None):
+        """打刻を記録（info は抑止したときに返す直前の打刻の情報）"""
+        if self.window <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            key = (uid, channel)
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.window, info if info is not None else {})
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
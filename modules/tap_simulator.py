@@ -0,0 +1,89 @@
+# 出退勤管理システム - 打刻シミュレーターモジュール（負荷試験用）
+
+import random
+import threading
+import time
+
+class TapStreamBuilder:
+    """シミュレーター用の打刻の一覧を作成するクラス"""
+    
+    # 打刻は辞書 {'at': 開始からの秒数, 'reader': リーダー名, 'uid': カードUID, 'hold_ms': かざしている時間}
+    
+    def __init__(self, seed=None, hold_ms=150):
+        self.rng = random.Random(seed)
+        self.hold_ms = hold_ms
+        self.taps = []
+    
+    def _add(self, at, reader_name, uid):
+        tap = {'at': at, 'reader': reader_name, 'uid': uid, 'hold_ms': self.hold_ms}
+        self.taps.append(tap)
+        return tap
+    
+    def rush(self, uids, reader_name, duration_s, start_s=0.0, peak=0.7):
+        """朝の出勤ラッシュ（全員が duration_s 秒の間に1回ずつ、peak の位置に集中して打刻）"""
+        for uid in uids:
+            at = start_s + self.rng.triangular(0, duration_s, duration_s * peak)
+            self._add(at, reader_name, uid)
+        return self
+    
+    def double_taps(self, rate, gap_ms=300):
+        """rate の割合の打刻について、離してすぐに同じカードをもう一度かざす"""
+        for tap in list(self.taps):
+            if self.rng.random() < rate:
+                self._add(tap['at'] + (tap['hold_ms'] + gap_ms) / 1000, tap['reader'], tap['uid'])
+        return self
+    
+    def simultaneous(self, uids, reader_names, duration_s, start_s=0.0):
+        """複数のリーダーに同時にかざす（uids を順に各リーダーへ割り当て）"""
+        uids = list(uids)
+        for index in range(0, len(uids) - len(reader_names) + 1, len(reader_names)):
+            at = start_s + self.rng.uniform(0, duration_s)
+            for reader_name, uid in zip(reader_names, uids[index:index + len(reader_names)]):
+                self._add(at, reader_name, uid)
+        return self
+    
+    def build(self):
+        """開始からの時刻順に並べた打刻の一覧"""
+        return sorted(self.taps, key=lambda tap: tap['at'])
+
+
+class TapPlayer:
+    """打刻の一覧に従って SimulatedCardBackend のカードを抜き差しするクラス"""
+    
+    # リーダーごとに1スレッドで順番にかざす。前の人がかざしている間は待つため、
+    # 予定より遅れることがある（実際にかざした時刻を記録する）。
+    
+    def __init__(self, cards, speed=1.0, gap_ms=20):
+        self.cards = cards
+        self.speed = speed
+        self.gap_ms = gap_ms
+    
+    def play(self, taps, on_tap=None):
+        """すべての打刻を実行（on_tap(tap, かざした時刻) は time.perf_counter 基準）"""
+        by_reader = {}
+        for tap in taps:
+            by_reader.setdefault(tap['reader'], []).append(tap)
+        
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._play_reader, args=(reader_taps, started, on_tap), daemon=True)
+            for reader_taps in by_reader.values()
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+    
+    def _play_reader(self, taps, started, on_tap):
+        for tap in taps:
+            delay = started + tap['at'] / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            
+            self.cards.insert(tap['reader'], tap['uid'])
+            if on_tap:
+                on_tap(tap, time.perf_counter())
+            time.sleep(tap['hold_ms'] / 1000)
+            self.cards.remove(tap['reader'])
+            time.sleep(self.gap_ms / 1000)
\ No newline at end of file
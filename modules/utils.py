@@ -2,7 +2,10 @@
 
 import os
 import json
-import winsound
+import threading
+import time
+from modules.channel_registry import ChannelRegistry
+from modules.metrics import metrics
 
 class ConfigManager:
     """設定管理クラス"""
@@ -11,7 +14,7 @@ class ConfigManager:
         self.config_path = config_path
     
     def load_config(self):
-        """設定ファイルの読み込み"""
+        """設定ファイルの読み込み（channels はチャンネルの対応 ChannelRegistry）"""
         try:
             if os.path.exists(self.config_path):
                 with open(self.config_path, 'r', encoding='utf-8') as f:
@@ -20,6 +23,7 @@ class ConfigManager:
                         return {
                             'class_reader': config.get('class_reader', ''),
                             'meeting_reader': config.get('meeting_reader', ''),
+                            'channels': ChannelRegistry.from_config(config),
                             'configured': True
                         }
             return None
@@ -27,14 +31,19 @@ class ConfigManager:
             print(f"設定読み込みエラー: {e}")
             return None
     
-    def save_config(self, class_reader_name, meeting_reader_name):
-        """設定ファイルの保存"""
+    def save_config(self, class_reader_name, meeting_reader_name, channels=None):
+        """設定ファイルの保存（channels を指定すると授業用・会議用以外のチャンネルも保存する）"""
         try:
             config = {
                 'class_reader': class_reader_name,
                 'meeting_reader': meeting_reader_name,
                 'configured': True
             }
+            if channels is not None:
+                for key, reader_name in (('class', class_reader_name), ('meeting', meeting_reader_name)):
+                    if key in channels:
+                        channels.get(key).reader_name = reader_name
+                config['channels'] = channels.to_config()
             with open(self.config_path, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=2, ensure_ascii=False)
             return True
@@ -43,11 +52,68 @@ class ConfigManager:
             return False
 
 
+# ビープ音のパターン（周波数Hz, 長さms, 次の音までの間隔ms）
+BEEP_PATTERNS = {
+    "success": [(1000, 200, 100), (1000, 200, 0)],
+    "error": [(400, 500, 0)],
+    "card_detected": [(800, 150, 0)],
+    "duplicate": [(600, 100, 80), (600, 100, 0)],
+}
+
+
+class WinsoundBackend:
+    """winsoundでビープ音を鳴らすバックエンド（Windows用）"""
+    
+    def __init__(self, winsound):
+        self.winsound = winsound
+    
+    def beep(self, frequency, duration_ms):
+        self.winsound.Beep(frequency, duration_ms)
+
+
+def default_sound_backend():
+    """Windows なら winsound、それ以外（動作確認・ベンチマーク用）は音を鳴らさないバックエンド"""
+    try:
+        import winsound
+    except ImportError:
+        return NullBackend()
+    return WinsoundBackend(winsound)
+
+
+class NullBackend:
+    """音を鳴らさないバックエンド"""
+    
+    def beep(self, frequency, duration_ms):
+        pass
+
+
+class RecordingBackend:
+    """鳴らした音を記録するバックエンド（動作確認用）"""
+    
+    def __init__(self):
+        self.beeps = []
+    
+    def beep(self, frequency, duration_ms):
+        self.beeps.append((frequency, duration_ms))
+
+
 class SoundManager:
     """音声管理クラス"""
     
-    def __init__(self):
+    # 再生は専用スレッドで行い、呼び出し元（カード監視スレッドなど）を待たせない。
+    # 再生待ちは1つだけ保持し、連続で打刻された場合は最新の音に置き換える。
+    
+    def __init__(self, backend=None):
         self.sound_enabled = True
+        # 指定がなければ再生スレッドで選ぶ（起動時に winsound を読み込まない）
+        self.backend = backend
+        self._condition = threading.Condition()
+        self._pending = None
+        self._pending_at = None
+        self._playing = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
     
     def toggle_sound(self):
         """音声ON/OFF切り替え"""
@@ -55,19 +121,53 @@ class SoundManager:
         return self.sound_enabled
     
     def play_beep(self, beep_type="success"):
-        """ビープ音再生"""
+        """ビープ音再生（再生を待たずに戻る）"""
         if not self.sound_enabled:
             return
         
-        try:
-            if beep_type == "success":
-                winsound.Beep(1000, 200)
-                import time
-                time.sleep(0.1)
-                winsound.Beep(1000, 200)
-            elif beep_type == "error":
-                winsound.Beep(400, 500)
-            elif beep_type == "card_detected":
-                winsound.Beep(800, 150)
-        except Exception as e:
-            print(f"音声再生エラー: {e}")
\ No newline at end of file
+        with self._condition:
+            if self._pending is not None:
+                metrics.increment("sound.coalesced")
+            self._pending = beep_type
+            self._pending_at = time.perf_counter()
+            self._condition.notify_all()
+    
+    def _run(self):
+        """再生スレッド"""
+        if self.backend is None:
+            self.backend = default_sound_backend()
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._stopped)
+                if self._stopped:
+                    return
+                beep_type = self._pending
+                self._pending = None
+                self._playing = True
+                # 再生を要求されてから鳴り始めるまでの時間
+                metrics.observe_ms("sound.queue_wait", (time.perf_counter() - self._pending_at) * 1000)
+            
+            try:
+                with metrics.span("sound.beep"):
+                    for frequency, duration_ms, gap_ms in BEEP_PATTERNS.get(beep_type, []):
+                        self.backend.beep(frequency, duration_ms)
+                        if gap_ms:
+                            time.sleep(gap_ms / 1000)
+            except Exception as e:
+                print(f"音声再生エラー: {e}")
+            finally:
+                with self._condition:
+                    self._playing = False
+                    self._condition.notify_all()
+    
+    def wait_idle(self, timeout=None):
+        """再生待ち・再生中の音がなくなるまで待機"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._pending is None and not self._playing, timeout)
+    
+    def stop(self):
+        """再生スレッドを終了"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
\ No newline at end of file
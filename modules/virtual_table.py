@@ -0,0 +1,232 @@
+# 出退勤管理システム - 仮想スクロール表モジュール
+
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+
+class VirtualTable:
+    """表示している範囲だけをDBから読み込んで表示する表（ttk.Treeview）"""
+    
+    # Treeview には画面に収まる行数分の項目だけを作り、スクロール時は値だけを入れ替える。
+    # データはキーセット方式（前のページの最後のキーより後ろを limit 件）でページ単位に読み込み、
+    # 読み込んだページは max_cached_pages ページまで保持する。
+    
+    def __init__(self, parent, columns, widths=None, height=15, page_size=100, max_cached_pages=20):
+        self.frame = tk.Frame(parent)
+        self.page_size = page_size
+        self.max_cached_pages = max_cached_pages
+        
+        self.scrollbar = tk.Scrollbar(self.frame, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.tree = ttk.Treeview(self.frame, columns=columns, show='headings', height=height)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            if widths and col in widths:
+                self.tree.column(col, width=widths[col])
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        
+        self.total = 0
+        self._offset = 0
+        self._items = []
+        self._detached = set()
+        self._pages = OrderedDict()
+        self._page_last_keys = []
+        self._selected = {}
+        self._visible_rows = []
+        
+        self._count_func = None
+        self._page_func = None
+        self._key_func = lambda row: row[0]
+        self._format_func = lambda row: row
+        
+        self._set_item_count(height)
+        
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<ButtonPress-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self._scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self._scroll_by(3))
+        self.tree.bind("<Prior>", lambda event: self._scroll_by(-len(self._items)))
+        self.tree.bind("<Next>", lambda event: self._scroll_by(len(self._items)))
+        self.tree.bind("<Up>", lambda event: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda event: self._on_arrow(1))
+    
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+    
+    def set_source(self, count_func, page_func, key_func=None, format_func=None, total=None, first_page=None):
+        """データの取得方法を設定して先頭から表示
+        
+        count_func(): 全体の行数
+        page_func(after, limit): after（前のページの最後のキー、先頭は None）より後ろの行を limit 件
+        key_func(row): 行の並び順を表す一意なキー
+        format_func(row): 行を表示する値のタプルに変換
+        total, first_page: 別スレッドで読み込み済みの行数と先頭ページ（page_func(None, page_size) の結果）
+        """
+        self._count_func = count_func
+        self._page_func = page_func
+        if key_func:
+            self._key_func = key_func
+        if format_func:
+            self._format_func = format_func
+        self._offset = 0
+        self.refresh(total, first_page)
+    
+    def refresh(self, total=None, first_page=None):
+        """データを読み込み直す（表示位置は保持し、選択は解除）"""
+        self._pages.clear()
+        self._page_last_keys = []
+        self._selected = {}
+        if first_page is not None:
+            self._pages[0] = first_page
+            if first_page:
+                self._page_last_keys.append(self._key_func(first_page[-1]))
+        if total is not None:
+            self.total = total
+        else:
+            self.total = self._count_func() if self._count_func else 0
+        self._offset = max(0, min(self._offset, self.total - len(self._items)))
+        self._render()
+    
+    def selected_rows(self):
+        """選択されている行（スクロールで見えなくなった行も含む）"""
+        return list(self._selected.values())
+    
+    def _fetch_page(self, page):
+        """1ページ読み込み（前のページまでのキーは読み込み済みで呼び出す）"""
+        if page in self._pages:
+            self._pages.move_to_end(page)
+            return self._pages[page]
+        
+        after = self._page_last_keys[page - 1] if page > 0 else None
+        rows = self._page_func(after, self.page_size)
+        self._pages[page] = rows
+        if rows and len(self._page_last_keys) == page:
+            self._page_last_keys.append(self._key_func(rows[-1]))
+        
+        while len(self._pages) > self.max_cached_pages:
+            self._pages.popitem(last=False)
+        return rows
+    
+    def _load_page(self, page):
+        """ページを取得（前のページの最後のキーがまだなければ先頭から順に読み込む）"""
+        while len(self._page_last_keys) < page:
+            rows = self._fetch_page(len(self._page_last_keys))
+            if len(rows) < self.page_size:
+                return []
+        return self._fetch_page(page)
+    
+    def _get_row(self, index):
+        rows = self._load_page(index // self.page_size)
+        position = index % self.page_size
+        return rows[position] if position < len(rows) else None
+    
+    def _render(self):
+        """表示範囲の行の値を入れ替え"""
+        if self._page_func is None:
+            return
+        
+        self._visible_rows = []
+        for index in range(len(self._items)):
+            row_index = self._offset + index
+            self._visible_rows.append(self._get_row(row_index) if row_index < self.total else None)
+        
+        selection = []
+        for index, (item, row) in enumerate(zip(self._items, self._visible_rows)):
+            if row is None:
+                if item not in self._detached:
+                    self.tree.detach(item)
+                    self._detached.add(item)
+                continue
+            
+            if item in self._detached:
+                self.tree.move(item, '', index)
+                self._detached.discard(item)
+            self.tree.item(item, values=self._format_func(row))
+            if self._key_func(row) in self._selected:
+                selection.append(item)
+        
+        self.tree.selection_set(selection)
+        self._update_scrollbar()
+    
+    def _update_scrollbar(self):
+        if self.total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        first = self._offset / self.total
+        last = min(1.0, (self._offset + len(self._items)) / self.total)
+        self.scrollbar.set(first, last)
+    
+    def _scroll_to(self, offset):
+        offset = max(0, min(offset, self.total - len(self._items)))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+        return "break"
+    
+    def _scroll_by(self, rows):
+        return self._scroll_to(self._offset + rows)
+    
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self._scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= len(self._items)
+            self._scroll_by(amount)
+    
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+    
+    def _on_arrow(self, direction):
+        """上下キー（表示範囲の端にいればスクロール）"""
+        focus = self.tree.focus()
+        visible = [item for item in self._items if item not in self._detached]
+        if not visible or focus not in visible:
+            return None
+        position = visible.index(focus)
+        if (direction < 0 and position == 0) or (direction > 0 and position == len(visible) - 1):
+            self._scroll_by(direction)
+            return "break"
+        return None
+    
+    def _on_click(self, event):
+        """Ctrl・Shiftなしのクリックは選択し直し（見えていない行の選択も解除）"""
+        if not event.state & 0x0005:
+            self._selected = {}
+    
+    def _on_select(self, event):
+        """選択を行のキーで記録（スクロールしても選択が残るようにする）"""
+        selection = set(self.tree.selection())
+        for item, row in zip(self._items, self._visible_rows):
+            if row is None:
+                continue
+            key = self._key_func(row)
+            if item in selection:
+                self._selected[key] = row
+            else:
+                self._selected.pop(key, None)
+    
+    def _on_configure(self, event):
+        """表の高さに合わせて項目数を変更"""
+        try:
+            row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        except (tk.TclError, ValueError):
+            row_height = 20
+        # 見出しの高さは1行分より少し大きい
+        rows = max(1, (event.height - row_height - 6) // row_height)
+        if rows != len(self._items):
+            self._set_item_count(rows)
+            self._offset = max(0, min(self._offset, self.total - rows))
+            self._render()
+    
+    def _set_item_count(self, count):
+        while len(self._items) < count:
+            self._items.append(self.tree.insert('', tk.END, values=()))
+        while len(self._items) > count:
+            item = self._items.pop()
+            self._detached.discard(item)
+            self.tree.delete(item)
\ No newline at end of file
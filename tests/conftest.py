@@ -0,0 +1,32 @@
+# 出退勤管理システム - テスト共通設定
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.database_manager import DatabaseManager
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """一時ディレクトリのDB"""
+    manager = DatabaseManager(str(tmp_path / "attendance.db"))
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def count_rows(db_manager):
+    """打刻テーブルの行数を数える関数（書き込み待ちの打刻を反映してから数える）"""
+    def count(table_name):
+        db_manager.flush_punches(5)
+        conn = sqlite3.connect(db_manager.db_path)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        finally:
+            conn.close()
+    return count
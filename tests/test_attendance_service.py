@@ -0,0 +1,150 @@
+# 出退勤管理システム - 打刻受付サービスのテスト（シミュレーターのリーダーを使用）
+
+import threading
+
+import pytest
+
+from modules.attendance_service import AttendanceService
+from modules.card_reader_manager import CardReaderManager, SimulatedReaderBackend
+from modules.channel_registry import Channel, ChannelRegistry
+from modules.reader_supervisor import ReaderSupervisor
+from modules.tap_debouncer import TapDebouncer
+from modules.utils import SoundManager
+
+CLASS_READER = "Simulated Class Reader"
+MEETING_READER = "Simulated Meeting Reader"
+EXTRA_READER = "Simulated Extra Reader"
+
+
+class EventRecorder:
+    """bus のイベントを記録して、条件に合うイベントを待つ"""
+    
+    def __init__(self, bus):
+        self.events = []
+        self._condition = threading.Condition()
+        bus.subscribe(self._on_event)
+    
+    def _on_event(self, event):
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+    
+    def wait_for(self, event_type, timeout=5.0, **fields):
+        """条件に合うイベントを待って返す（記録済みのものは1回だけ返す）"""
+        def find():
+            for event in self.events:
+                if event['type'] == event_type and all(event.get(k) == v for k, v in fields.items()):
+                    return event
+            return None
+        
+        with self._condition:
+            assert self._condition.wait_for(lambda: find() is not None, timeout), (event_type, fields)
+            event = find()
+            self.events.remove(event)
+            return event
+
+
+@pytest.fixture
+def service_factory(db_manager):
+    """シミュレーターのリーダーで打刻受付サービスを作成して開始"""
+    services = []
+    sound_managers = []
+    
+    def create(channels=None, duplicate_window=0, reader_names=(CLASS_READER, MEETING_READER)):
+        backend = SimulatedReaderBackend(reader_names)
+        card_reader_manager = CardReaderManager(backend)
+        if channels is None:
+            channels = ChannelRegistry.default(CLASS_READER, MEETING_READER)
+        assert card_reader_manager.initialize_channels(channels)
+        
+        sound_manager = SoundManager()
+        sound_manager.sound_enabled = False
+        sound_managers.append(sound_manager)
+        
+        service = AttendanceService(db_manager, card_reader_manager, sound_manager,
+                                    debouncer=TapDebouncer(duplicate_window))
+        service.supervisor = ReaderSupervisor(card_reader_manager, bus=service.bus, rescan_interval=0.2)
+        recorder = EventRecorder(service.bus)
+        service.start()
+        services.append(service)
+        for channel in channels:
+            recorder.wait_for('reader_status', channel=channel.key, status='waiting')
+        return service, backend, recorder
+    
+    yield create
+    for service in services:
+        service.stop()
+    for sound_manager in sound_managers:
+        sound_manager.stop()
+
+
+def tap(backend, recorder, reader_name, uid, event_type, **fields):
+    """カードをかざし、処理のイベントを待ってから離す"""
+    backend.cards.insert(reader_name, uid)
+    try:
+        return recorder.wait_for(event_type, **fields)
+    finally:
+        backend.cards.remove(reader_name)
+
+
+def test_in_then_out(db_manager, service_factory, count_rows):
+    """1回目の打刻は出勤、2回目は退勤"""
+    db_manager.add_instructor_with_id(1, "01 02 03 04", "講師A")
+    service, backend, recorder = service_factory()
+    
+    assert tap(backend, recorder, CLASS_READER, "01 02 03 04", 'punch', channel='class')['record_type'] == "IN"
+    assert tap(backend, recorder, CLASS_READER, "01 02 03 04", 'punch', channel='class')['record_type'] == "OUT"
+    
+    assert count_rows("time_records") == 2
+
+
+def test_unknown_card(db_manager, service_factory, count_rows):
+    """未登録のカードは記録しない"""
+    service, backend, recorder = service_factory()
+    
+    event = tap(backend, recorder, MEETING_READER, "0A 0B 0C 0D", 'unknown_card', channel='meeting')
+    
+    assert event['uid'] == "0A 0B 0C 0D"
+    assert count_rows("meeting_records") == 0
+
+
+def test_duplicate_tap_inside_window(db_manager, service_factory, count_rows):
+    """時間内の二度かざしは記録せず、直前の打刻を通知する"""
+    db_manager.add_instructor_with_id(1, "01 02 03 04", "講師A")
+    service, backend, recorder = service_factory(duplicate_window=60)
+    
+    tap(backend, recorder, CLASS_READER, "01 02 03 04", 'punch', channel='class')
+    duplicate = tap(backend, recorder, CLASS_READER, "01 02 03 04", 'duplicate_tap', channel='class')
+    
+    assert duplicate['record_type'] == "IN"
+    assert count_rows("time_records") == 1
+
+
+def test_punch_to_added_channel_table(db_manager, service_factory, count_rows):
+    """追加したチャンネルの打刻はそのチャンネルのテーブルに記録する"""
+    db_manager.add_instructor_with_id(1, "01 02 03 04", "講師A")
+    channels = ChannelRegistry.default(CLASS_READER, MEETING_READER)
+    channels.add(Channel('extra', "追加", EXTRA_READER, "extra_records"))
+    service, backend, recorder = service_factory(channels, reader_names=(CLASS_READER, MEETING_READER, EXTRA_READER))
+    
+    assert tap(backend, recorder, EXTRA_READER, "01 02 03 04", 'punch', channel='extra')['record_type'] == "IN"
+    
+    assert count_rows("extra_records") == 1
+    assert count_rows("time_records") == 0
+
+
+def test_reader_unplug_and_rebind(db_manager, service_factory, count_rows):
+    """取り外したリーダーを接続し直すと同じチャンネルで打刻できる"""
+    db_manager.add_instructor_with_id(1, "01 02 03 04", "講師A")
+    service, backend, recorder = service_factory()
+    
+    backend.unplug(CLASS_READER)
+    recorder.wait_for('reader_status', channel='class', status='unavailable')
+    assert service.card_reader_manager.get_reader('class') is None
+    
+    backend.plug(CLASS_READER)
+    recorder.wait_for('reader_status', channel='class', status='waiting')
+    assert tap(backend, recorder, CLASS_READER, "01 02 03 04", 'punch', channel='class')['record_type'] == "IN"
+    
+    assert service.reader_health()['class']['reconnects'] >= 1
+    assert count_rows("time_records") == 1
@@ -0,0 +1,38 @@
+# 出退勤管理システム - 日次集計CSVのテスト
+
+import os
+import threading
+
+import pytest
+
+from modules.csv_exporter import CSVExporter
+from modules.export_job_runner import ExportCancelled
+
+
+@pytest.fixture
+def exporter(db_manager, tmp_path, monkeypatch):
+    """一時ディレクトリに出力する CSVExporter（打刻3件）"""
+    monkeypatch.chdir(tmp_path)
+    for minute in range(3):
+        db_manager.record_attendance_to_db("uid-1", "講師A", 1, "IN", f"2026-10-17 09:0{minute}:00")
+    return CSVExporter(db_manager)
+
+
+def test_daily_export_reports_progress(exporter):
+    """書き込んだ行数を進捗として通知する"""
+    messages = []
+    result = exporter.export_records_to_csv("2026-10-17", progress=messages.append)
+    
+    assert "エクスポート完了" in result
+    assert messages == ["2026-10-17: 3件書き込み"]
+
+
+def test_daily_export_cancel_removes_temp_file(exporter):
+    """中止したら一時ファイルを削除し、CSVを作らない"""
+    cancel_event = threading.Event()
+    cancel_event.set()
+    
+    with pytest.raises(ExportCancelled):
+        exporter.export_records_to_csv("2026-10-17", cancel_event=cancel_event)
+    
+    assert os.listdir(os.path.join("daily", "2026-10")) == ["old"]
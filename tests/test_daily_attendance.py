@@ -0,0 +1,48 @@
+# 出退勤管理システム - 打刻集計のテスト
+
+import sqlite3
+
+
+def read_daily_attendance(db_manager):
+    conn = sqlite3.connect(db_manager.db_path)
+    try:
+        return conn.execute("SELECT * FROM daily_attendance ORDER BY table_name, instructor_id, date").fetchall()
+    finally:
+        conn.close()
+
+
+def test_rebuild_matches_incremental_rollup(db_manager):
+    """作り直した打刻集計は打刻ごとに反映した集計と同じ（講師名は最後の打刻のもの）"""
+    db_manager.record_attendance_to_db("uid-1", "講師A", 1, "IN", "2026-10-17 09:00:00")
+    db_manager.record_attendance_to_db("uid-1", "講師A（改名）", 1, "OUT", "2026-10-17 18:00:00")
+    db_manager.record_attendance_to_db("uid-1", "講師A", 1, "IN", "2026-10-17 08:00:00")
+    db_manager.record_attendance_to_db("uid-2", "講師B", None, "IN", "2026-10-17 09:00:00")
+    
+    incremental = read_daily_attendance(db_manager)
+    assert db_manager.rebuild_daily_attendance()
+    
+    assert read_daily_attendance(db_manager) == incremental
+    assert incremental == [
+        ("time_records", 0, "2026-10-17", "講師B", "2026-10-17 09:00:00", "2026-10-17 09:00:00", 1),
+        ("time_records", 1, "2026-10-17", "講師A（改名）", "2026-10-17 08:00:00", "2026-10-17 18:00:00", 3),
+    ]
+
+
+def test_instructor_monthly_records_and_first_last(db_manager):
+    """講師の月次打刻記録はすべての打刻、最初・最後の打刻時刻は日ごとに1組"""
+    db_manager.record_attendance_to_db("uid-1", "講師A", 1, "IN", "2026-10-17 09:00:00")
+    db_manager.record_attendance_to_db("uid-1", "講師A", 1, "OUT", "2026-10-17 12:00:00")
+    db_manager.record_attendance_to_db("uid-1", "講師A", 1, "OUT", "2026-10-17 18:00:00")
+    db_manager.record_attendance_to_db("uid-1", "講師A", 1, "IN", "2026-10-18 10:00:00")
+    db_manager.record_attendance_to_db("uid-1", "講師A", 1, "IN", "2026-11-01 10:00:00")
+    
+    assert db_manager.get_instructor_monthly_records("2026-10", 1) == [
+        ("2026-10-17", "09:00:00"),
+        ("2026-10-17", "12:00:00"),
+        ("2026-10-17", "18:00:00"),
+        ("2026-10-18", "10:00:00"),
+    ]
+    assert db_manager.get_instructor_monthly_first_last("2026-10", 1) == {
+        "2026-10-17": ("09:00:00", "18:00:00"),
+        "2026-10-18": ("10:00:00", "10:00:00"),
+    }
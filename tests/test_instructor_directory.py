@@ -0,0 +1,52 @@
+# 出退勤管理システム - 講師ディレクトリのテスト
+
+import sqlite3
+import time
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_added_instructor_is_found_immediately(db_manager):
+    """このアプリで追加した講師はすぐに検索できる"""
+    assert db_manager.get_instructor_info_by_uid("uid-1") is None
+    assert db_manager.add_instructor_with_id(1, "uid-1", "講師A")
+    
+    assert db_manager.get_instructor_info_by_uid("uid-1")['name'] == "講師A"
+
+
+def test_punch_writes_do_not_reload_on_lookup(db_manager):
+    """打刻の書き込み後の検索では講師データを読み込み直さない"""
+    directory = db_manager.directory
+    directory.check_interval = 0
+    db_manager.add_instructor_with_id(1, "uid-1", "講師A")
+    db_manager.get_instructor_info_by_uid("uid-1")
+    
+    loads = []
+    original_load = directory._load
+    directory._load = lambda: (loads.append(1), original_load())
+    
+    db_manager.enqueue_attendance("uid-1", "講師A", 1, "IN", "2026-10-17 09:00:00")
+    assert db_manager.flush_punches(5)
+    assert db_manager.get_instructor_info_by_uid("uid-1")['name'] == "講師A"
+    assert loads == []
+
+
+def test_external_change_is_picked_up(db_manager):
+    """外部ツールからの変更は検索を止めずに反映される"""
+    db_manager.directory.check_interval = 0
+    db_manager.add_instructor_with_id(1, "uid-1", "講師A")
+    db_manager.get_instructor_info_by_uid("uid-1")
+    
+    conn = sqlite3.connect(db_manager.db_path)
+    conn.execute("UPDATE instructors SET name = ? WHERE card_uid = ?", ("講師B", "uid-1"))
+    conn.commit()
+    conn.close()
+    
+    assert wait_until(lambda: db_manager.get_instructor_info_by_uid("uid-1")['name'] == "講師B")
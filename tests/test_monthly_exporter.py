@@ -0,0 +1,36 @@
+# 出退勤管理システム - 月次集計CSVのテスト
+
+import csv
+import os
+
+from modules.channel_registry import Channel, ChannelRegistry
+from modules.csv_exporter import CSVExporter
+from modules.monthly_exporter import MonthlyExporter
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_added_channel_is_labelled_and_combined(db_manager, tmp_path, monkeypatch):
+    """追加したチャンネルはその種別名で出力し、統合月次集計にも含める"""
+    monkeypatch.chdir(tmp_path)
+    channels = ChannelRegistry.default()
+    channels.add(Channel('entrance', "第2入口用", None, "entrance_records"))
+    db_manager.ensure_record_table("entrance_records")
+    db_manager.add_instructor_with_id(1, "uid-1", "講師A")
+    db_manager.record_attendance_to_db("uid-1", "講師A", 1, "IN", "2026-10-16 09:00:00")
+    db_manager.record_attendance_to_db("uid-1", "講師A", 1, "IN", "2026-10-17 09:00:00", "entrance_records")
+    csv_exporter = CSVExporter(db_manager, lambda: channels)
+    monthly_exporter = MonthlyExporter(db_manager, csv_exporter)
+    
+    assert "種別: 第2入口用" in csv_exporter.export_records_to_csv("2026-10-17", "entrance_records")
+    assert os.path.exists(os.path.join("daily", "2026-10", "【第2入口】日次記録_2026-10-17.csv"))
+    
+    monthly_exporter.export_combined_monthly_summary("2026-10")
+    rows = read_csv(os.path.join("monthly", "2026-10", "【まとめ】出退勤記録_2026-10.csv"))
+    assert rows == [
+        ['【まとめ】講師ID', '【まとめ】講師名', '授業回数', '時間数（3.25h）', '会議回数', '第2入口回数', '出勤回数'],
+        ['1', '講師A', '1', '3.25', '0', '1', '2'],
+    ]
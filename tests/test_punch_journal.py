@@ -0,0 +1,36 @@
+# 出退勤管理システム - 打刻ジャーナルのテスト
+
+from modules.punch_journal import PunchJournal
+
+
+def test_unwritable_punch_is_dead_lettered(db_manager, count_rows):
+    """DBに書き込めない打刻は退避し、前後の打刻は記録される"""
+    db_manager.enqueue_attendance("uid-1", "講師A", 1, "IN", "2026-10-17 09:00:00")
+    db_manager.enqueue_attendance("uid-2", "講師B", 2, "IN", "2026-10-17 09:01:00", "bad-table")
+    db_manager.enqueue_attendance("uid-3", "講師C", 3, "IN", "2026-10-17 09:02:00")
+    
+    assert db_manager.flush_punches(5)
+    assert count_rows("time_records") == 2
+    assert db_manager.get_journal_last_seq() == 3
+    
+    dead = PunchJournal(db_manager.db_path + "-punch.journal.dead").read_entries()
+    assert [entry['card_uid'] for entry in dead] == ["uid-2"]
+
+
+def test_new_channel_table_in_batch(db_manager, count_rows):
+    """書き込みスレッドで作った打刻テーブルは1回だけ記録される"""
+    db_manager.enqueue_attendance("uid-1", "講師A", 1, "IN", "2026-10-17 09:00:00", "extra_records")
+    
+    assert db_manager.flush_punches(5)
+    assert count_rows("extra_records") == 1
+    assert "extra_records" in db_manager.record_tables
+
+
+def test_punch_counts_include_pending_once(db_manager):
+    """書き込み待ちの打刻も反映済みの打刻も1回だけ数える"""
+    for i in range(20):
+        db_manager.enqueue_attendance("uid-1", "講師A", 1, "IN", f"2026-10-17 09:{i:02d}:00")
+        assert db_manager.get_punch_counts("2026-10-17")[("time_records", "uid-1")] == i + 1
+    
+    assert db_manager.flush_punches(5)
+    assert db_manager.get_punch_counts("2026-10-17")[("time_records", "uid-1")] == 20
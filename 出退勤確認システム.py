@@ -7,14 +7,14 @@ from tkinter import ttk, messagebox, simpledialog
 import time
 import os
 import threading
-import hashlib
 from datetime import datetime
+from functools import cached_property
 
-# モジュールのインポート
+# モジュールのインポート（カードリーダー・エクスポート・打刻修正などは最初に使うときに読み込む）
+import modules
 from modules import (
-    JST, PASSWORD_HASH, DATA_DIR, CONFIG_PATH, WINDOW_WIDTH, WINDOW_HEIGHT,
-    DatabaseManager, CardReaderManager, CSVExporter, MonthlyExporter,
-    ConfigManager, SoundManager, CorrectionManager
+    JST, PASSWORD_HASH, DATA_DIR, CONFIG_PATH, WINDOW_WIDTH, WINDOW_HEIGHT, CHANNEL_EXTRA_COLORS,
+    DatabaseManager, ConfigManager, SoundManager, metrics
 )
 
 class AttendanceSystemGUI:
@@ -34,100 +34,199 @@ class AttendanceSystemGUI:
             os.makedirs(DATA_DIR)
         
         # マネージャー初期化
+        # （カードリーダー・エクスポート・打刻修正・打刻受付は下のプロパティで最初に使うときに作成する）
         self.db_manager = DatabaseManager(os.path.join(DATA_DIR, "attendance.db"))
-        self.card_reader_manager = CardReaderManager()
-        self.csv_exporter = CSVExporter(self.db_manager)
-        self.monthly_exporter = MonthlyExporter(self.db_manager, self.csv_exporter)
         self.config_manager = ConfigManager(CONFIG_PATH)
         self.sound_manager = SoundManager()
-        self.correction_manager = CorrectionManager(
-            self.root, self.db_manager, self.card_reader_manager, 
-            self.sound_manager, self.show_menu
-        )
+        self.service_subscription = None
         
-        # 監視関連
-        self.monitoring = False
-        self.clear_timer_class = None
-        self.clear_timer_meeting = None
+        # 処理時間の計測（有効なら定期的にログへ書き出す）
+        if metrics.enabled:
+            metrics.start_log(os.path.join(DATA_DIR, "metrics.log"))
+        # チャンネルごとの打刻情報の表示を消すタイマー
+        self.clear_timers = {}
+        self.channel_info_labels = {}
+        
+        # エクスポート関連（進捗を表示する画面と、進捗の取り出しを実行中かどうか）
+        self.export_view = None
+        self.export_polling = False
         
         # 設定の読み込みと初期化
         config = self.config_manager.load_config()
         if not config:
             self.show_reader_setup()
         else:
-            if not self.card_reader_manager.initialize_readers(
-                config['class_reader'], config['meeting_reader']
-            ):
-                messagebox.showwarning("警告", "リーダーの初期化に失敗しました\n設定を確認してください")
-                self.show_reader_setup()
-            else:
-                self.show_menu()
+            # メニューを先に表示し、pyscard の読み込みとリーダーの初期化は画面の描画後に行う
+            # （after_idle は描画の後に実行され、その中で after(0) にすることで描画を待たせない）
+            self.show_menu()
+            self.root.after_idle(lambda: self.root.after(0, lambda: self.initialize_readers(config)))
+            self.root.after_idle(lambda: self.root.after(0, self.archive_closed_periods))
+    
+    def archive_closed_periods(self):
+        """締めた年の打刻をアーカイブに移動（年に1回だけ時間がかかるため別スレッドで実行）"""
+        threading.Thread(target=self.db_manager.archive_closed_periods, daemon=True).start()
+    
+    def initialize_readers(self, config):
+        """設定されたリーダーを初期化（失敗したらリーダー設定画面へ）"""
+        if not self.card_reader_manager.initialize_channels(config['channels']):
+            messagebox.showwarning("警告", "リーダーの初期化に失敗しました\n設定を確認してください")
+            self.show_reader_setup()
+    
+    @cached_property
+    def card_reader_manager(self):
+        return modules.CardReaderManager()
+    
+    @cached_property
+    def csv_exporter(self):
+        # 種別名・ファイル名はチャンネル設定から作る（リーダー設定で変更されても最新のものを使う）
+        return modules.CSVExporter(self.db_manager, lambda: self.card_reader_manager.channels)
+    
+    @cached_property
+    def monthly_exporter(self):
+        return modules.MonthlyExporter(self.db_manager, self.csv_exporter)
+    
+    @cached_property
+    def export_runner(self):
+        return modules.ExportJobRunner()
+    
+    @cached_property
+    def loader(self):
+        return modules.BackgroundLoader(self.root)
+    
+    @cached_property
+    def correction_manager(self):
+        return modules.CorrectionManager(
+            self.root, self.db_manager, self.card_reader_manager, 
+            self.sound_manager, self.show_menu
+        )
+    
+    @cached_property
+    def attendance_service(self):
+        """打刻受付（カード監視・判定・記録はサービス側で行い、画面はイベントを購読して表示する）"""
+        return modules.AttendanceService(
+            self.db_manager, self.card_reader_manager, self.sound_manager
+        )
+    
+    def shutdown(self):
+        """作成済みのマネージャーを停止してデータベース接続を閉じる"""
+        for name in ('attendance_service', 'export_runner', 'loader'):
+            if name in self.__dict__:
+                self.__dict__[name].stop()
+        self.sound_manager.stop()
+        metrics.stop_log()
+        self.db_manager.close()
     
     def show_reader_setup(self):
-        """リーダー設定画面"""
+        """リーダー設定画面（チャンネルごとにリーダーを割り当て、チャンネルの追加・削除もここで行う）"""
         for widget in self.root.winfo_children():
             widget.destroy()
         
         tk.Label(self.root, text="リーダー設定", font=("Arial", 18, "bold")).pack(pady=20)
-        tk.Label(self.root, text="接続されているリーダーを授業用と会議用に割り当ててください",
+        tk.Label(self.root, text="接続されているリーダーを各チャンネルに割り当ててください",
                  font=("Arial", 12)).pack(pady=10)
         
         try:
             reader_names = self.card_reader_manager.get_available_readers()
-            if len(reader_names) < 2:
+            if not reader_names:
                 tk.Label(self.root, 
-                    text=f"エラー: {len(reader_names)}台のリーダーしか検出されていません\n2台のリーダーを接続してください",
+                    text="エラー: リーダーが検出されていません\nリーダーを1台以上接続してください",
                     font=("Arial", 12), fg="red").pack(pady=20)
                 tk.Button(self.root, text="再試行", 
                     command=self.show_reader_setup, font=("Arial", 12)).pack(pady=10)
                 return
             
+            # 保存するまでは現在の設定を変更しないよう、チャンネルを複製して編集する
+            channels = [modules.Channel(channel.key, channel.label, channel.reader_name, channel.table, channel.color)
+                        for channel in self.card_reader_manager.channels]
+            
+            # 設定済みのリーダーが接続されていないチャンネルには、Sony製リーダーを優先して未使用のリーダーを割り当てる
+            candidates = sorted(reader_names, key=lambda name: 'sony' not in name.lower())
+            used = {channel.reader_name for channel in channels if channel.reader_name in reader_names}
+            for channel in channels:
+                if channel.reader_name not in reader_names:
+                    unused = [name for name in candidates if name not in used]
+                    channel.reader_name = unused[0] if unused else None
+                    used.add(channel.reader_name)
+            
             select_frame = tk.Frame(self.root)
             select_frame.pack(pady=20)
+            combos = {}
             
-            # Sony製リーダーを授業用に優先割り当て
-            sony_reader = None
-            other_reader = None
-            for name in reader_names:
-                if 'sony' in name.lower():
-                    sony_reader = name
-                else:
-                    other_reader = name
-            
-            # デフォルトの割り当て
-            default_class = sony_reader if sony_reader else reader_names[0]
-            default_meeting = other_reader if other_reader else (reader_names[1] if len(reader_names) > 1 else reader_names[0])
-            
-            tk.Label(select_frame, text="授業用リーダー:", 
-                    font=("Arial", 12)).grid(row=0, column=0, padx=10, pady=10, sticky='e')
-            class_combo = ttk.Combobox(select_frame, values=reader_names, 
-                                      width=40, font=("Arial", 10), state='readonly')
-            class_combo.grid(row=0, column=1, padx=10, pady=10)
-            if reader_names:
-                class_combo.set(default_class)
-            
-            tk.Label(select_frame, text="会議用リーダー:", 
-                    font=("Arial", 12)).grid(row=1, column=0, padx=10, pady=10, sticky='e')
-            meeting_combo = ttk.Combobox(select_frame, values=reader_names, 
+            def store_selection():
+                for channel in channels:
+                    channel.reader_name = combos[channel.key].get() or None
+            
+            def show_rows():
+                for widget in select_frame.winfo_children():
+                    widget.destroy()
+                combos.clear()
+                
+                for row, channel in enumerate(channels):
+                    tk.Label(select_frame, text=f"{channel.label}リーダー:", bg=channel.color,
+                            font=("Arial", 12)).grid(row=row, column=0, padx=10, pady=10, sticky='e')
+                    combo = ttk.Combobox(select_frame, values=reader_names, 
                                         width=40, font=("Arial", 10), state='readonly')
-            meeting_combo.grid(row=1, column=1, padx=10, pady=10)
-            if len(reader_names) > 1:
-                meeting_combo.set(default_meeting)
+                    combo.grid(row=row, column=1, padx=10, pady=10)
+                    if channel.reader_name:
+                        combo.set(channel.reader_name)
+                    combos[channel.key] = combo
+                    tk.Button(select_frame, text="削除", font=("Arial", 10),
+                             command=lambda key=channel.key: remove_channel(key)).grid(row=row, column=2, padx=10)
+            
+            def add_channel():
+                label = simpledialog.askstring("チャンネル追加", "チャンネル名（例: 研修用）:", parent=self.root)
+                if not label or not label.strip():
+                    return
+                label = label.strip()
+                if any(channel.label == label for channel in channels):
+                    messagebox.showerror("エラー", f"{label}は既にあります")
+                    return
+                
+                store_selection()
+                keys = {channel.key for channel in channels}
+                number = 1
+                while f"channel{number}" in keys:
+                    number += 1
+                key = f"channel{number}"
+                colors = {channel.color for channel in channels}
+                color = next((color for color in CHANNEL_EXTRA_COLORS if color not in colors), "lightgray")
+                channels.append(modules.Channel(key, label, None, f"{key}_records", color))
+                show_rows()
+            
+            def remove_channel(key):
+                if len(channels) <= 1:
+                    messagebox.showerror("エラー", "チャンネルは1つ以上必要です")
+                    return
+                store_selection()
+                channels[:] = [channel for channel in channels if channel.key != key]
+                show_rows()
             
             def save_and_continue():
-                class_reader = class_combo.get()
-                meeting_reader = meeting_combo.get()
+                store_selection()
+                
+                if any(not channel.reader_name for channel in channels):
+                    messagebox.showerror("エラー", 
+                        "すべてのチャンネルにリーダーを選択してください\n（リーダーが足りない場合はチャンネルを削除してください）")
+                    return
                 
-                if not class_reader or not meeting_reader:
-                    messagebox.showerror("エラー", "両方のリーダーを選択してください")
+                if len({channel.reader_name for channel in channels}) < len(channels):
+                    messagebox.showerror("エラー", "チャンネルごとに異なるリーダーを選択してください")
                     return
                 
-                if class_reader == meeting_reader:
-                    messagebox.showerror("エラー", "異なるリーダーを選択してください")
+                try:
+                    registry = modules.ChannelRegistry(channels)
+                except ValueError as e:
+                    messagebox.showerror("エラー", str(e))
                     return
                 
-                if self.config_manager.save_config(class_reader, meeting_reader):
-                    if self.card_reader_manager.initialize_readers(class_reader, meeting_reader):
+                # 追加したチャンネルの打刻テーブルを用意（打刻表示・集計で参照するため）
+                for table_name in registry.tables():
+                    self.db_manager.ensure_record_table(table_name)
+                
+                class_reader = registry.get('class').reader_name if 'class' in registry else ""
+                meeting_reader = registry.get('meeting').reader_name if 'meeting' in registry else ""
+                if self.config_manager.save_config(class_reader, meeting_reader, registry):
+                    if self.card_reader_manager.initialize_channels(registry):
                         messagebox.showinfo("成功", "リーダー設定が完了しました")
                         self.show_menu()
                     else:
@@ -135,6 +234,10 @@ class AttendanceSystemGUI:
                 else:
                     messagebox.showerror("エラー", "設定の保存に失敗しました")
             
+            show_rows()
+            
+            tk.Button(self.root, text="チャンネルを追加", command=add_channel,
+                     font=("Arial", 12), width=15).pack(pady=5)
             tk.Button(self.root, text="設定を保存", command=save_and_continue,
                      font=("Arial", 14), bg="green", fg="white", width=15).pack(pady=20)
             
@@ -163,6 +266,7 @@ class AttendanceSystemGUI:
             ("7. 日次集計", self.show_csv_export),
             ("8. 月次集計", self.show_monthly_summary),
             ("9. リーダー設定", self.show_reader_setup),
+            ("診断情報", self.show_diagnostics),
             ("0. 終了", self.exit_app)
         ]
         
@@ -176,7 +280,7 @@ class AttendanceSystemGUI:
         tk.Label(self.root, text=f"音声: {sound_status}", font=("Arial", 10)).pack(side=tk.BOTTOM, pady=10)
     
     def show_attendance_monitor(self):
-        """打刻受付画面（2分割）"""
+        """打刻受付画面（チャンネルごとに分割）"""
         for widget in self.root.winfo_children():
             widget.destroy()
         
@@ -185,172 +289,114 @@ class AttendanceSystemGUI:
         main_frame = tk.Frame(self.root)
         main_frame.pack(pady=10, fill=tk.BOTH, expand=True)
         
-        # 左側：授業用
-        class_frame = tk.Frame(main_frame, relief=tk.RIDGE, borderwidth=2)
-        class_frame.pack(side=tk.LEFT, padx=10, fill=tk.BOTH, expand=True)
-        
-        tk.Label(class_frame, text="授業用", font=("Arial", 16, "bold"), 
-                bg="lightblue").pack(fill=tk.X, pady=5)
-        
-        class_status = tk.Label(class_frame, text="カードをかざしてください...", 
-                               font=("Arial", 12), fg="blue")
-        class_status.pack(pady=10)
-        
-        class_info_frame = tk.Frame(class_frame)
-        class_info_frame.pack(pady=10, fill=tk.BOTH, expand=True)
-        
-        self.class_info_labels = {
-            'instructor_id': tk.Label(class_info_frame, text="", font=("Arial", 14)),
-            'name': tk.Label(class_info_frame, text="", font=("Arial", 18, "bold")),
-            'action': tk.Label(class_info_frame, text="", font=("Arial", 16, "bold"))
-        }
-        
-        for label in self.class_info_labels.values():
-            label.pack(pady=3)
-        
-        # 右側：会議用
-        meeting_frame = tk.Frame(main_frame, relief=tk.RIDGE, borderwidth=2)
-        meeting_frame.pack(side=tk.RIGHT, padx=10, fill=tk.BOTH, expand=True)
-        
-        tk.Label(meeting_frame, text="会議用", font=("Arial", 16, "bold"), 
-                bg="lightgreen").pack(fill=tk.X, pady=5)
-        
-        meeting_status = tk.Label(meeting_frame, text="カードをかざしてください...", 
-                                 font=("Arial", 12), fg="blue")
-        meeting_status.pack(pady=10)
-        
-        meeting_info_frame = tk.Frame(meeting_frame)
-        meeting_info_frame.pack(pady=10, fill=tk.BOTH, expand=True)
-        
-        self.meeting_info_labels = {
-            'instructor_id': tk.Label(meeting_info_frame, text="", font=("Arial", 14)),
-            'name': tk.Label(meeting_info_frame, text="", font=("Arial", 18, "bold")),
-            'action': tk.Label(meeting_info_frame, text="", font=("Arial", 16, "bold"))
-        }
-        
-        for label in self.meeting_info_labels.values():
-            label.pack(pady=3)
+        # チャンネルの設定順に左から並べる
+        status_labels = {}
+        self.channel_info_labels = {}
+        for channel in self.card_reader_manager.channels:
+            channel_frame = tk.Frame(main_frame, relief=tk.RIDGE, borderwidth=2)
+            channel_frame.pack(side=tk.LEFT, padx=10, fill=tk.BOTH, expand=True)
+            
+            tk.Label(channel_frame, text=channel.label, font=("Arial", 16, "bold"), 
+                    bg=channel.color).pack(fill=tk.X, pady=5)
+            
+            status_label = tk.Label(channel_frame, text="カードをかざしてください...", 
+                                   font=("Arial", 12), fg="blue")
+            status_label.pack(pady=10)
+            
+            info_frame = tk.Frame(channel_frame)
+            info_frame.pack(pady=10, fill=tk.BOTH, expand=True)
+            
+            info_labels = {
+                'instructor_id': tk.Label(info_frame, text="", font=("Arial", 14)),
+                'name': tk.Label(info_frame, text="", font=("Arial", 18, "bold")),
+                'action': tk.Label(info_frame, text="", font=("Arial", 16, "bold"))
+            }
+            
+            for label in info_labels.values():
+                label.pack(pady=3)
+            
+            status_labels[channel.key] = status_label
+            self.channel_info_labels[channel.key] = info_labels
         
         tk.Button(self.root, text="終了", command=self.stop_monitoring,
                  font=("Arial", 12), bg="red", fg="white").pack(pady=10)
         
-        # 監視開始
-        self.monitoring = True
-        threading.Thread(
-            target=self.monitor_cards, 
-            args=(self.card_reader_manager.class_reader, class_status, 'class'), 
-            daemon=True
-        ).start()
-        threading.Thread(
-            target=self.monitor_cards, 
-            args=(self.card_reader_manager.meeting_reader, meeting_status, 'meeting'), 
-            daemon=True
-        ).start()
-    
-    def monitor_cards(self, reader, status_label, reader_type):
-        """カード監視スレッド"""
-        # リーダーが接続されていない場合は何もしない
-        if reader is None:
-            self.root.after(0, lambda: status_label.config(
-                text="リーダー未接続", fg="gray"))
+        # 監視開始（画面は打刻受付サービスのイベントを表示するだけ）
+        self.service_subscription = self.attendance_service.bus.subscribe(
+            lambda event: self.root.after(0, lambda: self.on_service_event(event, status_labels))
+        )
+        self.attendance_service.start()
+    
+    def on_service_event(self, event, status_labels):
+        """打刻受付サービスのイベントを表示（画面のスレッドで実行）"""
+        if event.get('channel') not in status_labels:
             return
-        
-        connection = None
-        last_uid = None
-        
-        while self.monitoring:
-            try:
-                if self.card_reader_manager.is_card_present(reader):
-                    connection = self.card_reader_manager.connect_to_card(reader)
-                    if connection:
-                        uid = self.card_reader_manager.get_card_uid(connection)
-                        if uid and uid != last_uid:
-                            self.sound_manager.play_beep("card_detected")
-                            self.process_attendance(uid, status_label, reader_type)
-                            last_uid = uid
-                        self.card_reader_manager.disconnect(connection)
-                        connection = None
-                else:
-                    if last_uid:
-                        last_uid = None
-                
-                time.sleep(0.5)
-            except Exception as e:
-                print(f"監視エラー ({reader_type}): {e}")
-                time.sleep(1)
-        
-        if connection:
-            self.card_reader_manager.disconnect(connection)
-    
-    def process_attendance(self, uid, status_label, reader_type):
-        """打刻処理"""
-        instructor_info = self.db_manager.get_instructor_info_by_uid(uid)
-        
-        if not instructor_info:
-            self.root.after(0, lambda: status_label.config(
-                text="未登録のカードです", fg="red"))
-            self.sound_manager.play_beep("error")
-            self.root.after(2000, lambda: status_label.config(
-                text="カードをかざしてください...", fg="blue"))
+        status_label = status_labels[event['channel']]
+        if not status_label.winfo_exists():
             return
         
-        table_name = "time_records" if reader_type == "class" else "meeting_records"
-        
-        # その日の打刻回数を取得して判定
-        jst_now = datetime.now(JST)
-        today_str = jst_now.strftime("%Y-%m-%d")
-        today_records = self.db_manager.get_date_records_by_uid(uid, today_str, table_name)
-        
-        # 1回目の打刻は出勤、2回目以降は退勤
-        if len(today_records) == 0:
-            record_type = "IN"
-            action = "出勤"
-            action_color = "green"
-        else:
-            record_type = "OUT"
-            action = "退勤"
-            action_color = "orange"
-        
-        timestamp_str = jst_now.strftime("%Y-%m-%d %H:%M:%S")
-        
-        if self.db_manager.record_attendance_to_db(uid, instructor_info['name'], 
-                                       instructor_info['instructor_id'], 
-                                       record_type, timestamp_str, table_name):
-            self.root.after(0, lambda: self.display_attendance_info(
-                instructor_info['instructor_id'],
-                instructor_info['name'],
-                uid,
-                timestamp_str,
+        if event['type'] == 'reader_status':
+            if event['status'] == 'unavailable':
+                status_label.config(text="リーダー未接続", fg="gray")
+            elif event['status'] == 'reconnecting':
+                status_label.config(text="リーダー再接続中...", fg="orange")
+            else:
+                status_label.config(text="カードをかざしてください...", fg="blue")
+        elif event['type'] == 'unknown_card':
+            status_label.config(text="未登録のカードです", fg="red")
+            self.root.after(2000, lambda: status_label.winfo_exists() and status_label.config(
+                text="カードをかざしてください...", fg="blue"))
+        elif event['type'] == 'punch':
+            if event['record_type'] == "IN":
+                action = "出勤"
+                action_color = "green"
+            else:
+                action = "退勤"
+                action_color = "orange"
+            
+            self.display_attendance_info(
+                event['instructor_id'],
+                event['name'],
+                event['uid'],
+                event['timestamp'],
                 action,
                 action_color,
                 status_label,
-                reader_type
-            ))
-            self.sound_manager.play_beep("success")
-        else:
-            self.sound_manager.play_beep("error")
+                event['channel']
+            )
+            # カードを読み取ってから画面に表示されるまでの時間
+            metrics.observe_ms("gui.update", (time.perf_counter() - event['started_at']) * 1000)
+        elif event['type'] == 'duplicate_tap':
+            # 二度かざし（記録していない）は直前の打刻を表示する
+            action = "出勤" if event['record_type'] == "IN" else "退勤"
+            self.display_attendance_info(
+                event['instructor_id'],
+                event['name'],
+                event['uid'],
+                event['timestamp'],
+                action,
+                "purple",
+                status_label,
+                event['channel'],
+                status_text=f"打刻済みです（{event['timestamp'][11:16]} {action}）"
+            )
     
-    def display_attendance_info(self, instructor_id, name, uid, timestamp, action, color, status_label, reader_type):
+    def display_attendance_info(self, instructor_id, name, uid, timestamp, action, color, status_label, reader_type,
+                                status_text=None):
         """打刻情報を3秒間表示"""
-        if reader_type == "class":
-            info_labels = self.class_info_labels
-            timer_attr = 'clear_timer_class'
-        else:
-            info_labels = self.meeting_info_labels
-            timer_attr = 'clear_timer_meeting'
-        
-        timer_id = getattr(self, timer_attr, None)
+        info_labels = self.channel_info_labels[reader_type]
+        timer_id = self.clear_timers.get(reader_type)
         if timer_id is not None:
             self.root.after_cancel(timer_id)
         
-        status_label.config(text=f"{action}記録完了！", fg=color)
+        status_label.config(text=status_text or f"{action}記録完了！", fg=color)
         
         info_labels['instructor_id'].config(text=f"講師番号: {instructor_id}")
         info_labels['name'].config(text=f"{name}")
         info_labels['action'].config(text=f"【{action}】", fg=color)
         
-        new_timer_id = self.root.after(3000, lambda: self.clear_attendance_info(status_label, info_labels))
-        setattr(self, timer_attr, new_timer_id)
+        self.clear_timers[reader_type] = self.root.after(
+            3000, lambda: self.clear_attendance_info(status_label, info_labels))
     
     def clear_attendance_info(self, status_label, info_labels):
         """打刻情報をクリア"""
@@ -360,8 +406,10 @@ class AttendanceSystemGUI:
     
     def stop_monitoring(self):
         """監視停止"""
-        self.monitoring = False
-        time.sleep(0.5)
+        if self.service_subscription is not None:
+            self.attendance_service.bus.unsubscribe(self.service_subscription)
+            self.service_subscription = None
+        self.attendance_service.stop()
         self.show_menu()
     
     def show_instructor_list(self):
@@ -376,33 +424,14 @@ class AttendanceSystemGUI:
                                font=("Arial", 12), bg="green", fg="white")
         register_btn.place(x=680, y=10)
         
-        table_frame = tk.Frame(self.root)
-        table_frame.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
+        columns = ('講師番号', 'カードUID', '講師名', '登録日時')
+        table = modules.VirtualTable(self.root, columns, {col: 180 for col in columns}, height=10)
+        table.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
         
-        scrollbar = tk.Scrollbar(table_frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # 表示範囲の講師だけを講師番号順に読み込む
+        table.set_source(self.db_manager.count_instructors, self.db_manager.get_instructors_page)
         
-        columns = ('講師番号', 'カードUID', '講師名', '登録日時')
-        tree = ttk.Treeview(table_frame, columns=columns, show='headings',
-                           yscrollcommand=scrollbar.set)
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=180)
-        
-        instructors = self.db_manager.load_instructors_full()
-        for instructor in instructors:
-            tree.insert('', tk.END, values=(
-                instructor['instructor_id'],
-                instructor['card_uid'],
-                instructor['name'],
-                instructor['created_at']
-            ))
-        
-        tree.pack(fill=tk.BOTH, expand=True)
-        scrollbar.config(command=tree.yview)
-        
-        tk.Label(self.root, text=f"登録講師数: {len(instructors)}人",
+        tk.Label(self.root, text=f"登録講師数: {table.total}人",
                  font=("Arial", 12)).pack(pady=5)
         
         tk.Button(self.root, text="戻る", command=self.show_menu,
@@ -420,11 +449,11 @@ class AttendanceSystemGUI:
         reader_frame.pack(pady=5)
         
         tk.Label(reader_frame, text="使用するリーダー:", font=("Arial", 11)).pack(side=tk.LEFT, padx=5)
-        reader_var = tk.StringVar(value="class")
-        tk.Radiobutton(reader_frame, text="授業用", variable=reader_var, 
-                      value="class", font=("Arial", 10)).pack(side=tk.LEFT)
-        tk.Radiobutton(reader_frame, text="会議用", variable=reader_var, 
-                      value="meeting", font=("Arial", 10)).pack(side=tk.LEFT)
+        channels = self.card_reader_manager.channels
+        reader_var = tk.StringVar(value=channels.keys()[0])
+        for channel in channels:
+            tk.Radiobutton(reader_frame, text=channel.label, variable=reader_var, 
+                          value=channel.key, font=("Arial", 10)).pack(side=tk.LEFT)
         
         status_label = tk.Label(reg_window, text="カードをかざしてください...",
                               font=("Arial", 12), fg="blue")
@@ -451,21 +480,19 @@ class AttendanceSystemGUI:
         
         def check_card():
             if reg_window.winfo_exists():
-                selected_reader = self.card_reader_manager.class_reader if reader_var.get() == "class" else self.card_reader_manager.meeting_reader
+                selected_reader = self.card_reader_manager.get_reader(reader_var.get())
                 
-                if self.card_reader_manager.is_card_present(selected_reader):
-                    connection = self.card_reader_manager.connect_to_card(selected_reader)
-                    if connection:
-                        uid = self.card_reader_manager.get_card_uid(connection)
-                        if uid and uid != detected_uid['uid']:
-                            detected_uid['uid'] = uid
-                            uid_entry.config(state='normal')
-                            uid_entry.delete(0, tk.END)
-                            uid_entry.insert(0, uid)
-                            uid_entry.config(state='readonly')
-                            status_label.config(text="カード検出！講師情報を入力してください", fg="green")
-                            self.sound_manager.play_beep("card_detected")
-                        self.card_reader_manager.disconnect(connection)
+                result = self.card_reader_manager.read_uid(selected_reader)
+                if result['status'] == modules.READ_OK:
+                    uid = result['uid']
+                    if uid != detected_uid['uid']:
+                        detected_uid['uid'] = uid
+                        uid_entry.config(state='normal')
+                        uid_entry.delete(0, tk.END)
+                        uid_entry.insert(0, uid)
+                        uid_entry.config(state='readonly')
+                        status_label.config(text="カード検出！講師情報を入力してください", fg="green")
+                        self.sound_manager.play_beep("card_detected")
                 reg_window.after(500, check_card)
         
         check_card()
@@ -505,7 +532,7 @@ class AttendanceSystemGUI:
                  font=("Arial", 12), width=10).pack(side=tk.LEFT, padx=5)
     
     def show_attendance_records(self):
-        """打刻表示画面（2分割）"""
+        """打刻表示画面（記録先テーブルごとに分割）"""
         for widget in self.root.winfo_children():
             widget.destroy()
         
@@ -524,66 +551,16 @@ class AttendanceSystemGUI:
         main_frame = tk.Frame(self.root)
         main_frame.pack(pady=10, fill=tk.BOTH, expand=True, padx=10)
         
-        # 左側：授業用
-        class_frame = tk.Frame(main_frame, relief=tk.RIDGE, borderwidth=2)
-        class_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
-        
-        tk.Label(class_frame, text="授業用", font=("Arial", 14, "bold"), 
-                bg="lightblue").pack(fill=tk.X, pady=5)
-        
-        class_table_frame = tk.Frame(class_frame)
-        class_table_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        class_scrollbar = tk.Scrollbar(class_table_frame)
-        class_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
+        # 記録先テーブルごとにチャンネルの設定順で左から並べる
         columns = ('時刻', '講師名', '種別')
-        class_tree = ttk.Treeview(class_table_frame, columns=columns, show='headings',
-                                  yscrollcommand=class_scrollbar.set, height=15)
-        
-        class_tree.heading('時刻', text='時刻')
-        class_tree.heading('講師名', text='講師名')
-        class_tree.heading('種別', text='種別')
-        
-        class_tree.column('時刻', width=100)
-        class_tree.column('講師名', width=120)
-        class_tree.column('種別', width=60)
-        
-        class_tree.pack(fill=tk.BOTH, expand=True)
-        class_scrollbar.config(command=class_tree.yview)
-        
-        class_count_label = tk.Label(class_frame, text="", font=("Arial", 10))
-        class_count_label.pack(pady=5)
-        
-        # 右側：会議用
-        meeting_frame = tk.Frame(main_frame, relief=tk.RIDGE, borderwidth=2)
-        meeting_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5)
+        widths = {'時刻': 100, '講師名': 120, '種別': 60}
+        panes = self.build_channel_tables(main_frame, columns, widths)
         
-        tk.Label(meeting_frame, text="会議用", font=("Arial", 14, "bold"), 
-                bg="lightgreen").pack(fill=tk.X, pady=5)
-        
-        meeting_table_frame = tk.Frame(meeting_frame)
-        meeting_table_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        meeting_scrollbar = tk.Scrollbar(meeting_table_frame)
-        meeting_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        meeting_tree = ttk.Treeview(meeting_table_frame, columns=columns, show='headings',
-                                    yscrollcommand=meeting_scrollbar.set, height=15)
-        
-        meeting_tree.heading('時刻', text='時刻')
-        meeting_tree.heading('講師名', text='講師名')
-        meeting_tree.heading('種別', text='種別')
-        
-        meeting_tree.column('時刻', width=100)
-        meeting_tree.column('講師名', width=120)
-        meeting_tree.column('種別', width=60)
-        
-        meeting_tree.pack(fill=tk.BOTH, expand=True)
-        meeting_scrollbar.config(command=meeting_tree.yview)
-        
-        meeting_count_label = tk.Label(meeting_frame, text="", font=("Arial", 10))
-        meeting_count_label.pack(pady=5)
+        def format_record(row):
+            record_id, name, record_type, timestamp = row
+            action = "出勤" if record_type == "IN" else "退勤"
+            time_part = timestamp.split()[1] if ' ' in timestamp else timestamp
+            return (time_part, name, action)
         
         def display_records():
             date_str = date_entry.get().strip()
@@ -596,29 +573,20 @@ class AttendanceSystemGUI:
                 messagebox.showerror("エラー", "日付形式が正しくありません (YYYY-MM-DD)")
                 return
             
-            class_records = self.db_manager.get_date_records(date_str, "time_records")
-            
-            for item in class_tree.get_children():
-                class_tree.delete(item)
-            
-            for name, record_type, timestamp in class_records:
-                action = "出勤" if record_type == "IN" else "退勤"
-                time_part = timestamp.split()[1] if ' ' in timestamp else timestamp
-                class_tree.insert('', tk.END, values=(time_part, name, action))
-            
-            class_count_label.config(text=f"記録数: {len(class_records)}件")
-            
-            meeting_records = self.db_manager.get_date_records(date_str, "meeting_records")
-            
-            for item in meeting_tree.get_children():
-                meeting_tree.delete(item)
-            
-            for name, record_type, timestamp in meeting_records:
-                action = "出勤" if record_type == "IN" else "退勤"
-                time_part = timestamp.split()[1] if ' ' in timestamp else timestamp
-                meeting_tree.insert('', tk.END, values=(time_part, name, action))
-            
-            meeting_count_label.config(text=f"記録数: {len(meeting_records)}件")
+            # 表示範囲だけを読み込む（全件をTreeviewに入れ直さない）
+            sources = []
+            for table_name, table, count_label in panes:
+                sources.append({
+                    'table': table,
+                    'label': count_label,
+                    'label_format': "記録数: {}件",
+                    'count': lambda table_name=table_name: self.db_manager.count_date_records(date_str, table_name),
+                    'page': lambda after, limit, table_name=table_name: self.db_manager.get_date_records_page(
+                        date_str, table_name, after, limit),
+                    'key': lambda row: (row[3], row[0]),
+                    'format': format_record
+                })
+            self.load_tables("attendance_records", sources)
         
         tk.Button(input_frame, text="表示", command=display_records,
                  font=("Arial", 12), bg="blue", fg="white").pack(side=tk.LEFT, padx=5)
@@ -629,7 +597,7 @@ class AttendanceSystemGUI:
                  font=("Arial", 12)).pack(pady=10)
     
     def show_attendance_summary(self):
-        """打刻サマリー画面（2分割）"""
+        """打刻サマリー画面（記録先テーブルごとに分割）"""
         for widget in self.root.winfo_children():
             widget.destroy()
         
@@ -648,66 +616,10 @@ class AttendanceSystemGUI:
         main_frame = tk.Frame(self.root)
         main_frame.pack(pady=10, fill=tk.BOTH, expand=True, padx=10)
         
-        # 左側：授業用
-        class_frame = tk.Frame(main_frame, relief=tk.RIDGE, borderwidth=2)
-        class_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
-        
-        tk.Label(class_frame, text="授業用", font=("Arial", 14, "bold"), 
-                bg="lightblue").pack(fill=tk.X, pady=5)
-        
-        class_table_frame = tk.Frame(class_frame)
-        class_table_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        class_scrollbar = tk.Scrollbar(class_table_frame)
-        class_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
+        # 記録先テーブルごとにチャンネルの設定順で左から並べる
         columns = ('講師名', '状態', '最終打刻時刻', '記録')
-        class_tree = ttk.Treeview(class_table_frame, columns=columns, show='headings',
-                                  yscrollcommand=class_scrollbar.set, height=15)
-        
-        for col in columns:
-            class_tree.heading(col, text=col)
-        
-        class_tree.column('講師名', width=80)
-        class_tree.column('状態', width=60)
-        class_tree.column('最終打刻時刻', width=120)
-        class_tree.column('記録', width=150)
-        
-        class_tree.pack(fill=tk.BOTH, expand=True)
-        class_scrollbar.config(command=class_tree.yview)
-        
-        class_count_label = tk.Label(class_frame, text="", font=("Arial", 10))
-        class_count_label.pack(pady=5)
-        
-        # 右側：会議用
-        meeting_frame = tk.Frame(main_frame, relief=tk.RIDGE, borderwidth=2)
-        meeting_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5)
-        
-        tk.Label(meeting_frame, text="会議用", font=("Arial", 14, "bold"), 
-                bg="lightgreen").pack(fill=tk.X, pady=5)
-        
-        meeting_table_frame = tk.Frame(meeting_frame)
-        meeting_table_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        meeting_scrollbar = tk.Scrollbar(meeting_table_frame)
-        meeting_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        meeting_tree = ttk.Treeview(meeting_table_frame, columns=columns, show='headings',
-                                    yscrollcommand=meeting_scrollbar.set, height=15)
-        
-        for col in columns:
-            meeting_tree.heading(col, text=col)
-        
-        meeting_tree.column('講師名', width=80)
-        meeting_tree.column('状態', width=60)
-        meeting_tree.column('最終打刻時刻', width=120)
-        meeting_tree.column('記録', width=150)
-        
-        meeting_tree.pack(fill=tk.BOTH, expand=True)
-        meeting_scrollbar.config(command=meeting_tree.yview)
-        
-        meeting_count_label = tk.Label(meeting_frame, text="", font=("Arial", 10))
-        meeting_count_label.pack(pady=5)
+        widths = {'講師名': 80, '状態': 60, '最終打刻時刻': 120, '記録': 150}
+        panes = self.build_channel_tables(main_frame, columns, widths)
         
         def display_summary():
             date_str = date_entry.get().strip()
@@ -720,25 +632,20 @@ class AttendanceSystemGUI:
                 messagebox.showerror("エラー", "日付形式が正しくありません (YYYY-MM-DD)")
                 return
             
-            class_summary = self.db_manager.get_date_summary(date_str, "time_records")
-            
-            for item in class_tree.get_children():
-                class_tree.delete(item)
-            
-            for name, status, last_time, record_str in class_summary:
-                class_tree.insert('', tk.END, values=(name, status, last_time, record_str))
-            
-            class_count_label.config(text=f"打刻した講師数: {len(class_summary)}人")
-            
-            meeting_summary = self.db_manager.get_date_summary(date_str, "meeting_records")
-            
-            for item in meeting_tree.get_children():
-                meeting_tree.delete(item)
-            
-            for name, status, last_time, record_str in meeting_summary:
-                meeting_tree.insert('', tk.END, values=(name, status, last_time, record_str))
-            
-            meeting_count_label.config(text=f"打刻した講師数: {len(meeting_summary)}人")
+            # 表示範囲の講師分だけを読み込む（全件をTreeviewに入れ直さない）
+            sources = []
+            for table_name, table, count_label in panes:
+                sources.append({
+                    'table': table,
+                    'label': count_label,
+                    'label_format': "打刻した講師数: {}人",
+                    'count': lambda table_name=table_name: self.db_manager.count_date_summary(date_str, table_name),
+                    'page': lambda after, limit, table_name=table_name: self.db_manager.get_date_summary_page(
+                        date_str, table_name, after, limit),
+                    'key': lambda row: row[0],
+                    'format': None
+                })
+            self.load_tables("attendance_summary", sources)
         
         tk.Button(input_frame, text="表示", command=display_summary,
                  font=("Arial", 12), bg="blue", fg="white").pack(side=tk.LEFT, padx=5)
@@ -748,6 +655,66 @@ class AttendanceSystemGUI:
         tk.Button(self.root, text="戻る", command=self.show_menu,
                  font=("Arial", 12)).pack(pady=10)
     
+    def build_channel_tables(self, parent, columns, widths):
+        """記録先テーブルごとの表を左から並べる（戻り値: [(テーブル名, 表, 件数ラベル)]）"""
+        panes = []
+        for channel in self.card_reader_manager.channels.table_channels():
+            frame = tk.Frame(parent, relief=tk.RIDGE, borderwidth=2)
+            frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+            
+            tk.Label(frame, text=channel.label, font=("Arial", 14, "bold"), 
+                    bg=channel.color).pack(fill=tk.X, pady=5)
+            
+            table = modules.VirtualTable(frame, columns, widths, height=15)
+            table.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+            
+            count_label = tk.Label(frame, text="", font=("Arial", 10))
+            count_label.pack(pady=5)
+            
+            panes.append((channel.table, table, count_label))
+        return panes
+    
+    def build_channel_checkboxes(self, parent):
+        """記録先テーブルごとの出力の選択肢（戻り値: [(チャンネル, BooleanVar)]）"""
+        options = []
+        for channel in self.card_reader_manager.channels.table_channels():
+            var = tk.BooleanVar(value=True)
+            tk.Checkbutton(parent, text=channel.label, variable=var, 
+                          font=("Arial", 11)).pack(side=tk.LEFT, padx=10)
+            options.append((channel, var))
+        return options
+    
+    def load_tables(self, name, sources):
+        """表の行数と先頭ページを別スレッドで並行して読み込んでから表示（画面は固まらない）
+        
+        sources: 表ごとの辞書 {'table', 'label', 'label_format', 'count', 'page', 'key', 'format'}
+        同じ name で続けて呼び出した場合は最後の呼び出しの結果だけを表示する
+        """
+        tasks = {}
+        for index, source in enumerate(sources):
+            source['label'].config(text="読み込み中...")
+            tasks[(index, 'total')] = source['count']
+            tasks[(index, 'first_page')] = (
+                lambda source=source: source['page'](None, source['table'].page_size))
+        
+        def on_done(results):
+            for index, source in enumerate(sources):
+                # 読み込み中に別の画面に移動していれば表示しない
+                if not source['table'].frame.winfo_exists():
+                    return
+                source['table'].set_source(
+                    source['count'], source['page'], source['key'], source['format'],
+                    total=results[(index, 'total')], first_page=results[(index, 'first_page')]
+                )
+                source['label'].config(text=source['label_format'].format(source['table'].total))
+        
+        def on_error(error):
+            for source in sources:
+                if source['label'].winfo_exists():
+                    source['label'].config(text="読み込みに失敗しました")
+        
+        self.loader.load(name, tasks, on_done, on_error)
+    
     def show_attendance_correction(self):
         """打刻修正画面（CorrectionManagerに委譲）"""
         self.correction_manager.show_attendance_correction()
@@ -778,18 +745,15 @@ class AttendanceSystemGUI:
         checkbox_frame = tk.Frame(option_frame)
         checkbox_frame.pack(pady=5)
         
-        class_var = tk.BooleanVar(value=True)
-        meeting_var = tk.BooleanVar(value=True)
-        
-        tk.Checkbutton(checkbox_frame, text="授業用", variable=class_var, 
-                      font=("Arial", 11)).pack(side=tk.LEFT, padx=10)
-        tk.Checkbutton(checkbox_frame, text="会議用", variable=meeting_var, 
-                      font=("Arial", 11)).pack(side=tk.LEFT, padx=10)
+        options = self.build_channel_checkboxes(checkbox_frame)
         
         export_btn = tk.Button(self.root, text="エクスポート", command=lambda: export_csv(),
                               font=("Arial", 14), bg="green", fg="white", width=15, height=2)
         export_btn.pack(pady=10)
         
+        tk.Button(self.root, text="中止", command=self.export_runner.cancel,
+                 font=("Arial", 11)).pack()
+        
         result_text = tk.Text(self.root, height=12, width=70, font=("Arial", 10))
         result_text.pack(pady=10, padx=20)
         
@@ -804,24 +768,20 @@ class AttendanceSystemGUI:
                 messagebox.showerror("エラー", "日付形式が正しくありません (YYYY-MM-DD)")
                 return
             
-            export_class = class_var.get()
-            export_meeting = meeting_var.get()
+            selected = [channel for channel, var in options if var.get()]
             
-            if not export_class and not export_meeting:
-                messagebox.showerror("エラー", "授業用または会議用のいずれかを選択してください")
+            if not selected:
+                messagebox.showerror("エラー", "出力する種別を1つ以上選択してください")
                 return
             
-            result = ""
-            
-            if export_class:
-                result += self.csv_exporter.export_records_to_csv(date_str, "time_records")
-                result += "\n" + "="*50 + "\n\n"
+            jobs = []
             
-            if export_meeting:
-                result += self.csv_exporter.export_records_to_csv(date_str, "meeting_records")
+            for channel in selected:
+                jobs.append((f"{channel.label}日次集計", lambda progress, cancel_event, table_name=channel.table:
+                             self.csv_exporter.export_records_to_csv(
+                                 date_str, table_name, progress=progress, cancel_event=cancel_event)))
             
-            result_text.delete(1.0, tk.END)
-            result_text.insert(1.0, result)
+            self.start_export_jobs(jobs, result_text, export_btn)
         
         tk.Button(self.root, text="戻る", command=self.show_menu,
                  font=("Arial", 12)).pack(pady=10)
@@ -851,13 +811,7 @@ class AttendanceSystemGUI:
         checkbox_frame = tk.Frame(option_frame)
         checkbox_frame.pack(pady=5)
         
-        class_var = tk.BooleanVar(value=True)
-        meeting_var = tk.BooleanVar(value=True)
-        
-        tk.Checkbutton(checkbox_frame, text="授業用", variable=class_var, 
-                      font=("Arial", 11)).pack(side=tk.LEFT, padx=10)
-        tk.Checkbutton(checkbox_frame, text="会議用", variable=meeting_var, 
-                      font=("Arial", 11)).pack(side=tk.LEFT, padx=10)
+        options = self.build_channel_checkboxes(checkbox_frame)
         
         daily_export_var = tk.BooleanVar(value=True)
         tk.Checkbutton(option_frame, text="日次集計も実行する", 
@@ -867,6 +821,9 @@ class AttendanceSystemGUI:
                               font=("Arial", 14), bg="green", fg="white", width=15, height=2)
         export_btn.pack(pady=10)
         
+        tk.Button(self.root, text="中止", command=self.export_runner.cancel,
+                 font=("Arial", 11)).pack()
+        
         result_text = tk.Text(self.root, height=12, width=70, font=("Arial", 10))
         result_text.pack(pady=10, padx=20)
         
@@ -881,62 +838,115 @@ class AttendanceSystemGUI:
                 messagebox.showerror("エラー", "月形式が正しくありません (YYYY-MM)")
                 return
             
-            export_class = class_var.get()
-            export_meeting = meeting_var.get()
+            selected = [channel for channel, var in options if var.get()]
             
-            if not export_class and not export_meeting:
-                messagebox.showerror("エラー", "授業用または会議用のいずれかを選択してください")
+            if not selected:
+                messagebox.showerror("エラー", "出力する種別を1つ以上選択してください")
                 return
             
             include_daily = daily_export_var.get()
-            result = ""
-            has_error = False
-            
-            if export_class:
-                class_result = self.monthly_exporter.export_monthly_summary_to_csv(month_str, "time_records", include_daily)
-                result += class_result
-                result += "\n" + "="*50 + "\n\n"
-                if "エラー" in class_result:
-                    has_error = True
-            
-            if export_meeting:
-                meeting_result = self.monthly_exporter.export_monthly_summary_to_csv(month_str, "meeting_records", include_daily)
-                result += meeting_result
-                result += "\n" + "="*50 + "\n\n"
-                if "エラー" in meeting_result:
-                    has_error = True
-            
-            if export_class and export_meeting:
-                summary_result = self.monthly_exporter.export_combined_monthly_summary(month_str)
-                result += summary_result
-                if "エラー" in summary_result:
-                    has_error = True
-            
-            result_text.delete(1.0, tk.END)
-            result_text.insert(1.0, result)
-            result_text.see(tk.END)
-            
-            if has_error:
-                messagebox.showerror("エラー", 
-                    "エクスポート中にエラーが発生しました。\n\n"
-                    "・対象のCSVファイルがExcelなどで開かれている可能性があります\n"
-                    "・ファイルを閉じてから再度実行してください\n\n"
-                    "詳細は結果表示エリアを確認してください")
-                return
+            jobs = []
+            
+            for channel in selected:
+                jobs.append((f"{channel.label}月次集計", lambda progress, cancel_event, table_name=channel.table:
+                             self.monthly_exporter.export_monthly_summary_to_csv(
+                                 month_str, table_name, include_daily,
+                                 progress=progress, cancel_event=cancel_event)))
+            
+            # すべての種別を選択した場合は統合した集計も作成する
+            if len(options) > 1 and len(selected) == len(options):
+                jobs.append(("統合月次集計", lambda progress, cancel_event:
+                             self.monthly_exporter.export_combined_monthly_summary(month_str)))
             
-            monthly_folder = os.path.join("monthly", month_str)
-            if os.path.exists(monthly_folder):
-                if messagebox.askyesno("確認", "エクスポートが完了しました。\n\n出力フォルダを開いてシステムを終了しますか？"):
-                    try:
-                        os.startfile(os.path.abspath(monthly_folder))
-                    except Exception as e:
-                        print(f"フォルダを開くエラー: {e}")
-                    finally:
-                        self.root.quit()
+            def on_finished(results, cancelled):
+                if any("エラー" in result for result in results):
+                    messagebox.showerror("エラー", 
+                        "エクスポート中にエラーが発生しました。\n\n"
+                        "・対象のCSVファイルがExcelなどで開かれている可能性があります\n"
+                        "・ファイルを閉じてから再度実行してください\n\n"
+                        "詳細は結果表示エリアを確認してください")
+                    return
+                
+                if cancelled:
+                    return
+                
+                monthly_folder = os.path.join("monthly", month_str)
+                if os.path.exists(monthly_folder):
+                    if messagebox.askyesno("確認", "エクスポートが完了しました。\n\n出力フォルダを開いてシステムを終了しますか？"):
+                        try:
+                            os.startfile(os.path.abspath(monthly_folder))
+                        except Exception as e:
+                            print(f"フォルダを開くエラー: {e}")
+                        finally:
+                            self.root.quit()
+            
+            self.start_export_jobs(jobs, result_text, export_btn, on_finished)
         
         tk.Button(self.root, text="戻る", command=self.show_menu,
                  font=("Arial", 12)).pack(pady=10)
     
+    def start_export_jobs(self, jobs, result_text, export_btn, on_finished=None):
+        """エクスポート処理をバックグラウンドで実行し、進捗を result_text に表示"""
+        result_text.delete(1.0, tk.END)
+        export_btn.config(state=tk.DISABLED)
+        self.export_view = {
+            'text': result_text,
+            'button': export_btn,
+            'on_finished': on_finished,
+            'results': [],
+            'cancelled': False
+        }
+        
+        for name, func in jobs:
+            self.export_runner.submit(name, func)
+        
+        if not self.export_polling:
+            self.export_polling = True
+            self.root.after(100, self.poll_export_events)
+    
+    def poll_export_events(self):
+        """エクスポート処理の進捗を画面に反映（root.after で定期的に呼び出す）"""
+        view = self.export_view
+        for event in self.export_runner.poll_events():
+            event_type = event['type']
+            line = ""
+            
+            if event_type == 'start':
+                line = f"▶ {event['job']} 開始\n"
+            elif event_type == 'progress':
+                line = f"  {event['message']}\n"
+            elif event_type == 'done':
+                line = event['result'] + f"\n({event['job']}: {event['elapsed']:.1f}秒)\n" + "="*50 + "\n\n"
+                if view:
+                    view['results'].append(event['result'])
+            elif event_type == 'cancelled':
+                line = f"■ {event['job']}: 中止しました\n"
+                if view:
+                    view['cancelled'] = True
+            elif event_type == 'error':
+                line = f"✗ {event['job']}: エクスポートエラー: {event['error']}\n"
+                if view:
+                    view['results'].append(f"エラー: {event['error']}")
+            elif event_type == 'finished':
+                line = f"\n合計処理時間: {event['elapsed']:.1f}秒\n"
+            
+            # 別の画面に移動していれば表示しない（処理は続ける）
+            if view is None or not view['text'].winfo_exists():
+                continue
+            
+            view['text'].insert(tk.END, line)
+            view['text'].see(tk.END)
+            
+            if event_type == 'finished':
+                view['button'].config(state=tk.NORMAL)
+                if view['on_finished']:
+                    view['on_finished'](view['results'], view['cancelled'])
+        
+        if self.export_runner.is_busy() or not self.export_runner.events.empty():
+            self.root.after(100, self.poll_export_events)
+        else:
+            self.export_polling = False
+    
     def toggle_sound_setting(self):
         """音量設定"""
         enabled = self.sound_manager.toggle_sound()
@@ -948,10 +958,70 @@ class AttendanceSystemGUI:
         
         self.show_menu()
     
+    def show_diagnostics(self):
+        """診断情報画面（リーダーの状態と打刻処理の段階ごとの処理時間）"""
+        for widget in self.root.winfo_children():
+            widget.destroy()
+        
+        tk.Label(self.root, text="診断情報", font=("Arial", 18, "bold")).pack(pady=10)
+        
+        report_text = tk.Text(self.root, height=22, width=100, font=("Courier", 10))
+        report_text.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
+        
+        def refresh():
+            if not report_text.winfo_exists():
+                return
+            report_text.config(state=tk.NORMAL)
+            report_text.delete("1.0", tk.END)
+            report_text.insert(tk.END, self.format_reader_health() + metrics.format_report())
+            report_text.config(state=tk.DISABLED)
+            toggle_btn.config(text="計測を停止" if metrics.enabled else "計測を開始")
+            # 表示中は1秒ごとに更新
+            self.root.after(1000, refresh)
+        
+        def toggle():
+            metrics.enable(not metrics.enabled)
+            if metrics.enabled:
+                metrics.start_log(os.path.join(DATA_DIR, "metrics.log"))
+        
+        btn_frame = tk.Frame(self.root)
+        btn_frame.pack(pady=5)
+        
+        toggle_btn = tk.Button(btn_frame, text="", command=toggle, font=("Arial", 11), width=12)
+        toggle_btn.pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="リセット", command=metrics.reset,
+                 font=("Arial", 11), width=12).pack(side=tk.LEFT, padx=5)
+        
+        refresh()
+        
+        tk.Button(self.root, text="戻る", command=self.show_menu,
+                 font=("Arial", 12)).pack(pady=10)
+    
+    def format_reader_health(self):
+        """リーダーの状態を文字列に（打刻受付を開始していなければ空）"""
+        if 'attendance_service' not in self.__dict__:
+            return ""
+        health = self.attendance_service.reader_health()
+        if not health:
+            return ""
+        lines = ["リーダー"]
+        for channel, state in health.items():
+            label = self.card_reader_manager.channels.label(channel)
+            status = "接続中" if state['connected'] else "未接続"
+            last_event = f"{state['last_event']} ({state['last_event_at']})" if state['last_event'] else "-"
+            lines.append(f"  {label} {state['reader']}")
+            lines.append(f"    状態: {status}  最後のイベント: {last_event}  "
+                         f"エラー: {state['error_rate']:.2f}回/分  再接続: {state['reconnects']}回")
+            if state['last_error']:
+                lines.append(f"    最後のエラー: {state['last_error']}")
+        lines.append("")
+        return "\n".join(lines) + "\n"
+    
     def exit_app(self):
         """アプリケーション終了"""
         if messagebox.askyesno("確認", "アプリケーションを終了しますか？"):
-            self.monitoring = False
+            if 'attendance_service' in self.__dict__:
+                self.attendance_service.monitoring = False
             self.root.quit()
 
 def main():
@@ -959,6 +1029,9 @@ def main():
     root = tk.Tk()
     app = AttendanceSystemGUI(root)
     root.mainloop()
+    
+    # 終了時にデータベース接続を閉じる
+    app.shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file